@@ -0,0 +1,264 @@
+"""
+Process-wide pool of boto3 sessions and clients.
+
+Creating a boto3 client loads botocore's service model JSON and sets up a
+fresh HTTP connection pool, which adds up quickly across services, regions
+and accounts. Sessions here are cached per credential set and clients per
+(session, service, region, config). All sessions share a single botocore
+data loader so each service model is parsed once per process.
+
+Assumed-role credentials are additionally kept in the Django cache, keyed by
+account and role, so every web and Celery process shares them instead of
+calling STS on its own. Role sessions refresh their credentials in place
+(from the cache, or a new AssumeRole call) before they expire, so a scan
+that outlives a single credential lifetime keeps working.
+"""
+import hashlib
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+import boto3
+import botocore.loaders
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import CredentialProvider, CredentialResolver, RefreshableCredentials
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+EXPIRY_MARGIN = timedelta(minutes=5)
+
+# Role credentials are refreshed once less than this much lifetime is left;
+# cached credentials are never handed out inside this window.
+ROLE_REFRESH_MARGIN = timedelta(minutes=15)
+
+DEFAULT_CONFIG = Config()
+
+# Short timeouts for the interactive "Test connection" button.
+CONNECTION_TEST_CONFIG = Config(connect_timeout=5, read_timeout=10)
+
+STS_CONFIG = Config(
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    connect_timeout=10,
+    read_timeout=30,
+)
+
+
+class _PooledCredentialProvider(CredentialProvider):
+    """Gives a pooled session the credentials object it was built with."""
+
+    METHOD = 'pooled'
+    CANONICAL_NAME = 'custom-pooled'
+
+    def __init__(self, credentials):
+        super().__init__()
+        self.credentials = credentials
+
+    def load(self):
+        return self.credentials
+
+
+class _PooledSession:
+    def __init__(self, session, expires_at, source=None):
+        self.session = session
+        self.expires_at = expires_at
+        self.source = source
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def expired(self):
+        return self.expires_at is not None and self.expires_at - EXPIRY_MARGIN <= timezone.now()
+
+
+class ClientPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = defaultdict(threading.Lock)
+        self._loader = botocore.loaders.create_loader()
+        self._sessions = {}
+        self._by_session_id = {}
+        self._sized_configs = {}
+
+    def get_session(self, key, factory, source=None):
+        """Return the cached session for ``key``, building it on a miss.
+
+        ``factory()`` returns ``(credentials, expires_at)`` where
+        ``credentials`` are either kwargs for ``boto3.Session`` or a botocore
+        credentials object, and ``expires_at`` is None for sessions that
+        never need rebuilding. ``source`` is the object the credentials are
+        derived from; a cached session built from a different one is rebuilt.
+        """
+        with self._lock:
+            key_lock = self._key_locks[key]
+        with key_lock:
+            with self._lock:
+                entry = self._sessions.get(key)
+                if entry and not entry.expired() and entry.source is source:
+                    return entry.session
+                if entry:
+                    self._evict(key)
+
+            credentials, expires_at = factory()
+            botocore_session = botocore.session.get_session()
+            botocore_session.register_component('data_loader', self._loader)
+            if isinstance(credentials, dict):
+                session = boto3.Session(botocore_session=botocore_session, **credentials)
+            else:
+                botocore_session.register_component(
+                    'credential_provider', CredentialResolver([_PooledCredentialProvider(credentials)]),
+                )
+                session = boto3.Session(botocore_session=botocore_session)
+            entry = _PooledSession(session, expires_at, source)
+            with self._lock:
+                # boto3 appends its resource path to the (shared) loader for
+                # every new session; keep the search path list from growing.
+                paths = self._loader.search_paths
+                paths[:] = list(dict.fromkeys(paths))
+                self._sessions[key] = entry
+                self._by_session_id[id(session)] = entry
+            return session
+
+    def get_refreshable_session(self, key, fetch, source=None):
+        """Return a long-lived session whose credentials refresh themselves.
+
+        ``fetch()`` returns botocore credential metadata (``access_key``,
+        ``secret_key``, ``token``, ``expiry_time``). It is called once when the
+        session is built and again by botocore whenever the credentials are
+        within ``ROLE_REFRESH_MARGIN`` of expiring. ``source`` is passed on to
+        ``get_session``.
+        """
+        margin = ROLE_REFRESH_MARGIN.total_seconds()
+
+        def factory():
+            credentials = RefreshableCredentials.create_from_metadata(
+                metadata=fetch(),
+                refresh_using=fetch,
+                method='sts-assume-role',
+                advisory_timeout=margin,
+                mandatory_timeout=EXPIRY_MARGIN.total_seconds(),
+            )
+            return credentials, None
+
+        return self.get_session(key, factory, source)
+
+    def client(self, session, service, region_name=None, config=None):
+        """Return a cached client for a pooled session (or a new one otherwise)."""
+        config = self._sized(config)
+        with self._lock:
+            entry = self._by_session_id.get(id(session))
+        if entry is None or entry.session is not session:
+            return session.client(service, region_name=region_name, config=config)
+        cache_key = (service, region_name, config)
+        # boto3 sessions are not thread-safe when creating clients.
+        with entry.lock:
+            client = entry.clients.get(cache_key)
+            if client is None:
+                client = session.client(service, region_name=region_name, config=config)
+                entry.clients[cache_key] = client
+            return client
+
+    def evict(self, key):
+        with self._lock:
+            self._evict(key)
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._by_session_id.clear()
+
+    def _evict(self, key):
+        entry = self._sessions.pop(key, None)
+        if entry:
+            self._by_session_id.pop(id(entry.session), None)
+
+    def _sized(self, config):
+        """Size the HTTP connection pool to match the discovery thread pool."""
+        config = config or DEFAULT_CONFIG
+        with self._lock:
+            sized = self._sized_configs.get(config)
+            if sized is None:
+                sized = config.merge(Config(
+                    max_pool_connections=max(10, getattr(settings, 'DISCOVERY_MAX_WORKERS', 10)),
+                ))
+                self._sized_configs[config] = sized
+            return sized
+
+
+client_pool = ClientPool()
+
+
+def management_session(account):
+    """Session for a management account's stored keys, or the default credential chain."""
+    if account and account.aws_access_key_id and account.aws_secret_access_key:
+        secret_hash = hashlib.sha256(account.aws_secret_access_key.encode()).hexdigest()
+        key = ('static', account.aws_access_key_id, secret_hash)
+        return client_pool.get_session(key, lambda: ({
+            'aws_access_key_id': account.aws_access_key_id,
+            'aws_secret_access_key': account.aws_secret_access_key,
+        }, None))
+    return client_pool.get_session(('default',), lambda: ({}, None))
+
+
+def role_credentials_cache_key(account):
+    return f'aws:sts:{account.account_id}:{account.organization_role_name}'
+
+
+def assumed_role_credentials(root_session, account, session_name='TISAXAssetDiscovery', duration=3600):
+    """Credential metadata for ``account``'s organization role, shared via the cache.
+
+    A cached set is only returned while it has more than ``ROLE_REFRESH_MARGIN``
+    left; otherwise the role is assumed from ``root_session`` and the result
+    cached for the rest of its usable lifetime.
+    """
+    cache_key = role_credentials_cache_key(account)
+    metadata = cache.get(cache_key)
+    if metadata:
+        return metadata
+
+    sts = client_pool.client(root_session, 'sts', config=STS_CONFIG)
+    creds = sts.assume_role(
+        RoleArn=f"arn:aws:iam::{account.account_id}:role/{account.organization_role_name}",
+        RoleSessionName=session_name,
+        DurationSeconds=duration,
+    )['Credentials']
+    metadata = {
+        'access_key': creds['AccessKeyId'],
+        'secret_key': creds['SecretAccessKey'],
+        'token': creds['SessionToken'],
+        'expiry_time': creds['Expiration'].isoformat(),
+    }
+    timeout = (creds['Expiration'] - timezone.now() - ROLE_REFRESH_MARGIN).total_seconds()
+    if timeout > 0:
+        cache.set(cache_key, metadata, timeout)
+    return metadata
+
+
+def assumed_role_session(root_session, account, session_name='TISAXAssetDiscovery', duration=3600):
+    """Session for ``account``'s organization role, assumed from ``root_session``.
+
+    The pooled session refreshes from the root session it was built with. A
+    different root session (the management keys were rotated, which gives
+    them a new pooled session) replaces it, so refreshes use the new keys.
+    """
+    role_arn = f"arn:aws:iam::{account.account_id}:role/{account.organization_role_name}"
+    return client_pool.get_refreshable_session(
+        ('role', role_arn),
+        lambda: assumed_role_credentials(root_session, account, session_name, duration),
+        source=root_session,
+    )
+
+
+def verify_role(root_session, account):
+    """Assume ``account``'s organization role from ``root_session`` right now.
+
+    Connection tests use this instead of ``assumed_role_session``: shared
+    credentials would keep working for a while after the role's trust
+    policy changed or the role was deleted.
+    """
+    sts = client_pool.client(root_session, 'sts', config=CONNECTION_TEST_CONFIG)
+    sts.assume_role(
+        RoleArn=f"arn:aws:iam::{account.account_id}:role/{account.organization_role_name}",
+        RoleSessionName='TISAXConnectionTest',
+        DurationSeconds=900,
+    )
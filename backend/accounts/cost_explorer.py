@@ -8,10 +8,10 @@ import logging
 from datetime import date, timedelta
 from decimal import Decimal
 
-import boto3
 from botocore.config import Config
 from django.utils import timezone
 
+from .aws_clients import client_pool, management_session
 from .models import AWSAccount
 
 logger = logging.getLogger(__name__)
@@ -31,12 +31,7 @@ def _get_management_session():
     ).first()
     if not mgmt:
         raise RuntimeError('No active management account configured.')
-    if mgmt.aws_access_key_id and mgmt.aws_secret_access_key:
-        return boto3.Session(
-            aws_access_key_id=mgmt.aws_access_key_id,
-            aws_secret_access_key=mgmt.aws_secret_access_key,
-        )
-    return boto3.Session()
+    return management_session(mgmt)
 
 
 def _fetch_costs(ce_client, start: str, end: str):
@@ -69,7 +64,7 @@ def _fetch_costs(ce_client, start: str, end: str):
 def refresh_account_costs():
     """Fetch current-month and previous-month costs and update all accounts."""
     session = _get_management_session()
-    ce = session.client('ce', region_name='us-east-1', config=BOTO_CONFIG)
+    ce = client_pool.client(session, 'ce', region_name='us-east-1', config=BOTO_CONFIG)
 
     today = date.today()
     current_month_start = today.replace(day=1)
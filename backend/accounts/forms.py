@@ -10,6 +10,7 @@ class AWSAccountForm(forms.ModelForm):
             'account_id', 'account_name', 'account_type', 'environment',
             'organization_role_name', 'is_active',
             'aws_access_key_id', 'aws_secret_access_key', 'management_account',
+            'discovery_backend', 'config_aggregator_name', 'config_aggregator_region',
         ]
         widgets = {
             'account_id': forms.TextInput(attrs={'placeholder': '123456789012', 'maxlength': 12}),
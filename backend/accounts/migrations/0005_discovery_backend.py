@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_awsaccount_discovery_regions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='awsaccount',
+            name='config_aggregator_name',
+            field=models.CharField(blank=True, default='', help_text='AWS Config aggregator in this management account (for the Config aggregator backend)', max_length=256),
+        ),
+        migrations.AddField(
+            model_name='awsaccount',
+            name='config_aggregator_region',
+            field=models.CharField(blank=True, default='', help_text='Region of the Config aggregator. Empty = AWS_DEFAULT_REGION.', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='awsaccount',
+            name='discovery_backend',
+            field=models.CharField(choices=[('DIRECT', 'Direct API calls'), ('CONFIG_AGGREGATOR', 'AWS Config aggregator')], default='DIRECT', help_text='How resources of this management account and its member accounts are discovered', max_length=20),
+        ),
+    ]
@@ -14,6 +14,10 @@ class AWSAccount(models.Model):
         DEVELOPMENT = 'DEVELOPMENT', 'Development'
         SHARED = 'SHARED', 'Shared Services'
 
+    class DiscoveryBackend(models.TextChoices):
+        DIRECT = 'DIRECT', 'Direct API calls'
+        CONFIG_AGGREGATOR = 'CONFIG_AGGREGATOR', 'AWS Config aggregator'
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     account_id = models.CharField(max_length=12, unique=True, help_text='12-digit AWS account ID')
     account_name = models.CharField(max_length=255)
@@ -45,6 +49,18 @@ class AWSAccount(models.Model):
         default=list, blank=True,
         help_text='Regions to scan during discovery. Empty = global default.',
     )
+    discovery_backend = models.CharField(
+        max_length=20, choices=DiscoveryBackend.choices, default=DiscoveryBackend.DIRECT,
+        help_text='How resources of this management account and its member accounts are discovered',
+    )
+    config_aggregator_name = models.CharField(
+        max_length=256, blank=True, default='',
+        help_text='AWS Config aggregator in this management account (for the Config aggregator backend)',
+    )
+    config_aggregator_region = models.CharField(
+        max_length=32, blank=True, default='',
+        help_text='Region of the Config aggregator. Empty = AWS_DEFAULT_REGION.',
+    )
     is_active = models.BooleanField(default=True)
     last_discovery_at = models.DateTimeField(null=True, blank=True)
 
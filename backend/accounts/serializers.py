@@ -28,6 +28,7 @@ class AWSAccountSerializer(serializers.ModelSerializer):
             'aws_access_key_id', 'aws_secret_access_key',
             'management_account', 'management_account_name',
             'discovery_regions',
+            'discovery_backend', 'config_aggregator_name', 'config_aggregator_region',
             'estimated_monthly_cost', 'previous_month_cost', 'cost_updated_at',
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -48,4 +49,15 @@ class AWSAccountSerializer(serializers.ModelSerializer):
                 'management_account': 'A management account cannot have a parent management account.',
             })
 
+        backend = attrs.get('discovery_backend', getattr(self.instance, 'discovery_backend', None))
+        if backend == AWSAccount.DiscoveryBackend.CONFIG_AGGREGATOR:
+            if account_type != AWSAccount.AccountType.MANAGEMENT:
+                raise serializers.ValidationError({
+                    'discovery_backend': 'Only management accounts can use a Config aggregator.',
+                })
+            if not attrs.get('config_aggregator_name', getattr(self.instance, 'config_aggregator_name', '')):
+                raise serializers.ValidationError({
+                    'config_aggregator_name': 'An aggregator name is required for the Config aggregator backend.',
+                })
+
         return attrs
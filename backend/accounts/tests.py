@@ -0,0 +1,124 @@
+from datetime import timedelta
+from unittest import mock
+
+from botocore.credentials import Credentials
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from . import aws_clients
+from .aws_clients import ClientPool, assumed_role_credentials, assumed_role_session, verify_role
+from .models import AWSAccount
+
+
+class ClientPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.pool = ClientPool()
+        self.credentials = {'aws_access_key_id': 'AKIATEST', 'aws_secret_access_key': 'secret'}
+
+    def test_sessions_and_clients_are_reused(self):
+        factory_calls = []
+
+        def factory():
+            factory_calls.append(1)
+            return self.credentials, None
+
+        session = self.pool.get_session(('static', 'AKIATEST'), factory)
+        self.assertIs(self.pool.get_session(('static', 'AKIATEST'), factory), session)
+        self.assertEqual(len(factory_calls), 1)
+
+        client = self.pool.client(session, 'ec2', region_name='eu-central-1')
+        self.assertIs(self.pool.client(session, 'ec2', region_name='eu-central-1'), client)
+        self.assertIsNot(self.pool.client(session, 'ec2', region_name='us-east-1'), client)
+
+    def test_expired_sessions_are_rebuilt(self):
+        expires_at = timezone.now() + timedelta(minutes=1)
+        first = self.pool.get_session(('role', 'x'), lambda: (self.credentials, expires_at))
+        second = self.pool.get_session(('role', 'x'), lambda: (self.credentials, None))
+        self.assertIsNot(first, second)
+
+    def test_session_uses_the_credentials_object_it_was_built_with(self):
+        credentials = Credentials('AKIAOBJECT', 'secret')
+
+        session = self.pool.get_session(('role', 'z'), lambda: (credentials, None))
+
+        self.assertIs(session.get_credentials(), credentials)
+
+    def test_refreshable_session_refreshes_before_expiry(self):
+        fetched = []
+
+        def fetch():
+            fetched.append(1)
+            expires_at = timezone.now() + timedelta(minutes=10 if len(fetched) == 1 else 60)
+            return {
+                'access_key': f'AKIA{len(fetched)}',
+                'secret_key': 'secret',
+                'token': 'token',
+                'expiry_time': expires_at.isoformat(),
+            }
+
+        session = self.pool.get_refreshable_session(('role', 'y'), fetch)
+        self.assertIs(self.pool.get_refreshable_session(('role', 'y'), fetch), session)
+        self.assertEqual(session.get_credentials().get_frozen_credentials().access_key, 'AKIA2')
+        self.assertEqual(len(fetched), 2)
+
+
+class AssumedRoleCredentialsTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.account = AWSAccount(account_id='123456789012', organization_role_name='OrgRole')
+        self.root_session = mock.Mock()
+        self.sts = self.root_session.client.return_value
+
+    def assume_role_returning(self, lifetime):
+        self.sts.assume_role.return_value = {'Credentials': {
+            'AccessKeyId': 'ASIATEST',
+            'SecretAccessKey': 'secret',
+            'SessionToken': 'token',
+            'Expiration': timezone.now() + lifetime,
+        }}
+
+    def test_credentials_are_shared_through_cache(self):
+        self.assume_role_returning(timedelta(hours=1))
+        first = assumed_role_credentials(self.root_session, self.account)
+        second = assumed_role_credentials(self.root_session, self.account)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first['access_key'], 'ASIATEST')
+        self.sts.assume_role.assert_called_once()
+        self.assertEqual(
+            self.sts.assume_role.call_args.kwargs['RoleArn'],
+            'arn:aws:iam::123456789012:role/OrgRole',
+        )
+
+    def test_credentials_close_to_expiry_are_not_cached(self):
+        self.assume_role_returning(timedelta(minutes=10))
+        assumed_role_credentials(self.root_session, self.account)
+        assumed_role_credentials(self.root_session, self.account)
+        self.assertEqual(self.sts.assume_role.call_count, 2)
+
+    def test_role_session_is_rebuilt_when_the_root_session_changes(self):
+        self.assume_role_returning(timedelta(hours=1))
+        rotated = mock.Mock()
+        rotated.client.return_value = self.sts
+        pool = ClientPool()
+
+        with mock.patch.object(aws_clients, 'client_pool', pool):
+            session = assumed_role_session(self.root_session, self.account)
+            self.assertIs(assumed_role_session(self.root_session, self.account), session)
+            rebuilt = assumed_role_session(rotated, self.account)
+
+        self.assertIsNot(rebuilt, session)
+        cache.clear()
+        rebuilt.get_credentials()._refresh_using()
+        self.assertTrue(rotated.client.called)
+
+    def test_connection_test_assumes_the_role_despite_cached_credentials(self):
+        self.assume_role_returning(timedelta(hours=1))
+        assumed_role_credentials(self.root_session, self.account)
+
+        verify_role(self.root_session, self.account)
+        verify_role(self.root_session, self.account)
+
+        self.assertEqual(self.sts.assume_role.call_count, 3)
+        self.assertEqual(self.sts.assume_role.call_args.kwargs['RoleSessionName'], 'TISAXConnectionTest')
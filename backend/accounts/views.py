@@ -1,5 +1,3 @@
-import boto3
-from botocore.config import Config
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import JsonResponse
@@ -8,6 +6,9 @@ from django.views.generic import CreateView, ListView, UpdateView, View
 
 from authentication.mixins import AdminRequiredMixin
 
+from .aws_clients import (
+    CONNECTION_TEST_CONFIG, client_pool, management_session, verify_role,
+)
 from .forms import AWSAccountForm
 from .models import AWSAccount
 
@@ -44,17 +45,11 @@ class AccountTestConnectionView(LoginRequiredMixin, View):
     def post(self, request, pk):
         account = AWSAccount.objects.get(pk=pk)
         try:
-            session = boto3.Session()
             if account.account_type == AWSAccount.AccountType.MEMBER:
-                sts = session.client('sts', config=Config(connect_timeout=5, read_timeout=10))
-                role_arn = f"arn:aws:iam::{account.account_id}:role/{account.organization_role_name}"
-                sts.assume_role(
-                    RoleArn=role_arn,
-                    RoleSessionName='TISAXConnectionTest',
-                    DurationSeconds=900,
-                )
+                verify_role(management_session(account.management_account), account)
             else:
-                sts = session.client('sts', config=Config(connect_timeout=5, read_timeout=10))
+                session = management_session(account)
+                sts = client_pool.client(session, 'sts', config=CONNECTION_TEST_CONFIG)
                 sts.get_caller_identity()
             return JsonResponse({'success': True, 'message': 'Connection successful!'})
         except Exception as e:
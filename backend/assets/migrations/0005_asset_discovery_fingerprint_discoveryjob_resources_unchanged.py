@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0004_discoveryjob_resources_decommissioned'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='discovery_fingerprint',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='discoveryjob',
+            name='resources_unchanged',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+def seed_counter(apps, schema_editor):
+    """Start the counter at the highest numeric ASSET-N id so existing ids stay unique."""
+    Asset = apps.get_model('assets', 'Asset')
+    AssetIdCounter = apps.get_model('assets', 'AssetIdCounter')
+    highest = 0
+    for asset_id in Asset.objects.values_list('asset_id', flat=True).iterator():
+        try:
+            highest = max(highest, int(asset_id.split('-')[1]))
+        except (IndexError, ValueError):
+            continue
+    AssetIdCounter.objects.update_or_create(name='asset', defaults={'value': highest})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0005_asset_discovery_fingerprint_discoveryjob_resources_unchanged'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetIdCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_awsaccount_discovery_regions'),
+        ('assets', '0006_assetidcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryjob',
+            name='target_accounts',
+            field=models.ManyToManyField(blank=True, help_text='Accounts to scan. Empty = aws_account, or all accounts.', related_name='targeted_discovery_jobs', to='accounts.awsaccount'),
+        ),
+        migrations.AddField(
+            model_name='discoveryjob',
+            name='target_regions',
+            field=models.JSONField(blank=True, default=list, help_text="Regions to scan. Empty = each account's discovery regions."),
+        ),
+        migrations.AddField(
+            model_name='discoveryjob',
+            name='target_service_types',
+            field=models.JSONField(blank=True, default=list, help_text='AWS service types to scan. Empty = all services.'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0007_discoveryjob_targets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryjob',
+            name='predicted_duration_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -1,7 +1,7 @@
 import uuid
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 
 
 class AssetCategory(models.Model):
@@ -113,6 +113,9 @@ class Asset(models.Model):
     # Timestamps
     discovered_at = models.DateTimeField(null=True, blank=True)
     last_seen_at = models.DateTimeField(null=True, blank=True)
+    # Hash of the discovered values last written by discovery; blank once the
+    # asset is changed by any other path so the next run rewrites it.
+    discovery_fingerprint = models.CharField(max_length=64, blank=True, default='', editable=False)
     is_manually_added = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -133,17 +136,58 @@ class Asset(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.asset_id:
-            last = Asset.objects.order_by('-asset_id').values_list('asset_id', flat=True).first()
-            if last:
-                try:
-                    num = int(last.split('-')[1]) + 1
-                except (IndexError, ValueError):
-                    num = 1
-            else:
-                num = 1
-            self.asset_id = f'ASSET-{num:04d}'
+            self.asset_id = Asset.next_asset_ids(1)[0]
+        self.discovery_fingerprint = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'discovery_fingerprint' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'discovery_fingerprint']
         super().save(*args, **kwargs)
 
+    @classmethod
+    def next_asset_ids(cls, count):
+        """Reserve and return the next ``count`` asset IDs (e.g. for bulk_create)."""
+        return [f'ASSET-{n:04d}' for n in AssetIdCounter.reserve(count)]
+
+    @classmethod
+    def max_asset_number(cls):
+        """Highest numeric suffix among existing ``ASSET-N`` ids (0 if none)."""
+        highest = 0
+        for asset_id in cls.objects.values_list('asset_id', flat=True).iterator():
+            try:
+                highest = max(highest, int(asset_id.split('-')[1]))
+            except (IndexError, ValueError):
+                continue
+        return highest
+
+
+class AssetIdCounter(models.Model):
+    """Counter row that hands out blocks of asset numbers.
+
+    ``reserve`` bumps the counter with a single ``UPDATE ... SET value = value + n``
+    and reads it back in the same transaction, so concurrent writers (web
+    requests, Celery workers) never receive overlapping ranges on either
+    SQLite or Postgres. Numbers are never reused; a rolled back insert leaves
+    a gap.
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+    @classmethod
+    def reserve(cls, count, name='asset'):
+        """Return a range of ``count`` new numbers."""
+        if count <= 0:
+            return range(0)
+        with transaction.atomic():
+            if not cls.objects.filter(name=name).update(value=models.F('value') + count):
+                cls.objects.get_or_create(name=name, defaults={'value': Asset.max_asset_number()})
+                cls.objects.filter(name=name).update(value=models.F('value') + count)
+            last = cls.objects.filter(name=name).values_list('value', flat=True).get()
+        return range(last - count + 1, last + 1)
+
 
 class AssetRelationship(models.Model):
     class RelationshipType(models.TextChoices):
@@ -169,6 +213,9 @@ class DiscoveryJob(models.Model):
         PENDING = 'PENDING', 'Pending'
         RUNNING = 'RUNNING', 'Running'
         COMPLETED = 'COMPLETED', 'Completed'
+        # Finished, but some units ran out of time; their scopes were not decommissioned.
+        # Snapshot ingests end PARTIAL when some files were only partially read.
+        PARTIAL = 'PARTIAL', 'Partial'
         FAILED = 'FAILED', 'Failed'
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -176,19 +223,39 @@ class DiscoveryJob(models.Model):
         'accounts.AWSAccount', on_delete=models.SET_NULL, null=True, blank=True,
         help_text='Null means all accounts',
     )
+    # Targeted scans; each empty list means "no restriction".
+    target_accounts = models.ManyToManyField(
+        'accounts.AWSAccount', blank=True, related_name='targeted_discovery_jobs',
+        help_text='Accounts to scan. Empty = aws_account, or all accounts.',
+    )
+    target_regions = models.JSONField(
+        default=list, blank=True,
+        help_text="Regions to scan. Empty = each account's discovery regions.",
+    )
+    target_service_types = models.JSONField(
+        default=list, blank=True,
+        help_text='AWS service types to scan. Empty = all services.',
+    )
     status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     resources_discovered = models.IntegerField(default=0)
     resources_updated = models.IntegerField(default=0)
     resources_new = models.IntegerField(default=0)
+    resources_unchanged = models.IntegerField(default=0)
     resources_decommissioned = models.IntegerField(default=0)
+    # Longest predicted account run time when the job started; null without unit history.
+    predicted_duration_seconds = models.FloatField(null=True, blank=True)
     error_message = models.TextField(blank=True, default='')
     triggered_by = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
     )
+    # Log of jobs run before log lines became DiscoveryLogEntry rows.
     log_output = models.TextField(blank=True, default='')
 
+    # Text columns that can grow large and are not loaded for job listings.
+    LIST_DEFERRED_FIELDS = ('log_output', 'error_message')
+
     class Meta:
         ordering = ['-started_at']
 
@@ -201,3 +268,36 @@ class DiscoveryJob(models.Model):
         if self.started_at and self.completed_at:
             return self.completed_at - self.started_at
         return None
+
+    def record_progress(self, discovered=0, new=0, updated=0, unchanged=0):
+        """Atomically add to the resource counters while the job is running."""
+        DiscoveryJob.objects.filter(pk=self.pk).update(
+            resources_discovered=models.F('resources_discovered') + discovered,
+            resources_new=models.F('resources_new') + new,
+            resources_updated=models.F('resources_updated') + updated,
+            resources_unchanged=models.F('resources_unchanged') + unchanged,
+        )
+
+    def append_log(self, *lines, level='INFO', account_id='', region='', service=''):
+        """Add ``lines`` to the job's log as DiscoveryLogEntry rows.
+
+        Entries are only inserted, never rewritten, so concurrent shards can
+        log without contending for the job row.
+        """
+        from discovery import events
+        from discovery.models import DiscoveryLogEntry
+        from discovery.serializers import DiscoveryLogEntrySerializer
+
+        entries = DiscoveryLogEntry.objects.bulk_create([
+            DiscoveryLogEntry(
+                job=self, level=level, account_id=account_id, region=region, service=service, message=line,
+            )
+            for line in lines
+        ])
+        events.publish(self.pk, 'log', DiscoveryLogEntrySerializer(entries, many=True).data)
+
+    @property
+    def log_text(self):
+        """The whole log as text: ``log_output`` of older jobs followed by the log entries."""
+        entries = ''.join(f'{entry.as_text()}\n' for entry in self.log_entries.all())
+        return self.log_output + entries
@@ -2,9 +2,12 @@ import re
 
 from rest_framework import serializers
 
+from accounts.models import AWSAccount
 from accounts.serializers import AWSAccountSerializer
 from .models import Asset, AssetCategory, AssetRelationship, DiscoveryJob
 
+AWS_REGION_RE = re.compile(r'^[a-z]{2}(-[a-z]+)+-\d+$')
+
 URL_SCHEME_RE = re.compile(
     r'^[a-zA-Z][a-zA-Z0-9+\-.]*://',  # RFC 3986 scheme
 )
@@ -165,7 +168,7 @@ class BulkUpdateSerializer(serializers.Serializer):
     )
 
 
-class DiscoveryJobSerializer(serializers.ModelSerializer):
+class DiscoveryJobListSerializer(serializers.ModelSerializer):
     aws_account_name = serializers.CharField(
         source='aws_account.account_name', read_only=True, default=''
     )
@@ -178,12 +181,50 @@ class DiscoveryJobSerializer(serializers.ModelSerializer):
         model = DiscoveryJob
         fields = [
             'id', 'aws_account', 'aws_account_name',
+            'target_accounts', 'target_regions', 'target_service_types',
             'status', 'started_at', 'completed_at',
-            'resources_discovered', 'resources_updated', 'resources_new', 'resources_decommissioned',
-            'error_message', 'triggered_by_username',
-            'log_output', 'duration_seconds',
+            'resources_discovered', 'resources_updated', 'resources_new', 'resources_unchanged',
+            'resources_decommissioned',
+            'triggered_by_username',
+            'duration_seconds', 'predicted_duration_seconds',
         ]
 
     def get_duration_seconds(self, obj):
         d = obj.duration
         return d.total_seconds() if d else None
+
+
+class DiscoveryJobSerializer(DiscoveryJobListSerializer):
+    """Job detail, adding the text columns the list leaves out. ``log_output`` only holds the log of jobs from before
+    structured log entries; newer logs are read from the job's ``logs`` endpoint."""
+
+    class Meta(DiscoveryJobListSerializer.Meta):
+        fields = DiscoveryJobListSerializer.Meta.fields + ['error_message', 'log_output']
+
+
+class TriggerDiscoverySerializer(serializers.Serializer):
+    account_id = serializers.PrimaryKeyRelatedField(
+        queryset=AWSAccount.objects.filter(is_active=True), required=False, allow_null=True,
+    )
+    account_ids = serializers.PrimaryKeyRelatedField(
+        queryset=AWSAccount.objects.filter(is_active=True), many=True, required=False,
+    )
+    regions = serializers.ListField(
+        child=serializers.RegexField(AWS_REGION_RE, max_length=30), required=False,
+    )
+    service_types = serializers.ListField(
+        child=serializers.ChoiceField(choices=Asset.AWSServiceType.choices), required=False,
+    )
+
+    def validate_service_types(self, value):
+        from discovery.aws_discoverer import DISCOVERABLE_SERVICE_TYPES
+
+        unsupported = sorted(set(value) - set(DISCOVERABLE_SERVICE_TYPES))
+        if unsupported:
+            raise serializers.ValidationError(
+                f"Discovery does not support: {', '.join(unsupported)}"
+            )
+        return list(dict.fromkeys(value))
+
+    def validate_regions(self, value):
+        return list(dict.fromkeys(value))
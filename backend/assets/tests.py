@@ -0,0 +1,26 @@
+from django.test import TestCase
+
+from .models import Asset, AssetIdCounter
+
+
+class AssetIdAllocatorTest(TestCase):
+    def test_save_assigns_sequential_ids(self):
+        first = Asset.objects.create(name='a')
+        second = Asset.objects.create(name='b')
+        self.assertEqual((first.asset_id, second.asset_id), ('ASSET-0001', 'ASSET-0002'))
+
+    def test_reserved_blocks_do_not_overlap(self):
+        block = Asset.next_asset_ids(3)
+        asset = Asset.objects.create(name='a')
+        self.assertEqual(block, ['ASSET-0001', 'ASSET-0002', 'ASSET-0003'])
+        self.assertEqual(asset.asset_id, 'ASSET-0004')
+
+    def test_ids_continue_numerically_past_9999(self):
+        AssetIdCounter.objects.filter(name='asset').update(value=9999)
+        self.assertEqual(Asset.objects.create(name='a').asset_id, 'ASSET-10000')
+        self.assertEqual(Asset.objects.create(name='b').asset_id, 'ASSET-10001')
+
+    def test_missing_counter_is_seeded_from_existing_ids(self):
+        Asset.objects.create(name='a', asset_id='ASSET-0042')
+        AssetIdCounter.objects.all().delete()
+        self.assertEqual(Asset.next_asset_ids(1), ['ASSET-0043'])
@@ -84,6 +84,12 @@ DATABASES = {
     'default': env.db('DATABASE_URL', default=f'sqlite:///{BASE_DIR / "db" / "cn_assets.db"}'),
 }
 
+# Shared by all web and Celery processes when pointed at Redis (e.g. redis://redis:6379/1),
+# so assumed-role credentials are reused across workers.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -134,8 +140,58 @@ OIDC_RP_SCOPES = 'openid email profile'
 
 # AWS Configuration
 AWS_DEFAULT_REGION = env('AWS_DEFAULT_REGION', default='eu-central-1')
-DISCOVERY_CONCURRENT_REGIONS = env.int('DISCOVERY_CONCURRENT_REGIONS', default=5)
+# Shared thread pool for every (region, service) discovery unit of an account.
+DISCOVERY_MAX_WORKERS = env.int('DISCOVERY_MAX_WORKERS', default=env.int('DISCOVERY_CONCURRENT_REGIONS', default=10))
+# Per boto3 service cap on concurrently running units, e.g. "ec2=4;s3=2".
+DISCOVERY_SERVICE_CONCURRENCY = env.dict('DISCOVERY_SERVICE_CONCURRENCY', cast={'value': int}, default={})
 DISCOVERY_BATCH_SIZE = env.int('DISCOVERY_BATCH_SIZE', default=100)
+# Max discovered resources buffered between the AWS scanners and the DB writer.
+DISCOVERY_QUEUE_SIZE = env.int('DISCOVERY_QUEUE_SIZE', default=1000)
+# Fetch tags per region via the Resource Groups Tagging API instead of one call per resource
+DISCOVERY_BULK_TAGS = env.bool('DISCOVERY_BULK_TAGS', default=True)
+# Threads used to describe S3 buckets concurrently within the S3 discovery unit.
+DISCOVERY_S3_WORKERS = env.int('DISCOVERY_S3_WORKERS', default=8)
+# Threads used for per-item describe calls (EKS clusters, Cognito pools, OpenSearch batches).
+DISCOVERY_DETAIL_WORKERS = env.int('DISCOVERY_DETAIL_WORKERS', default=8)
+# Seconds a (service, region) unit may run before it is stopped (0 = no limit)...
+DISCOVERY_UNIT_TIMEOUT = env.int('DISCOVERY_UNIT_TIMEOUT', default=900)
+# ...with overrides per service key or region, e.g. "s3=1800;ap-east-1=120".
+DISCOVERY_UNIT_TIMEOUTS = env.dict('DISCOVERY_UNIT_TIMEOUTS', cast={'value': int}, default={})
+# Seconds after a job starts when its unfinished units are cancelled and it ends PARTIAL (0 = no budget).
+DISCOVERY_JOB_BUDGET = env.int('DISCOVERY_JOB_BUDGET', default=0)
+# Deliveries of an account's discovery task (resumes and unit retries, not continuations
+# after the time limit) before it is marked failed.
+DISCOVERY_SHARD_MAX_ATTEMPTS = env.int('DISCOVERY_SHARD_MAX_ATTEMPTS', default=3)
+# A running account with no unit checkpointed for this long has lost its task and is marked failed.
+DISCOVERY_SHARD_STALE_MINUTES = env.int('DISCOVERY_SHARD_STALE_MINUTES', default=120)
+# Also record bucket encryption, versioning and public access block settings.
+DISCOVERY_S3_SECURITY_SETTINGS = env.bool('DISCOVERY_S3_SECURITY_SETTINGS', default=False)
+# Skip a (service, region) unit after this many empty runs in a row (0 = never skip)...
+DISCOVERY_SKIP_EMPTY_AFTER = env.int('DISCOVERY_SKIP_EMPTY_AFTER', default=3)
+# ...but run it again once this many hours have passed since its last run.
+DISCOVERY_EMPTY_PROBE_HOURS = env.int('DISCOVERY_EMPTY_PROBE_HOURS', default=168)
+# Requests per second per (account, service, region), e.g. "ec2=20;s3=50". 0 = unlimited.
+DISCOVERY_RATE_LIMIT_DEFAULT = env.float('DISCOVERY_RATE_LIMIT_DEFAULT', default=10)
+DISCOVERY_RATE_LIMITS = env.dict('DISCOVERY_RATE_LIMITS', cast={'value': float}, default={})
+# Redis shared by all workers for rate buckets and live progress events;
+# defaults to CACHE_URL when that is Redis.
+_cache_url = env('CACHE_URL', default='')
+DISCOVERY_REDIS_URL = env(
+    'DISCOVERY_REDIS_URL', default=_cache_url if _cache_url.startswith('redis') else '',
+)
+# Live job event streams one web process serves at once; each holds a
+# thread, so keep this well below GUNICORN_THREADS. Further job pages poll.
+DISCOVERY_STREAM_MAX_CONNECTIONS = env.int('DISCOVERY_STREAM_MAX_CONNECTIONS', default=4)
+# Log entries and legacy log text of jobs finished longer ago are deleted daily (0 = keep forever).
+DISCOVERY_LOG_RETENTION_DAYS = env.int('DISCOVERY_LOG_RETENTION_DAYS', default=90)
+# SQS queue of resource change events read by the consume_discovery_events command.
+DISCOVERY_EVENTS_QUEUE_URL = env('DISCOVERY_EVENTS_QUEUE_URL', default='')
+# Optional SQS endpoint, e.g. a local ElasticMQ.
+DISCOVERY_EVENTS_ENDPOINT_URL = env('DISCOVERY_EVENTS_ENDPOINT_URL', default='')
+# Events received this many seconds after the first one are coalesced into one refresh...
+DISCOVERY_EVENTS_WINDOW_SECONDS = env.int('DISCOVERY_EVENTS_WINDOW_SECONDS', default=10)
+# ...up to this many messages.
+DISCOVERY_EVENTS_MAX_MESSAGES = env.int('DISCOVERY_EVENTS_MAX_MESSAGES', default=100)
 # Comma-separated list of regions to scan. Empty = all regions.
 DISCOVERY_REGIONS = env.list('DISCOVERY_REGIONS', default=['eu-central-1', 'us-east-1'])
 
@@ -171,6 +227,8 @@ CSRF_COOKIE_HTTPONLY = False
 
 # Celery
 CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+# Re-queue a task whose worker died mid-run (with acks_late) so discovery can resume.
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
 CELERY_BEAT_SCHEDULE = {
     'check-scheduled-discovery': {
         'task': 'discovery.celery_tasks.check_scheduled_discovery',
@@ -180,5 +238,13 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'discovery.celery_tasks.refresh_costs_task',
         'schedule': 21600,  # every 6 hours
     },
+    'fail-stale-discovery-shards': {
+        'task': 'discovery.celery_tasks.fail_stale_shards_task',
+        'schedule': 900,  # every 15 minutes
+    },
+    'prune-discovery-logs': {
+        'task': 'discovery.celery_tasks.prune_discovery_logs_task',
+        'schedule': 86400,  # daily
+    },
 }
 
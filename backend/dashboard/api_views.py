@@ -17,7 +17,7 @@ class DashboardView(APIView):
         ).count()
 
         last_job = DiscoveryJob.objects.filter(
-            status=DiscoveryJob.Status.COMPLETED
+            status__in=[DiscoveryJob.Status.COMPLETED, DiscoveryJob.Status.PARTIAL],
         ).first()
         last_discovery = last_job.completed_at.isoformat() if last_job else None
 
@@ -81,7 +81,7 @@ class DashboardView(APIView):
         recent_jobs_qs = (
             DiscoveryJob.objects
             .select_related('aws_account', 'triggered_by')
-            .all()[:10]
+            .defer(*DiscoveryJob.LIST_DEFERRED_FIELDS)[:10]
         )
         recent_jobs = []
         for job in recent_jobs_qs:
@@ -17,7 +17,9 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         ctx['total_accounts'] = AWSAccount.objects.filter(is_active=True).count()
         ctx['critical_assets'] = active_assets.filter(criticality=Asset.Criticality.CRITICAL).count()
 
-        last_job = DiscoveryJob.objects.filter(status=DiscoveryJob.Status.COMPLETED).first()
+        last_job = DiscoveryJob.objects.filter(
+            status__in=[DiscoveryJob.Status.COMPLETED, DiscoveryJob.Status.PARTIAL],
+        ).first()
         ctx['last_discovery'] = last_job.completed_at if last_job else None
 
         # By asset type
@@ -55,6 +57,6 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         )
 
         # Recent jobs
-        ctx['recent_jobs'] = DiscoveryJob.objects.all()[:10]
+        ctx['recent_jobs'] = DiscoveryJob.objects.select_related('aws_account').defer(*DiscoveryJob.LIST_DEFERRED_FIELDS)[:10]
 
         return ctx
@@ -1 +1,30 @@
 from django.contrib import admin
+
+from .models import DiscoveryLogEntry, DiscoveryShard, DiscoveryUnitHistory, DiscoveryUnitRun
+
+
+@admin.register(DiscoveryShard)
+class DiscoveryShardAdmin(admin.ModelAdmin):
+    list_display = ['job', 'aws_account', 'status', 'started_at', 'completed_at', 'resources_discovered']
+    list_filter = ['status']
+
+
+@admin.register(DiscoveryUnitRun)
+class DiscoveryUnitRunAdmin(admin.ModelAdmin):
+    list_display = [
+        'shard', 'service', 'region', 'status', 'completed_at', 'resources_discovered',
+        'api_calls', 'retries', 'throttles',
+    ]
+    list_filter = ['status', 'service']
+
+
+@admin.register(DiscoveryUnitHistory)
+class DiscoveryUnitHistoryAdmin(admin.ModelAdmin):
+    list_display = ['aws_account', 'service', 'region', 'consecutive_empty_runs', 'last_run_at']
+    list_filter = ['service', 'region']
+
+
+@admin.register(DiscoveryLogEntry)
+class DiscoveryLogEntryAdmin(admin.ModelAdmin):
+    list_display = ['job', 'created_at', 'level', 'account_id', 'service', 'region', 'message']
+    list_filter = ['level']
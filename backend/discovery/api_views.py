@@ -1,20 +1,123 @@
+from django.db.models import DurationField, ExpressionWrapper, F
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from assets.models import DiscoveryJob
-from assets.serializers import DiscoveryJobSerializer
+from assets.serializers import DiscoveryJobListSerializer, DiscoveryJobSerializer, TriggerDiscoverySerializer
 from authentication.permissions import IsAdmin
+from discovery.events import job_event_stream
+from discovery.models import DiscoveryLogEntry, DiscoveryUnitRun
+from discovery.serializers import DiscoveryLogEntrySerializer, DiscoveryUnitRunSerializer
 from discovery.tasks import run_discovery
 
 
+# Most log entries returned by one request.
+LOG_PAGE_SIZE = 500
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets EventSource's ``Accept: text/event-stream`` pass content negotiation."""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
 class DiscoveryJobViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = DiscoveryJob.objects.select_related('aws_account', 'triggered_by')
+    queryset = DiscoveryJob.objects.select_related(
+        'aws_account', 'triggered_by',
+    ).prefetch_related('target_accounts')
     serializer_class = DiscoveryJobSerializer
     ordering = ['-started_at']
     filterset_fields = ['status', 'aws_account']
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.defer(*DiscoveryJob.LIST_DEFERRED_FIELDS)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return DiscoveryJobListSerializer
+        return DiscoveryJobSerializer
+
+    @action(detail=True)
+    def logs(self, request, pk=None):
+        """Log entries of a job, oldest first.
+
+        ``after`` returns the entries following that entry id (for paging and
+        tailing a running job), ``tail`` the last N entries. ``level`` and
+        ``account_id`` filter the entries.
+        """
+        job = self.get_object()
+        entries = DiscoveryLogEntry.objects.filter(job=job)
+        for param in ('level', 'account_id'):
+            value = request.query_params.get(param)
+            if value:
+                entries = entries.filter(**{param: value})
+        try:
+            limit = min(int(request.query_params.get('limit', LOG_PAGE_SIZE)), LOG_PAGE_SIZE)
+            after = int(request.query_params.get('after', 0))
+            tail = int(request.query_params.get('tail', 0))
+        except ValueError:
+            return Response({'error': 'after, tail and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if tail > 0:
+            page = list(entries.order_by('-id')[:min(tail, LOG_PAGE_SIZE)])[::-1]
+            has_more = False
+        else:
+            page = list(entries.filter(id__gt=after).order_by('id')[:limit + 1])
+            has_more = len(page) > limit
+            page = page[:limit]
+        return Response({
+            'results': DiscoveryLogEntrySerializer(page, many=True).data,
+            'last_id': page[-1].id if page else after,
+            'has_more': has_more,
+        })
+
+    @action(detail=True, renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def events(self, request, pk=None):
+        """Server-Sent Events stream of a job's progress (see ``discovery.events``).
+
+        Resumes after log entry ``after`` or the ``Last-Event-ID`` header sent
+        by a reconnecting EventSource.
+        """
+        job = self.get_object()
+        try:
+            after = max(
+                int(request.query_params.get('after', 0)),
+                int(request.headers.get('Last-Event-ID') or 0),
+            )
+        except ValueError:
+            return Response({'error': 'after must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(job_event_stream(job, after), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @action(detail=True)
+    def units(self, request, pk=None):
+        """Per (account, service, region) unit timing and API telemetry, slowest first."""
+        job = self.get_object()
+        runs = DiscoveryUnitRun.objects.filter(shard__job=job).select_related('shard__aws_account')
+        service = request.query_params.get('service')
+        if service:
+            runs = runs.filter(service=service)
+        runs = runs.annotate(
+            elapsed=ExpressionWrapper(F('completed_at') - F('started_at'), output_field=DurationField()),
+        ).order_by(F('elapsed').desc(nulls_last=True), 'service', 'region')
+        page = self.paginate_queryset(runs)
+        if page is not None:
+            return self.get_paginated_response(DiscoveryUnitRunSerializer(page, many=True).data)
+        return Response(DiscoveryUnitRunSerializer(runs, many=True).data)
+
 
 class TriggerDiscoveryView(APIView):
     permission_classes = [IsAuthenticated, IsAdmin]
@@ -28,8 +131,16 @@ class TriggerDiscoveryView(APIView):
                 status=status.HTTP_409_CONFLICT,
             )
 
-        account_id = request.data.get('account_id') or None
+        params = TriggerDiscoverySerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        account = params.validated_data.get('account_id')
         user = request.user if request.user.is_authenticated else None
-        job = run_discovery(account_id=account_id, user=user)
+        job = run_discovery(
+            account_id=account.pk if account else None,
+            user=user,
+            account_ids=[a.pk for a in params.validated_data.get('account_ids', [])],
+            regions=params.validated_data.get('regions'),
+            service_types=params.validated_data.get('service_types'),
+        )
         serializer = DiscoveryJobSerializer(job)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
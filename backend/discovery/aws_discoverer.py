@@ -1,66 +1,208 @@
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+import threading
+import time
+from collections import namedtuple
 
-import boto3
 from botocore.config import Config
+from botocore.exceptions import ClientError
 from django.conf import settings
 from django.utils import timezone
 
+from accounts.aws_clients import assumed_role_session, client_pool, management_session
 from accounts.models import AWSAccount
-from assets.models import Asset
+from discovery.config_aggregator import ConfigAggregatorSource
+from discovery.ratelimit import governor
+from discovery import deadlines, telemetry
+from discovery.scheduler import UnitScheduler, bounded_map, longest_first
+from discovery.tagging import ROUTE53_TAG_BATCH_SIZE, TagIndex
 
 logger = logging.getLogger(__name__)
 
+# Client-side rate limiting is done by the shared rate governor, so botocore
+# only needs to retry.
 BOTO_CONFIG = Config(
-    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    retries={'max_attempts': 3, 'mode': 'standard'},
     connect_timeout=10,
     read_timeout=30,
 )
 
+_END_OF_STREAM = object()
+
+GLOBAL_REGION = 'global'
+
+# DescribeDomains accepts at most this many domain names per call.
+OPENSEARCH_DESCRIBE_BATCH_SIZE = 5
+
+# One entry per discoverer method. ``client`` is the boto3 service the method
+# calls (used for per-service concurrency caps); ``asset_types`` are the
+# Asset.AWSServiceType values it produces.
+ServiceSpec = namedtuple('ServiceSpec', ['key', 'method', 'client', 'asset_types', 'is_global'])
+DiscoveryUnit = namedtuple('DiscoveryUnit', ['spec', 'region'])
+
+
+class IncompleteUnitError(Exception):
+    """Some items of a unit could not be described.
+
+    Raised after the unit's other resources have been yielded, so they are
+    still ingested, but the unit is not treated as complete (and its stale
+    assets are not decommissioned).
+    """
+
+
+# Errors that will not go away by retrying (missing permissions, service not
+# enabled for the account).
+PERMANENT_ERROR_CODES = {
+    'AccessDenied', 'AccessDeniedException', 'UnauthorizedOperation', 'UnauthorizedException',
+    'AuthFailure', 'InvalidClientTokenId', 'UnrecognizedClientException',
+    'OptInRequired', 'SubscriptionRequiredException',
+}
+
+
+def is_retryable_error(error):
+    """Whether a failed unit is worth running again (throttling, timeouts, 5xx...)."""
+    if isinstance(error, deadlines.DeadlineExceeded):
+        # It would most likely run out of time again.
+        return False
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') not in PERMANENT_ERROR_CODES
+    return True
+
+
+# Marker placed on the resource stream after the last resource of a unit.
+# ``stats`` holds the unit's API counters (see ``telemetry.UnitStats.as_dict``).
+UnitResult = namedtuple('UnitResult', ['unit', 'error', 'resources', 'started_at', 'completed_at', 'stats'])
+
+SERVICES = [
+    ServiceSpec('s3', 'discover_s3_buckets', 's3', ('S3',), True),
+    ServiceSpec('cloudfront', 'discover_cloudfront_distributions', 'cloudfront', ('CLOUDFRONT',), True),
+    ServiceSpec('route53', 'discover_route53_hosted_zones', 'route53', ('ROUTE53',), True),
+    ServiceSpec('ec2', 'discover_ec2_instances', 'ec2', ('EC2',), False),
+    ServiceSpec('vpc', 'discover_vpcs', 'ec2', ('VPC',), False),
+    ServiceSpec('eks', 'discover_eks_clusters', 'eks', ('EKS',), False),
+    ServiceSpec('rds_clusters', 'discover_rds_clusters', 'rds', ('RDS',), False),
+    ServiceSpec('rds_instances', 'discover_rds_instances', 'rds', ('RDS',), False),
+    ServiceSpec('elasticache', 'discover_elasticache_clusters', 'elasticache', ('ELASTICACHE',), False),
+    ServiceSpec('elbv2', 'discover_load_balancers', 'elbv2', ('ALB', 'NLB'), False),
+    ServiceSpec('lambda', 'discover_lambda_functions', 'lambda', ('LAMBDA',), False),
+    ServiceSpec('ecr', 'discover_ecr_repositories', 'ecr', ('ECR',), False),
+    ServiceSpec('cognito', 'discover_cognito_user_pools', 'cognito-idp', ('COGNITO',), False),
+    ServiceSpec('opensearch', 'discover_opensearch_domains', 'opensearch', ('OPENSEARCH',), False),
+    ServiceSpec('msk', 'discover_msk_clusters', 'kafka', ('MSK',), False),
+]
+
+# Asset.AWSServiceType values a targeted scan can ask for.
+DISCOVERABLE_SERVICE_TYPES = sorted({t for spec in SERVICES for t in spec.asset_types})
+
+# Services whose discoverer method takes ``ids`` to describe only those
+# resources. The ids are passed as filters, so ids that no longer exist are
+# simply left out of the results.
+DESCRIBE_BY_ID_SERVICES = {'ec2', 'vpc', 'eks', 'rds_clusters', 'rds_instances', 'elbv2', 'lambda', 'ecr', 's3'}
+
 
 class AWSResourceDiscoverer:
-    def __init__(self, account: AWSAccount, root_session=None):
+    def __init__(self, account: AWSAccount, root_session=None, completed_units=None,
+                 regions=None, service_types=None, empty_units=None, config_aggregator=True,
+                 unit_durations=None, deadline=None):
         self.account = account
+        # (service key, region) pairs already finished by an earlier attempt.
+        self.completed_units = set(completed_units or ())
+        # Targeted scan filters; empty means every region / service.
+        self.regions = list(regions or ())
+        self.service_types = set(service_types or ())
+        # (service key, region) pairs that keep coming back empty; only
+        # skipped by untargeted scans.
+        self.empty_units = set(empty_units or ())
+        # (service key, region) -> typical run time in seconds, to plan the longest units first.
+        self.unit_durations = dict(unit_durations or {})
+        # End of the job's time budget (a datetime); units not started by then are cancelled.
+        self.deadline = deadline
+        # Units stopped by their deadline or the job budget.
+        self.timed_out_units = []
+        # Units left out of the plan: (unit, 'unavailable' | 'empty').
+        self.skipped_units = []
+        self._service_regions = {}
         self.root_session = root_session or self._build_management_session()
         self.session = self._get_session_for_account()
-        self.results = []
         self.errors = []
+        # "service.operation" -> [calls, total seconds, slowest call seconds]
+        self.call_timings = {}
+        self._timings_lock = threading.Lock()
+        self.tag_index = None
+        if getattr(settings, 'DISCOVERY_BULK_TAGS', True):
+            self.tag_index = TagIndex(
+                lambda region: self._client(self.session, 'resourcegroupstaggingapi', region)
+            )
+        # Incremental updates want the services' current state, not the aggregator's.
+        self.config_source = self._build_config_source() if config_aggregator else None
+
+    def _management_account(self):
+        if self.account.account_type == AWSAccount.AccountType.MANAGEMENT:
+            return self.account
+        return self.account.management_account
 
     def _build_management_session(self):
         """Build a session from management account credentials, falling back to default."""
-        if self.account.account_type == AWSAccount.AccountType.MANAGEMENT:
-            mgmt = self.account
-        else:
-            mgmt = self.account.management_account
+        return management_session(self._management_account())
 
-        if mgmt and mgmt.aws_access_key_id and mgmt.aws_secret_access_key:
-            return boto3.Session(
-                aws_access_key_id=mgmt.aws_access_key_id,
-                aws_secret_access_key=mgmt.aws_secret_access_key,
-            )
-        return boto3.Session()
+    def _build_config_source(self):
+        """The Config aggregator to read units from, if the management account uses one."""
+        mgmt = self._management_account()
+        if (
+            mgmt is None
+            or mgmt.discovery_backend != AWSAccount.DiscoveryBackend.CONFIG_AGGREGATOR
+            or not mgmt.config_aggregator_name
+        ):
+            return None
+        region = mgmt.config_aggregator_region or settings.AWS_DEFAULT_REGION
+        # The aggregator's API limits belong to the management account.
+        client = self._client(self.root_session, 'config', region, account_id=mgmt.account_id)
+        service_keys = [
+            spec.key for spec in SERVICES
+            if not self.service_types or not self.service_types.isdisjoint(spec.asset_types)
+        ]
+        return ConfigAggregatorSource(client, mgmt.config_aggregator_name, self.account.account_id, service_keys)
 
     def _get_session_for_account(self):
         if self.account.account_type == AWSAccount.AccountType.MANAGEMENT:
             return self.root_session
-        sts = self.root_session.client('sts', config=BOTO_CONFIG)
-        role_arn = f"arn:aws:iam::{self.account.account_id}:role/{self.account.organization_role_name}"
         try:
-            response = sts.assume_role(
-                RoleArn=role_arn,
-                RoleSessionName='TISAXAssetDiscovery',
-                DurationSeconds=3600,
-            )
-            creds = response['Credentials']
-            return boto3.Session(
-                aws_access_key_id=creds['AccessKeyId'],
-                aws_secret_access_key=creds['SecretAccessKey'],
-                aws_session_token=creds['SessionToken'],
-            )
+            return assumed_role_session(self.root_session, self.account)
         except Exception as e:
             logger.error(f"Failed to assume role for account {self.account.account_id}: {e}")
             raise
 
+    def _client(self, session, service, region_name, account_id=None):
+        client = client_pool.client(session, service, region_name=region_name, config=BOTO_CONFIG)
+        governor.attach(client, account_id or self.account.account_id)
+        deadlines.attach(client)
+        telemetry.attach(client)
+        return client
+
+    def _call(self, client, operation, **kwargs):
+        """Call ``client.<operation>(**kwargs)`` and record how long it took."""
+        name = f'{client.meta.service_model.service_name}.{operation}'
+        started = time.monotonic()
+        try:
+            return getattr(client, operation)(**kwargs)
+        finally:
+            elapsed = time.monotonic() - started
+            logger.debug(f"{name} took {elapsed:.3f}s")
+            with self._timings_lock:
+                stats = self.call_timings.setdefault(name, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+
+    def timing_summary(self):
+        """One line per timed operation: call count, average and slowest duration."""
+        with self._timings_lock:
+            items = sorted(self.call_timings.items(), key=lambda item: -item[1][1])
+        return [
+            f"{name}: {calls} call(s), avg {total / calls:.2f}s, max {slowest:.2f}s"
+            for name, (calls, total, slowest) in items
+        ]
+
     def discover_all_regions(self):
         # Per-account override takes priority
         account_regions = getattr(self.account, 'discovery_regions', None)
@@ -74,7 +216,7 @@ class AWSResourceDiscoverer:
             return list(configured)
         # Last resort: dynamic EC2 describe-regions
         try:
-            ec2 = self.session.client('ec2', region_name=settings.AWS_DEFAULT_REGION, config=BOTO_CONFIG)
+            ec2 = self._client(self.session, 'ec2', settings.AWS_DEFAULT_REGION)
             response = ec2.describe_regions(AllRegions=False)
             return [r['RegionName'] for r in response['Regions']]
         except Exception as e:
@@ -82,57 +224,194 @@ class AWSResourceDiscoverer:
             return [settings.AWS_DEFAULT_REGION]
 
     def discover_all_resources(self):
-        all_resources = []
-        # Global services first (not region-specific)
-        for method in [self.discover_s3_buckets, self.discover_cloudfront_distributions, self.discover_route53_hosted_zones]:
+        """Return every discovered resource as a list (see ``iter_resources``)."""
+        return list(self.iter_resources())
+
+    def iter_resources(self, with_markers=False):
+        """Yield discovered resources as the discoverer threads produce them.
+
+        Discovery runs in a background producer that pushes each resource onto
+        a bounded queue, so a slow consumer (e.g. the batched asset writer)
+        applies back-pressure instead of the whole account piling up in memory.
+        With ``with_markers`` a ``UnitResult`` follows the last resource of
+        each unit.
+        """
+        buffer = queue.Queue(maxsize=getattr(settings, 'DISCOVERY_QUEUE_SIZE', 1000))
+        stop = threading.Event()
+
+        def emit(resource):
+            while not stop.is_set():
+                try:
+                    buffer.put(resource, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
             try:
-                resources = method(self.session)
-                all_resources.extend(resources)
+                self._produce_resources(emit, stop)
             except Exception as e:
-                self.errors.append(f"{method.__name__}: {e}")
-                logger.error(f"Error in {method.__name__}: {e}")
-
-        # Regional services
-        regions = self.discover_all_regions()
-        max_workers = getattr(settings, 'DISCOVERY_CONCURRENT_REGIONS', 5)
-
-        def discover_region(region):
-            region_resources = []
-            regional_session = self.session
-            regional_methods = [
-                self.discover_ec2_instances,
-                self.discover_vpcs,
-                self.discover_eks_clusters,
-                self.discover_rds_clusters,
-                self.discover_rds_instances,
-                self.discover_elasticache_clusters,
-                self.discover_load_balancers,
-                self.discover_lambda_functions,
-                self.discover_ecr_repositories,
-                self.discover_cognito_user_pools,
-                self.discover_opensearch_domains,
-                self.discover_msk_clusters,
-            ]
-            for method in regional_methods:
-                try:
-                    resources = method(regional_session, region)
-                    region_resources.extend(resources)
-                except Exception as e:
-                    self.errors.append(f"{method.__name__} in {region}: {e}")
-                    logger.debug(f"Error in {method.__name__} for {region}: {e}")
-            return region_resources
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(discover_region, region): region for region in regions}
-            for future in as_completed(futures):
-                region = futures[future]
+                self.errors.append(f"Discovery: {e}")
+                logger.error(f"Discovery failed for {self.account.account_id}: {e}")
+            finally:
+                buffer.put(_END_OF_STREAM)
+
+        producer = threading.Thread(target=produce, name=f'discovery-{self.account.account_id}', daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = buffer.get()
+                if item is _END_OF_STREAM:
+                    break
+                if isinstance(item, UnitResult) and not with_markers:
+                    continue
+                yield item
+        finally:
+            stop.set()
+            # Unblock the producer if the consumer stopped early on a full queue.
+            while producer.is_alive():
                 try:
-                    all_resources.extend(future.result())
-                except Exception as e:
-                    self.errors.append(f"Region {region}: {e}")
-                    logger.error(f"Error discovering region {region}: {e}")
+                    buffer.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            producer.join()
+
+    def plan_units(self):
+        """Return the (service, region) units to run for this account.
+
+        A targeted scan only plans units producing one of ``service_types`` in
+        one of ``regions``. Global services have no region, so a scan
+        targeted at regions only includes them when they are asked for by
+        service type. Units are returned longest first according to
+        ``unit_durations``.
+        """
+        regions = self.regions or self.discover_all_regions()
+        units = []
+        for spec in SERVICES:
+            if self.service_types and self.service_types.isdisjoint(spec.asset_types):
+                continue
+            if spec.is_global:
+                if self.regions and not self.service_types:
+                    continue
+                units.append(DiscoveryUnit(spec, GLOBAL_REGION))
+            else:
+                units.extend(DiscoveryUnit(spec, region) for region in regions)
+
+        targeted = bool(self.regions or self.service_types)
+        planned = []
+        self.skipped_units = []
+        for unit in units:
+            key = (unit.spec.key, unit.region)
+            if key in self.completed_units:
+                continue
+            if not unit.spec.is_global and not self._offered_in(unit.spec.client, unit.region):
+                self.skipped_units.append((unit, 'unavailable'))
+            elif key in self.empty_units and not targeted:
+                self.skipped_units.append((unit, 'empty'))
+            else:
+                planned.append(unit)
+        return longest_first(planned, lambda unit: self.unit_durations.get((unit.spec.key, unit.region)))
+
+    def _offered_in(self, service, region):
+        """Whether botocore's endpoint data lists ``service`` in ``region``.
+
+        Services or regions newer than the bundled endpoint data are assumed
+        to be offered, so they are still scanned.
+        """
+        try:
+            partition = self.session.get_partition_for_region(region)
+        except Exception:
+            return True
+        offered = self._regions_offering(service, partition)
+        known = self._regions_offering('ec2', partition)
+        return not offered or region not in known or region in offered
+
+    def _regions_offering(self, service, partition):
+        cache_key = (service, partition)
+        if cache_key not in self._service_regions:
+            try:
+                regions = self.session.get_available_regions(service, partition_name=partition)
+            except Exception:
+                regions = []
+            self._service_regions[cache_key] = set(regions)
+        return self._service_regions[cache_key]
 
-        return all_resources
+    def run_unit(self, unit, emit, ids=None):
+        """Run a single discovery unit, passing each resource to ``emit``.
+
+        Units covered by a Config aggregator are read from it instead of the
+        service's own APIs. With ``ids`` (see ``DESCRIBE_BY_ID_SERVICES``) only
+        those resources of the unit are described. Returns the number of
+        resources emitted.
+        """
+        if ids is not None:
+            method = getattr(self, unit.spec.method)
+            args = (self.session,) if unit.spec.is_global else (self.session, unit.region)
+            resources = method(*args, ids=sorted(ids))
+        elif self.config_source is not None and self.config_source.covers(unit):
+            resources = self.config_source.resources(unit)
+        else:
+            method = getattr(self, unit.spec.method)
+            resources = method(*((self.session,) if unit.spec.is_global else (self.session, unit.region)))
+        count = 0
+        for resource in resources:
+            if not emit(resource):
+                break
+            count += 1
+        return count
+
+    def _produce_resources(self, emit, stop):
+        budget_end = None
+        if self.deadline is not None:
+            budget_end = time.monotonic() + (self.deadline - timezone.now()).total_seconds()
+        scheduler = UnitScheduler(
+            max_workers=getattr(settings, 'DISCOVERY_MAX_WORKERS', 10),
+            service_caps=getattr(settings, 'DISCOVERY_SERVICE_CONCURRENCY', {}),
+            stop_event=stop,
+            deadline=budget_end,
+        )
+
+        progress = {}
+
+        def work(unit):
+            stats = telemetry.UnitStats()
+            progress[unit] = [timezone.now(), 0, stats]
+            timeout = deadlines.unit_timeout(unit.spec.key, unit.region)
+            limits = [time.monotonic() + timeout if timeout else None, budget_end]
+            deadline = min((limit for limit in limits if limit is not None), default=None)
+            token = telemetry.current_stats.set(stats)
+            deadline_token = deadlines.current_deadline.set(deadline)
+            try:
+                progress[unit][1] = self.run_unit(unit, emit)
+            except deadlines.DeadlineExceeded:
+                raise
+            except Exception as e:
+                # Per-item fan-out reports a deadline as an incomplete unit.
+                if deadline is not None and time.monotonic() > deadline:
+                    raise deadlines.DeadlineExceeded('Unit deadline exceeded') from e
+                raise
+            finally:
+                deadlines.current_deadline.reset(deadline_token)
+                telemetry.current_stats.reset(token)
+
+        def on_done(unit, error):
+            if isinstance(error, deadlines.DeadlineExceeded):
+                self.timed_out_units.append(unit)
+            if error:
+                self.errors.append(f"{unit.spec.method} in {unit.region}: {error}")
+                logger.error(f"Error in {unit.spec.method} for {unit.region}: {error}")
+            if stop.is_set():
+                return
+            started_at, count, stats = progress.pop(unit, (None, 0, telemetry.UnitStats()))
+            emit(UnitResult(unit, error, count, started_at, timezone.now(), stats.as_dict()))
+
+        scheduler.run(
+            self.plan_units(),
+            work,
+            cap_key=lambda unit: unit.spec.client,
+            on_done=on_done,
+        )
 
     def _normalize_tags(self, tags_list):
         """Convert AWS tag list [{'Key': 'k', 'Value': 'v'}] to dict {'k': 'v'}."""
@@ -146,11 +425,40 @@ class AWSResourceDiscoverer:
         tags = self._normalize_tags(tags_list)
         return tags.get('Name', fallback)
 
-    def discover_ec2_instances(self, session, region):
-        resources = []
-        ec2 = session.client('ec2', region_name=region, config=BOTO_CONFIG)
+    def _raise_if_incomplete(self, what, failures):
+        if failures:
+            raise IncompleteUnitError(f"{len(failures)} {what} could not be described: {failures[0]}")
+
+    def _resource_tags(self, region, arn, fetch):
+        """Tags for ``arn`` from the bulk tag index, falling back to ``fetch()``."""
+        if self.tag_index is not None and arn:
+            tags = self.tag_index.lookup(region, arn)
+            if tags is not None:
+                return tags
+        try:
+            return fetch()
+        except Exception:
+            return {}
+
+    def _id_filters(self, name, ids):
+        return {'Filters': [{'Name': name, 'Values': list(ids)}]} if ids is not None else {}
+
+    def _by_id(self, ids, call, not_found):
+        """Responses of ``call(id)`` for each of ``ids``, leaving out ids that no longer exist.
+
+        ``not_found`` holds the error codes the service uses for a missing resource.
+        """
+        for resource_id in ids:
+            try:
+                yield call(resource_id)
+            except ClientError as e:
+                if e.response['Error']['Code'] not in not_found:
+                    raise
+
+    def discover_ec2_instances(self, session, region, ids=None):
+        ec2 = self._client(session, 'ec2', region)
         paginator = ec2.get_paginator('describe_instances')
-        for page in paginator.paginate():
+        for page in paginator.paginate(**self._id_filters('instance-id', ids)):
             for reservation in page['Reservations']:
                 for instance in reservation['Instances']:
                     tags = self._normalize_tags(instance.get('Tags', []))
@@ -169,7 +477,7 @@ class AWSResourceDiscoverer:
                     state = instance.get('State', {}).get('Name', 'unknown')
                     status = 'ACTIVE' if state == 'running' else 'INACTIVE' if state == 'stopped' else 'UNKNOWN'
 
-                    resources.append({
+                    yield {
                         'name': name,
                         'aws_service_type': 'EC2',
                         'aws_resource_id': instance['InstanceId'],
@@ -190,17 +498,15 @@ class AWSResourceDiscoverer:
                             'architecture': instance.get('Architecture'),
                             'key_name': instance.get('KeyName'),
                         },
-                    })
-        return resources
+                    }
 
-    def discover_vpcs(self, session, region):
-        resources = []
-        ec2 = session.client('ec2', region_name=region, config=BOTO_CONFIG)
-        response = ec2.describe_vpcs()
+    def discover_vpcs(self, session, region, ids=None):
+        ec2 = self._client(session, 'ec2', region)
+        response = ec2.describe_vpcs(**self._id_filters('vpc-id', ids))
         for vpc in response['Vpcs']:
             tags = self._normalize_tags(vpc.get('Tags', []))
             name = tags.get('Name', vpc['VpcId'])
-            resources.append({
+            yield {
                 'name': name,
                 'aws_service_type': 'VPC',
                 'aws_resource_id': vpc['VpcId'],
@@ -214,537 +520,514 @@ class AWSResourceDiscoverer:
                     'dhcp_options_id': vpc.get('DhcpOptionsId'),
                     'instance_tenancy': vpc.get('InstanceTenancy'),
                 },
-            })
-        return resources
+            }
 
-    def discover_eks_clusters(self, session, region):
-        resources = []
-        eks = session.client('eks', region_name=region, config=BOTO_CONFIG)
-        try:
-            cluster_names = eks.list_clusters()['clusters']
-        except Exception:
-            return resources
-        for cluster_name in cluster_names:
-            try:
-                cluster = eks.describe_cluster(name=cluster_name)['cluster']
-                tags = cluster.get('tags', {})
-                resources.append({
-                    'name': cluster_name,
-                    'aws_service_type': 'EKS',
-                    'aws_resource_id': cluster_name,
-                    'aws_resource_arn': cluster.get('arn', ''),
+    def discover_eks_clusters(self, session, region, ids=None):
+        eks = self._client(session, 'eks', region)
+        if ids is None:
+            paginator = eks.get_paginator('list_clusters')
+            cluster_names = (name for page in paginator.paginate() for name in page.get('clusters', []))
+        else:
+            cluster_names = ids
+        results = bounded_map(
+            lambda name: self._call(eks, 'describe_cluster', name=name)['cluster'],
+            cluster_names,
+            getattr(settings, 'DISCOVERY_DETAIL_WORKERS', 8),
+        )
+        failures = []
+        for cluster_name, cluster, error in results:
+            if isinstance(error, ClientError) and error.response['Error']['Code'] == 'ResourceNotFoundException':
+                # Deleted since it was listed (or named by a change event).
+                continue
+            if error:
+                logger.warning(f"Error describing EKS cluster {cluster_name} in {region}: {error}")
+                failures.append(error)
+                continue
+            yield {
+                'name': cluster_name,
+                'aws_service_type': 'EKS',
+                'aws_resource_id': cluster_name,
+                'aws_resource_arn': cluster.get('arn', ''),
+                'aws_region': region,
+                'status': 'ACTIVE' if cluster.get('status') == 'ACTIVE' else 'UNKNOWN',
+                'tags': cluster.get('tags', {}),
+                'metadata': {
+                    'version': cluster.get('version'),
+                    'platform_version': cluster.get('platformVersion'),
+                    'endpoint': cluster.get('endpoint'),
+                    'role_arn': cluster.get('roleArn'),
+                    'vpc_id': cluster.get('resourcesVpcConfig', {}).get('vpcId'),
+                    'created_at': str(cluster.get('createdAt', '')),
+                },
+                'dns_names': [cluster.get('endpoint', '')] if cluster.get('endpoint') else [],
+            }
+        self._raise_if_incomplete('EKS clusters', failures)
+
+    def discover_rds_clusters(self, session, region, ids=None):
+        rds = self._client(session, 'rds', region)
+        paginator = rds.get_paginator('describe_db_clusters')
+        for page in paginator.paginate(**self._id_filters('db-cluster-id', ids)):
+            for cluster in page['DBClusters']:
+                tags_response = cluster.get('TagList', [])
+                tags = self._normalize_tags(tags_response)
+                dns = []
+                if cluster.get('Endpoint'):
+                    dns.append(cluster['Endpoint'])
+                if cluster.get('ReaderEndpoint'):
+                    dns.append(cluster['ReaderEndpoint'])
+                yield {
+                    'name': cluster['DBClusterIdentifier'],
+                    'aws_service_type': 'RDS',
+                    'aws_resource_id': cluster['DBClusterIdentifier'],
+                    'aws_resource_arn': cluster.get('DBClusterArn', ''),
                     'aws_region': region,
-                    'status': 'ACTIVE' if cluster.get('status') == 'ACTIVE' else 'UNKNOWN',
+                    'status': 'ACTIVE' if cluster.get('Status') == 'available' else 'UNKNOWN',
+                    'dns_names': dns,
                     'tags': tags,
                     'metadata': {
-                        'version': cluster.get('version'),
-                        'platform_version': cluster.get('platformVersion'),
-                        'endpoint': cluster.get('endpoint'),
-                        'role_arn': cluster.get('roleArn'),
-                        'vpc_id': cluster.get('resourcesVpcConfig', {}).get('vpcId'),
-                        'created_at': str(cluster.get('createdAt', '')),
+                        'engine': cluster.get('Engine'),
+                        'engine_version': cluster.get('EngineVersion'),
+                        'storage_encrypted': cluster.get('StorageEncrypted'),
+                        'multi_az': cluster.get('MultiAZ'),
+                        'cluster_members': [m.get('DBInstanceIdentifier') for m in cluster.get('DBClusterMembers', [])],
+                        'created_at': str(cluster.get('ClusterCreateTime', '')),
                     },
-                    'dns_names': [cluster.get('endpoint', '')] if cluster.get('endpoint') else [],
-                })
-            except Exception as e:
-                logger.debug(f"Error describing EKS cluster {cluster_name}: {e}")
-        return resources
-
-    def discover_rds_clusters(self, session, region):
-        resources = []
-        rds = session.client('rds', region_name=region, config=BOTO_CONFIG)
-        paginator = rds.get_paginator('describe_db_clusters')
-        try:
-            for page in paginator.paginate():
-                for cluster in page['DBClusters']:
-                    tags_response = cluster.get('TagList', [])
-                    tags = self._normalize_tags(tags_response)
-                    dns = []
-                    if cluster.get('Endpoint'):
-                        dns.append(cluster['Endpoint'])
-                    if cluster.get('ReaderEndpoint'):
-                        dns.append(cluster['ReaderEndpoint'])
-                    resources.append({
-                        'name': cluster['DBClusterIdentifier'],
-                        'aws_service_type': 'RDS',
-                        'aws_resource_id': cluster['DBClusterIdentifier'],
-                        'aws_resource_arn': cluster.get('DBClusterArn', ''),
-                        'aws_region': region,
-                        'status': 'ACTIVE' if cluster.get('Status') == 'available' else 'UNKNOWN',
-                        'dns_names': dns,
-                        'tags': tags,
-                        'metadata': {
-                            'engine': cluster.get('Engine'),
-                            'engine_version': cluster.get('EngineVersion'),
-                            'storage_encrypted': cluster.get('StorageEncrypted'),
-                            'multi_az': cluster.get('MultiAZ'),
-                            'cluster_members': [m.get('DBInstanceIdentifier') for m in cluster.get('DBClusterMembers', [])],
-                            'created_at': str(cluster.get('ClusterCreateTime', '')),
-                        },
-                    })
-        except Exception as e:
-            logger.debug(f"Error discovering RDS clusters in {region}: {e}")
-        return resources
+                }
 
-    def discover_rds_instances(self, session, region):
-        resources = []
-        rds = session.client('rds', region_name=region, config=BOTO_CONFIG)
+    def discover_rds_instances(self, session, region, ids=None):
+        rds = self._client(session, 'rds', region)
         paginator = rds.get_paginator('describe_db_instances')
-        try:
-            for page in paginator.paginate():
-                for db in page['DBInstances']:
-                    if db.get('DBClusterIdentifier'):
-                        continue  # skip cluster members, covered by discover_rds_clusters
-                    tags = self._normalize_tags(db.get('TagList', []))
-                    dns = []
-                    if db.get('Endpoint', {}).get('Address'):
-                        dns.append(db['Endpoint']['Address'])
-                    resources.append({
-                        'name': db['DBInstanceIdentifier'],
-                        'aws_service_type': 'RDS',
-                        'aws_resource_id': db['DBInstanceIdentifier'],
-                        'aws_resource_arn': db.get('DBInstanceArn', ''),
-                        'aws_region': region,
-                        'status': 'ACTIVE' if db.get('DBInstanceStatus') == 'available' else 'UNKNOWN',
-                        'dns_names': dns,
-                        'tags': tags,
-                        'metadata': {
-                            'engine': db.get('Engine'),
-                            'engine_version': db.get('EngineVersion'),
-                            'instance_class': db.get('DBInstanceClass'),
-                            'storage_type': db.get('StorageType'),
-                            'allocated_storage': db.get('AllocatedStorage'),
-                            'multi_az': db.get('MultiAZ'),
-                            'storage_encrypted': db.get('StorageEncrypted'),
-                            'created_at': str(db.get('InstanceCreateTime', '')),
-                        },
-                    })
-        except Exception as e:
-            logger.debug(f"Error discovering RDS instances in {region}: {e}")
-        return resources
+        for page in paginator.paginate(**self._id_filters('db-instance-id', ids)):
+            for db in page['DBInstances']:
+                if db.get('DBClusterIdentifier'):
+                    continue  # skip cluster members, covered by discover_rds_clusters
+                tags = self._normalize_tags(db.get('TagList', []))
+                dns = []
+                if db.get('Endpoint', {}).get('Address'):
+                    dns.append(db['Endpoint']['Address'])
+                yield {
+                    'name': db['DBInstanceIdentifier'],
+                    'aws_service_type': 'RDS',
+                    'aws_resource_id': db['DBInstanceIdentifier'],
+                    'aws_resource_arn': db.get('DBInstanceArn', ''),
+                    'aws_region': region,
+                    'status': 'ACTIVE' if db.get('DBInstanceStatus') == 'available' else 'UNKNOWN',
+                    'dns_names': dns,
+                    'tags': tags,
+                    'metadata': {
+                        'engine': db.get('Engine'),
+                        'engine_version': db.get('EngineVersion'),
+                        'instance_class': db.get('DBInstanceClass'),
+                        'storage_type': db.get('StorageType'),
+                        'allocated_storage': db.get('AllocatedStorage'),
+                        'multi_az': db.get('MultiAZ'),
+                        'storage_encrypted': db.get('StorageEncrypted'),
+                        'created_at': str(db.get('InstanceCreateTime', '')),
+                    },
+                }
 
     def discover_elasticache_clusters(self, session, region):
-        resources = []
-        ec = session.client('elasticache', region_name=region, config=BOTO_CONFIG)
+        ec = self._client(session, 'elasticache', region)
         paginator = ec.get_paginator('describe_cache_clusters')
-        try:
-            for page in paginator.paginate(ShowCacheNodeInfo=True):
-                for cluster in page['CacheClusters']:
-                    dns = []
-                    if cluster.get('ConfigurationEndpoint', {}).get('Address'):
-                        dns.append(cluster['ConfigurationEndpoint']['Address'])
-                    for node in cluster.get('CacheNodes', []):
-                        if node.get('Endpoint', {}).get('Address'):
-                            dns.append(node['Endpoint']['Address'])
-                    resources.append({
-                        'name': cluster['CacheClusterId'],
-                        'aws_service_type': 'ELASTICACHE',
-                        'aws_resource_id': cluster['CacheClusterId'],
-                        'aws_resource_arn': cluster.get('ARN', ''),
-                        'aws_region': region,
-                        'status': 'ACTIVE' if cluster.get('CacheClusterStatus') == 'available' else 'UNKNOWN',
-                        'dns_names': dns,
-                        'tags': {},
-                        'metadata': {
-                            'engine': cluster.get('Engine'),
-                            'engine_version': cluster.get('EngineVersion'),
-                            'cache_node_type': cluster.get('CacheNodeType'),
-                            'num_cache_nodes': cluster.get('NumCacheNodes'),
-                            'created_at': str(cluster.get('CacheClusterCreateTime', '')),
-                        },
-                    })
-        except Exception as e:
-            logger.debug(f"Error discovering ElastiCache in {region}: {e}")
-        return resources
+        for page in paginator.paginate(ShowCacheNodeInfo=True):
+            for cluster in page['CacheClusters']:
+                dns = []
+                if cluster.get('ConfigurationEndpoint', {}).get('Address'):
+                    dns.append(cluster['ConfigurationEndpoint']['Address'])
+                for node in cluster.get('CacheNodes', []):
+                    if node.get('Endpoint', {}).get('Address'):
+                        dns.append(node['Endpoint']['Address'])
+                yield {
+                    'name': cluster['CacheClusterId'],
+                    'aws_service_type': 'ELASTICACHE',
+                    'aws_resource_id': cluster['CacheClusterId'],
+                    'aws_resource_arn': cluster.get('ARN', ''),
+                    'aws_region': region,
+                    'status': 'ACTIVE' if cluster.get('CacheClusterStatus') == 'available' else 'UNKNOWN',
+                    'dns_names': dns,
+                    'tags': {},
+                    'metadata': {
+                        'engine': cluster.get('Engine'),
+                        'engine_version': cluster.get('EngineVersion'),
+                        'cache_node_type': cluster.get('CacheNodeType'),
+                        'num_cache_nodes': cluster.get('NumCacheNodes'),
+                        'created_at': str(cluster.get('CacheClusterCreateTime', '')),
+                    },
+                }
 
-    def discover_load_balancers(self, session, region):
-        resources = []
-        elbv2 = session.client('elbv2', region_name=region, config=BOTO_CONFIG)
-        paginator = elbv2.get_paginator('describe_load_balancers')
-        try:
-            for page in paginator.paginate():
-                for lb in page['LoadBalancers']:
-                    lb_type = lb.get('Type', 'application')
-                    service_type = 'ALB' if lb_type == 'application' else 'NLB'
-                    dns = [lb['DNSName']] if lb.get('DNSName') else []
-                    # Get tags
-                    tags = {}
-                    try:
-                        tag_resp = elbv2.describe_tags(ResourceArns=[lb['LoadBalancerArn']])
-                        for desc in tag_resp.get('TagDescriptions', []):
-                            tags = self._normalize_tags(desc.get('Tags', []))
-                    except Exception:
-                        pass
-                    resources.append({
-                        'name': lb['LoadBalancerName'],
-                        'aws_service_type': service_type,
-                        'aws_resource_id': lb['LoadBalancerName'],
-                        'aws_resource_arn': lb.get('LoadBalancerArn', ''),
-                        'aws_region': region,
-                        'status': 'ACTIVE' if lb.get('State', {}).get('Code') == 'active' else 'UNKNOWN',
-                        'dns_names': dns,
-                        'tags': tags,
-                        'metadata': {
-                            'type': lb_type,
-                            'scheme': lb.get('Scheme'),
-                            'vpc_id': lb.get('VpcId'),
-                            'availability_zones': [az.get('ZoneName') for az in lb.get('AvailabilityZones', [])],
-                            'created_at': str(lb.get('CreatedTime', '')),
-                        },
-                    })
-        except Exception as e:
-            logger.debug(f"Error discovering load balancers in {region}: {e}")
-        return resources
+    def discover_load_balancers(self, session, region, ids=None):
+        elbv2 = self._client(session, 'elbv2', region)
+        if ids is None:
+            pages = elbv2.get_paginator('describe_load_balancers').paginate()
+        else:
+            pages = self._by_id(
+                ids, lambda name: elbv2.describe_load_balancers(Names=[name]), ('LoadBalancerNotFound',),
+            )
+        for page in pages:
+            for lb in page['LoadBalancers']:
+                lb_type = lb.get('Type', 'application')
+                service_type = 'ALB' if lb_type == 'application' else 'NLB'
+                dns = [lb['DNSName']] if lb.get('DNSName') else []
+                tags = self._resource_tags(region, lb['LoadBalancerArn'], lambda: self._normalize_tags(
+                    elbv2.describe_tags(ResourceArns=[lb['LoadBalancerArn']])
+                    ['TagDescriptions'][0].get('Tags', [])
+                ))
+                yield {
+                    'name': lb['LoadBalancerName'],
+                    'aws_service_type': service_type,
+                    'aws_resource_id': lb['LoadBalancerName'],
+                    'aws_resource_arn': lb.get('LoadBalancerArn', ''),
+                    'aws_region': region,
+                    'status': 'ACTIVE' if lb.get('State', {}).get('Code') == 'active' else 'UNKNOWN',
+                    'dns_names': dns,
+                    'tags': tags,
+                    'metadata': {
+                        'type': lb_type,
+                        'scheme': lb.get('Scheme'),
+                        'vpc_id': lb.get('VpcId'),
+                        'availability_zones': [az.get('ZoneName') for az in lb.get('AvailabilityZones', [])],
+                        'created_at': str(lb.get('CreatedTime', '')),
+                    },
+                }
 
-    def discover_lambda_functions(self, session, region):
-        resources = []
-        lam = session.client('lambda', region_name=region, config=BOTO_CONFIG)
-        paginator = lam.get_paginator('list_functions')
-        try:
-            for page in paginator.paginate():
-                for fn in page['Functions']:
-                    tags = fn.get('Tags', {}) or {}
-                    resources.append({
-                        'name': fn['FunctionName'],
-                        'aws_service_type': 'LAMBDA',
-                        'aws_resource_id': fn['FunctionName'],
-                        'aws_resource_arn': fn.get('FunctionArn', ''),
-                        'aws_region': region,
-                        'status': 'ACTIVE',
-                        'tags': tags if isinstance(tags, dict) else {},
-                        'metadata': {
-                            'runtime': fn.get('Runtime'),
-                            'handler': fn.get('Handler'),
-                            'memory_size': fn.get('MemorySize'),
-                            'timeout': fn.get('Timeout'),
-                            'last_modified': fn.get('LastModified'),
-                            'code_size': fn.get('CodeSize'),
-                            'description': fn.get('Description'),
-                        },
-                    })
-        except Exception as e:
-            logger.debug(f"Error discovering Lambda functions in {region}: {e}")
-        return resources
+    def discover_lambda_functions(self, session, region, ids=None):
+        lam = self._client(session, 'lambda', region)
+        if ids is None:
+            pages = lam.get_paginator('list_functions').paginate()
+        else:
+            pages = (
+                {'Functions': [dict(response['Configuration'], Tags=response.get('Tags', {}))]}
+                for response in self._by_id(
+                    ids, lambda name: lam.get_function(FunctionName=name), ('ResourceNotFoundException',),
+                )
+            )
+        for page in pages:
+            for fn in page['Functions']:
+                tags = fn.get('Tags', {}) or {}
+                yield {
+                    'name': fn['FunctionName'],
+                    'aws_service_type': 'LAMBDA',
+                    'aws_resource_id': fn['FunctionName'],
+                    'aws_resource_arn': fn.get('FunctionArn', ''),
+                    'aws_region': region,
+                    'status': 'ACTIVE',
+                    'tags': tags if isinstance(tags, dict) else {},
+                    'metadata': {
+                        'runtime': fn.get('Runtime'),
+                        'handler': fn.get('Handler'),
+                        'memory_size': fn.get('MemorySize'),
+                        'timeout': fn.get('Timeout'),
+                        'last_modified': fn.get('LastModified'),
+                        'code_size': fn.get('CodeSize'),
+                        'description': fn.get('Description'),
+                    },
+                }
 
-    def discover_ecr_repositories(self, session, region):
-        resources = []
-        ecr = session.client('ecr', region_name=region, config=BOTO_CONFIG)
-        paginator = ecr.get_paginator('describe_repositories')
-        try:
-            for page in paginator.paginate():
-                for repo in page['repositories']:
-                    name = repo['repositoryName']
-                    arn = repo.get('repositoryArn', '')
-                    uri = repo.get('repositoryUri', '')
-                    tags = {}
-                    try:
-                        tag_resp = ecr.list_tags_for_resource(resourceArn=arn)
-                        tags = self._normalize_tags(tag_resp.get('tags', []))
-                    except Exception:
-                        pass
-                    resources.append({
-                        'name': name,
-                        'aws_service_type': 'ECR',
-                        'aws_resource_id': name,
-                        'aws_resource_arn': arn,
-                        'aws_region': region,
-                        'url': f'https://{uri}' if uri else '',
-                        'status': 'ACTIVE',
-                        'dns_names': [uri] if uri else [],
-                        'tags': tags,
-                        'metadata': {
-                            'repository_uri': uri,
-                            'created_at': str(repo.get('createdAt', '')),
-                        },
-                    })
-        except Exception as e:
-            logger.debug(f"Error discovering ECR in {region}: {e}")
-        return resources
+    def discover_ecr_repositories(self, session, region, ids=None):
+        ecr = self._client(session, 'ecr', region)
+        if ids is None:
+            pages = ecr.get_paginator('describe_repositories').paginate()
+        else:
+            pages = self._by_id(
+                ids, lambda name: ecr.describe_repositories(repositoryNames=[name]),
+                ('RepositoryNotFoundException',),
+            )
+        for page in pages:
+            for repo in page['repositories']:
+                name = repo['repositoryName']
+                arn = repo.get('repositoryArn', '')
+                uri = repo.get('repositoryUri', '')
+                tags = self._resource_tags(region, arn, lambda: self._normalize_tags(
+                    ecr.list_tags_for_resource(resourceArn=arn).get('tags', [])
+                ))
+                yield {
+                    'name': name,
+                    'aws_service_type': 'ECR',
+                    'aws_resource_id': name,
+                    'aws_resource_arn': arn,
+                    'aws_region': region,
+                    'url': f'https://{uri}' if uri else '',
+                    'status': 'ACTIVE',
+                    'dns_names': [uri] if uri else [],
+                    'tags': tags,
+                    'metadata': {
+                        'repository_uri': uri,
+                        'created_at': str(repo.get('createdAt', '')),
+                    },
+                }
 
     def discover_cognito_user_pools(self, session, region):
-        resources = []
-        cognito = session.client('cognito-idp', region_name=region, config=BOTO_CONFIG)
-        try:
-            pools = []
-            kwargs = {'MaxResults': 60}
-            while True:
-                response = cognito.list_user_pools(**kwargs)
-                pools.extend(response.get('UserPools', []))
-                if 'NextToken' not in response:
-                    break
-                kwargs['NextToken'] = response['NextToken']
-            for pool in pools:
-                pool_id = pool['Id']
-                try:
-                    detail = cognito.describe_user_pool(UserPoolId=pool_id)['UserPool']
-                    resources.append({
-                        'name': pool['Name'],
-                        'aws_service_type': 'COGNITO',
-                        'aws_resource_id': pool_id,
-                        'aws_resource_arn': detail.get('Arn', ''),
-                        'aws_region': region,
-                        'status': 'ACTIVE',
-                        'tags': detail.get('UserPoolTags', {}),
-                        'metadata': {
-                            'estimated_users': detail.get('EstimatedNumberOfUsers'),
-                            'mfa_configuration': detail.get('MfaConfiguration'),
-                            'created_at': str(detail.get('CreationDate', '')),
-                            'last_modified': str(detail.get('LastModifiedDate', '')),
-                        },
-                    })
-                except Exception as e:
-                    logger.debug(f"Error describing Cognito pool {pool_id}: {e}")
-        except Exception as e:
-            logger.debug(f"Error discovering Cognito in {region}: {e}")
-        return resources
+        cognito = self._client(session, 'cognito-idp', region)
+        paginator = cognito.get_paginator('list_user_pools')
+        pools = (pool for page in paginator.paginate(MaxResults=60) for pool in page.get('UserPools', []))
+        results = bounded_map(
+            lambda pool: self._call(cognito, 'describe_user_pool', UserPoolId=pool['Id'])['UserPool'],
+            pools,
+            getattr(settings, 'DISCOVERY_DETAIL_WORKERS', 8),
+        )
+        failures = []
+        for pool, detail, error in results:
+            if error:
+                logger.warning(f"Error describing Cognito pool {pool['Id']} in {region}: {error}")
+                failures.append(error)
+                continue
+            yield {
+                'name': pool['Name'],
+                'aws_service_type': 'COGNITO',
+                'aws_resource_id': pool['Id'],
+                'aws_resource_arn': detail.get('Arn', ''),
+                'aws_region': region,
+                'status': 'ACTIVE',
+                'tags': detail.get('UserPoolTags', {}),
+                'metadata': {
+                    'estimated_users': detail.get('EstimatedNumberOfUsers'),
+                    'mfa_configuration': detail.get('MfaConfiguration'),
+                    'created_at': str(detail.get('CreationDate', '')),
+                    'last_modified': str(detail.get('LastModifiedDate', '')),
+                },
+            }
+        self._raise_if_incomplete('Cognito user pools', failures)
 
     def discover_opensearch_domains(self, session, region):
-        resources = []
-        opensearch = session.client('opensearch', region_name=region, config=BOTO_CONFIG)
-        try:
-            domain_names = opensearch.list_domain_names().get('DomainNames', [])
-            for dn in domain_names:
-                domain_name = dn['DomainName']
-                try:
-                    domain = opensearch.describe_domain(DomainName=domain_name)['DomainStatus']
-                    dns = []
-                    if domain.get('Endpoint'):
-                        dns.append(domain['Endpoint'])
-                    if domain.get('Endpoints'):
-                        dns.extend(domain['Endpoints'].values())
-                    # Get tags
-                    tags = {}
-                    if domain.get('ARN'):
-                        try:
-                            tag_resp = opensearch.list_tags(ARN=domain['ARN'])
-                            tags = self._normalize_tags(tag_resp.get('TagList', []))
-                        except Exception:
-                            pass
-                    resources.append({
-                        'name': domain_name,
-                        'aws_service_type': 'OPENSEARCH',
-                        'aws_resource_id': domain_name,
-                        'aws_resource_arn': domain.get('ARN', ''),
-                        'aws_region': region,
-                        'status': 'ACTIVE' if not domain.get('Deleted', False) else 'INACTIVE',
-                        'dns_names': dns,
-                        'tags': tags,
-                        'metadata': {
-                            'engine_version': domain.get('EngineVersion'),
-                            'instance_type': domain.get('ClusterConfig', {}).get('InstanceType'),
-                            'instance_count': domain.get('ClusterConfig', {}).get('InstanceCount'),
-                            'ebs_enabled': domain.get('EBSOptions', {}).get('EBSEnabled'),
-                            'encryption_at_rest': domain.get('EncryptionAtRestOptions', {}).get('Enabled'),
-                            'created': domain.get('Created'),
-                        },
-                    })
-                except Exception as e:
-                    logger.debug(f"Error describing OpenSearch domain {domain_name}: {e}")
-        except Exception as e:
-            logger.debug(f"Error discovering OpenSearch in {region}: {e}")
-        return resources
+        opensearch = self._client(session, 'opensearch', region)
+        domain_names = [dn['DomainName'] for dn in opensearch.list_domain_names().get('DomainNames', [])]
+        batches = [
+            domain_names[start:start + OPENSEARCH_DESCRIBE_BATCH_SIZE]
+            for start in range(0, len(domain_names), OPENSEARCH_DESCRIBE_BATCH_SIZE)
+        ]
+        results = bounded_map(
+            lambda batch: self._call(opensearch, 'describe_domains', DomainNames=batch)['DomainStatusList'],
+            batches,
+            getattr(settings, 'DISCOVERY_DETAIL_WORKERS', 8),
+        )
+        failures = []
+        for batch, domains, error in results:
+            if error:
+                logger.warning(f"Error describing OpenSearch domains {batch} in {region}: {error}")
+                failures.append(error)
+                continue
+            for domain in domains:
+                yield self._opensearch_resource(opensearch, region, domain)
+        self._raise_if_incomplete('OpenSearch domain batches', failures)
+
+    def _opensearch_resource(self, opensearch, region, domain):
+        domain_name = domain['DomainName']
+        dns = []
+        if domain.get('Endpoint'):
+            dns.append(domain['Endpoint'])
+        if domain.get('Endpoints'):
+            dns.extend(domain['Endpoints'].values())
+        tags = {}
+        if domain.get('ARN'):
+            tags = self._resource_tags(region, domain['ARN'], lambda: self._normalize_tags(
+                opensearch.list_tags(ARN=domain['ARN']).get('TagList', [])
+            ))
+        return {
+            'name': domain_name,
+            'aws_service_type': 'OPENSEARCH',
+            'aws_resource_id': domain_name,
+            'aws_resource_arn': domain.get('ARN', ''),
+            'aws_region': region,
+            'status': 'ACTIVE' if not domain.get('Deleted', False) else 'INACTIVE',
+            'dns_names': dns,
+            'tags': tags,
+            'metadata': {
+                'engine_version': domain.get('EngineVersion'),
+                'instance_type': domain.get('ClusterConfig', {}).get('InstanceType'),
+                'instance_count': domain.get('ClusterConfig', {}).get('InstanceCount'),
+                'ebs_enabled': domain.get('EBSOptions', {}).get('EBSEnabled'),
+                'encryption_at_rest': domain.get('EncryptionAtRestOptions', {}).get('Enabled'),
+                'created': domain.get('Created'),
+            },
+        }
 
     def discover_msk_clusters(self, session, region):
-        resources = []
-        kafka = session.client('kafka', region_name=region, config=BOTO_CONFIG)
-        try:
-            paginator = kafka.get_paginator('list_clusters_v2')
-            for page in paginator.paginate():
-                for cluster in page.get('ClusterInfoList', []):
-                    name = cluster.get('ClusterName', '')
-                    arn = cluster.get('ClusterArn', '')
-                    tags = cluster.get('Tags', {}) or {}
-                    # Get broker endpoints if provisioned
-                    dns = []
-                    provisioned = cluster.get('Provisioned', {})
-                    serverless = cluster.get('Serverless', {})
-                    metadata = {
-                        'cluster_type': cluster.get('ClusterType'),
-                        'state': cluster.get('State'),
-                        'created_at': str(cluster.get('CreationTime', '')),
-                    }
-                    if provisioned:
-                        metadata.update({
-                            'kafka_version': provisioned.get('CurrentBrokerSoftwareInfo', {}).get('KafkaVersion'),
-                            'broker_type': provisioned.get('BrokerNodeGroupInfo', {}).get('InstanceType'),
-                            'number_of_broker_nodes': provisioned.get('NumberOfBrokerNodes'),
-                            'enhanced_monitoring': provisioned.get('EnhancedMonitoring'),
-                            'storage_mode': provisioned.get('StorageMode'),
-                        })
-                    state = cluster.get('State', '')
-                    status = 'ACTIVE' if state == 'ACTIVE' else 'INACTIVE' if state == 'DELETING' else 'UNKNOWN'
-                    resources.append({
-                        'name': name,
-                        'aws_service_type': 'MSK',
-                        'aws_resource_id': name,
-                        'aws_resource_arn': arn,
-                        'aws_region': region,
-                        'status': status,
-                        'dns_names': dns,
-                        'tags': tags,
-                        'metadata': metadata,
+        kafka = self._client(session, 'kafka', region)
+        paginator = kafka.get_paginator('list_clusters_v2')
+        for page in paginator.paginate():
+            for cluster in page.get('ClusterInfoList', []):
+                name = cluster.get('ClusterName', '')
+                arn = cluster.get('ClusterArn', '')
+                tags = cluster.get('Tags', {}) or {}
+                # Get broker endpoints if provisioned
+                dns = []
+                provisioned = cluster.get('Provisioned', {})
+                serverless = cluster.get('Serverless', {})
+                metadata = {
+                    'cluster_type': cluster.get('ClusterType'),
+                    'state': cluster.get('State'),
+                    'created_at': str(cluster.get('CreationTime', '')),
+                }
+                if provisioned:
+                    metadata.update({
+                        'kafka_version': provisioned.get('CurrentBrokerSoftwareInfo', {}).get('KafkaVersion'),
+                        'broker_type': provisioned.get('BrokerNodeGroupInfo', {}).get('InstanceType'),
+                        'number_of_broker_nodes': provisioned.get('NumberOfBrokerNodes'),
+                        'enhanced_monitoring': provisioned.get('EnhancedMonitoring'),
+                        'storage_mode': provisioned.get('StorageMode'),
                     })
-        except Exception as e:
-            logger.debug(f"Error discovering MSK in {region}: {e}")
-        return resources
-
-    def discover_s3_buckets(self, session):
-        resources = []
-        s3 = session.client('s3', region_name=settings.AWS_DEFAULT_REGION, config=BOTO_CONFIG)
-        try:
-            buckets = s3.list_buckets().get('Buckets', [])
-            for bucket in buckets:
-                bucket_name = bucket.get('Name') or bucket.get('BucketName')
-                region = settings.AWS_DEFAULT_REGION
-                try:
-                    loc = s3.get_bucket_location(Bucket=bucket_name)
-                    region = loc.get('LocationConstraint') or 'us-east-1'
-                except Exception:
-                    pass
-                tags = {}
-                try:
-                    tag_resp = s3.get_bucket_tagging(Bucket=bucket_name)
-                    tags = self._normalize_tags(tag_resp.get('TagSet', []))
-                except Exception:
-                    pass
-                dns = [f'{bucket_name}.s3.{region}.amazonaws.com']
-                resources.append({
-                    'name': bucket_name,
-                    'aws_service_type': 'S3',
-                    'aws_resource_id': bucket_name,
-                    'aws_resource_arn': f"arn:aws:s3:::{bucket_name}",
+                state = cluster.get('State', '')
+                status = 'ACTIVE' if state == 'ACTIVE' else 'INACTIVE' if state == 'DELETING' else 'UNKNOWN'
+                yield {
+                    'name': name,
+                    'aws_service_type': 'MSK',
+                    'aws_resource_id': name,
+                    'aws_resource_arn': arn,
                     'aws_region': region,
-                    'url': f's3://{bucket_name}',
+                    'status': status,
                     'dns_names': dns,
-                    'status': 'ACTIVE',
                     'tags': tags,
-                    'metadata': {
-                        'created_at': str(bucket.get('CreationDate', '')),
-                    },
-                })
-        except Exception as e:
-            logger.debug(f"Error discovering S3 buckets: {e}")
-        return resources
-
-    def discover_cloudfront_distributions(self, session):
-        resources = []
-        cf = session.client('cloudfront', region_name='us-east-1', config=BOTO_CONFIG)
-        try:
-            paginator = cf.get_paginator('list_distributions')
-            for page in paginator.paginate():
-                dist_list = page.get('DistributionList', {})
-                for dist in dist_list.get('Items', []):
-                    dns = [dist['DomainName']] if dist.get('DomainName') else []
-                    if dist.get('Aliases', {}).get('Items'):
-                        dns.extend(dist['Aliases']['Items'])
-                    tags = {}
-                    try:
-                        tag_resp = cf.list_tags_for_resource(Resource=dist['ARN'])
-                        tags = self._normalize_tags(tag_resp.get('Tags', {}).get('Items', []))
-                    except Exception:
-                        pass
-                    resources.append({
-                        'name': dist.get('Comment', dist['Id']) or dist['Id'],
-                        'aws_service_type': 'CLOUDFRONT',
-                        'aws_resource_id': dist['Id'],
-                        'aws_resource_arn': dist.get('ARN', ''),
-                        'aws_region': 'global',
-                        'status': 'ACTIVE' if dist.get('Enabled') else 'INACTIVE',
-                        'dns_names': dns,
-                        'tags': tags,
-                        'metadata': {
-                            'status': dist.get('Status'),
-                            'price_class': dist.get('PriceClass'),
-                            'http_version': dist.get('HttpVersion'),
-                            'is_ipv6_enabled': dist.get('IsIPV6Enabled'),
-                            'web_acl_id': dist.get('WebACLId'),
-                        },
-                    })
-        except Exception as e:
-            logger.debug(f"Error discovering CloudFront: {e}")
-        return resources
+                    'metadata': metadata,
+                }
 
-    def discover_route53_hosted_zones(self, session):
-        resources = []
-        r53 = session.client('route53', region_name='us-east-1', config=BOTO_CONFIG)
-        try:
-            paginator = r53.get_paginator('list_hosted_zones')
-            for page in paginator.paginate():
-                for zone in page['HostedZones']:
-                    zone_id = zone['Id'].split('/')[-1]
-                    tags = {}
-                    try:
-                        tag_resp = r53.list_tags_for_resource(ResourceType='hostedzone', ResourceId=zone_id)
-                        tags = self._normalize_tags(tag_resp.get('ResourceTagSet', {}).get('Tags', []))
-                    except Exception:
-                        pass
-                    resources.append({
-                        'name': zone['Name'].rstrip('.'),
-                        'aws_service_type': 'ROUTE53',
-                        'aws_resource_id': zone_id,
-                        'aws_resource_arn': f"arn:aws:route53:::hostedzone/{zone_id}",
-                        'aws_region': 'global',
-                        'status': 'ACTIVE',
-                        'tags': tags,
-                        'metadata': {
-                            'record_count': zone.get('ResourceRecordSetCount'),
-                            'is_private': zone.get('Config', {}).get('PrivateZone', False),
-                            'comment': zone.get('Config', {}).get('Comment', ''),
-                        },
-                    })
-        except Exception as e:
-            logger.debug(f"Error discovering Route53: {e}")
-        return resources
-
-    def upsert_asset(self, resource_dict, account):
-        now = timezone.now()
-        arn = resource_dict.get('aws_resource_arn', '')
-        resource_id = resource_dict.get('aws_resource_id', '')
-        region = resource_dict.get('aws_region', '')
-
-        lookup = {}
-        if arn:
-            lookup = {'aws_resource_arn': arn}
-        elif resource_id and region:
-            lookup = {
-                'aws_resource_id': resource_id,
-                'aws_account': account,
-                'aws_region': region,
-            }
+    def discover_s3_buckets(self, session, ids=None):
+        s3 = self._client(session, 's3', settings.AWS_DEFAULT_REGION)
+        if s3.can_paginate('list_buckets'):
+            paginator = s3.get_paginator('list_buckets')
+            buckets = (b for page in paginator.paginate() for b in page.get('Buckets', []))
         else:
-            lookup = {
-                'name': resource_dict.get('name', ''),
-                'aws_account': account,
-                'aws_service_type': resource_dict.get('aws_service_type', ''),
-            }
+            # botocore < 1.35 lists every bucket at once and without BucketRegion.
+            buckets = s3.list_buckets().get('Buckets', [])
+        if ids is not None:
+            # Listing is cheap; only the named buckets are described.
+            wanted = set(ids)
+            buckets = (b for b in buckets if b.get('Name') in wanted)
+        results = bounded_map(
+            lambda bucket: self._describe_s3_bucket(session, s3, bucket),
+            buckets,
+            getattr(settings, 'DISCOVERY_S3_WORKERS', 8),
+        )
+        failures = []
+        for bucket, resource, error in results:
+            if error:
+                logger.warning(f"Error describing S3 bucket {bucket.get('Name')}: {error}")
+                failures.append(error)
+                continue
+            yield resource
+        self._raise_if_incomplete('S3 buckets', failures)
 
-        defaults = {
-            'name': resource_dict.get('name', ''),
-            'asset_type': 'AWS_SERVICE',
-            'aws_account': account,
-            'aws_region': region,
-            'aws_resource_id': resource_id,
+    def _describe_s3_bucket(self, session, s3, bucket):
+        bucket_name = bucket.get('Name') or bucket.get('BucketName')
+        region = bucket.get('BucketRegion')
+        if not region:
+            region = settings.AWS_DEFAULT_REGION
+            try:
+                loc = s3.get_bucket_location(Bucket=bucket_name)
+                region = loc.get('LocationConstraint') or 'us-east-1'
+            except Exception:
+                pass
+        regional = self._client(session, 's3', region)
+        arn = f"arn:aws:s3:::{bucket_name}"
+        tags = self._resource_tags(region, arn, lambda: self._normalize_tags(
+            regional.get_bucket_tagging(Bucket=bucket_name).get('TagSet', [])
+        ))
+        metadata = {
+            'created_at': str(bucket.get('CreationDate', '')),
+        }
+        if getattr(settings, 'DISCOVERY_S3_SECURITY_SETTINGS', False):
+            metadata.update(self._s3_bucket_security(regional, bucket_name))
+        return {
+            'name': bucket_name,
+            'aws_service_type': 'S3',
+            'aws_resource_id': bucket_name,
             'aws_resource_arn': arn,
-            'aws_service_type': resource_dict.get('aws_service_type', ''),
-            'status': resource_dict.get('status', 'UNKNOWN'),
-            'metadata': resource_dict.get('metadata', {}),
-            'ip_addresses': resource_dict.get('ip_addresses', []),
-            'dns_names': resource_dict.get('dns_names', []),
-            'url': resource_dict.get('url', ''),
-            'tags': resource_dict.get('tags', {}),
-            'last_seen_at': now,
+            'aws_region': region,
+            'url': f's3://{bucket_name}',
+            'dns_names': [f'{bucket_name}.s3.{region}.amazonaws.com'],
+            'status': 'ACTIVE',
+            'tags': tags,
+            'metadata': metadata,
         }
 
+    def _s3_bucket_security(self, s3, bucket_name):
+        """Encryption, versioning and public access block settings of a bucket.
+
+        Settings that cannot be read (e.g. missing permissions) are left out.
+        """
+        security = {}
         try:
-            asset, created = Asset.objects.update_or_create(defaults=defaults, **lookup)
-            if created:
-                asset.discovered_at = now
-                asset.save(update_fields=['discovered_at'])
-            return asset, created
-        except Asset.MultipleObjectsReturned:
-            # Handle duplicates: update the first match
-            asset = Asset.objects.filter(**lookup).first()
-            for key, value in defaults.items():
-                setattr(asset, key, value)
-            asset.save()
-            return asset, False
+            rules = s3.get_bucket_encryption(Bucket=bucket_name)['ServerSideEncryptionConfiguration']['Rules']
+            default = rules[0].get('ApplyServerSideEncryptionByDefault', {}) if rules else {}
+            security['encryption'] = default.get('SSEAlgorithm')
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ServerSideEncryptionConfigurationNotFoundError':
+                security['encryption'] = None
+        try:
+            security['versioning'] = s3.get_bucket_versioning(Bucket=bucket_name).get('Status', 'Disabled')
+        except ClientError:
+            pass
+        try:
+            config = s3.get_public_access_block(Bucket=bucket_name)['PublicAccessBlockConfiguration']
+            security['public_access_block'] = config
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchPublicAccessBlockConfiguration':
+                security['public_access_block'] = None
+        return security
+
+    def discover_cloudfront_distributions(self, session):
+        cf = self._client(session, 'cloudfront', 'us-east-1')
+        paginator = cf.get_paginator('list_distributions')
+        for page in paginator.paginate():
+            dist_list = page.get('DistributionList', {})
+            for dist in dist_list.get('Items', []):
+                dns = [dist['DomainName']] if dist.get('DomainName') else []
+                if dist.get('Aliases', {}).get('Items'):
+                    dns.extend(dist['Aliases']['Items'])
+                tags = self._resource_tags('us-east-1', dist.get('ARN', ''), lambda: self._normalize_tags(
+                    cf.list_tags_for_resource(Resource=dist['ARN']).get('Tags', {}).get('Items', [])
+                ))
+                yield {
+                    'name': dist.get('Comment', dist['Id']) or dist['Id'],
+                    'aws_service_type': 'CLOUDFRONT',
+                    'aws_resource_id': dist['Id'],
+                    'aws_resource_arn': dist.get('ARN', ''),
+                    'aws_region': 'global',
+                    'status': 'ACTIVE' if dist.get('Enabled') else 'INACTIVE',
+                    'dns_names': dns,
+                    'tags': tags,
+                    'metadata': {
+                        'status': dist.get('Status'),
+                        'price_class': dist.get('PriceClass'),
+                        'http_version': dist.get('HttpVersion'),
+                        'is_ipv6_enabled': dist.get('IsIPV6Enabled'),
+                        'web_acl_id': dist.get('WebACLId'),
+                    },
+                }
+
+    def discover_route53_hosted_zones(self, session):
+        r53 = self._client(session, 'route53', 'us-east-1')
+        paginator = r53.get_paginator('list_hosted_zones')
+        for page in paginator.paginate():
+            zones = page['HostedZones']
+            tags_by_zone = self._route53_zone_tags(r53, [z['Id'].split('/')[-1] for z in zones])
+            for zone in zones:
+                zone_id = zone['Id'].split('/')[-1]
+                tags = tags_by_zone.get(zone_id, {})
+                yield {
+                    'name': zone['Name'].rstrip('.'),
+                    'aws_service_type': 'ROUTE53',
+                    'aws_resource_id': zone_id,
+                    'aws_resource_arn': f"arn:aws:route53:::hostedzone/{zone_id}",
+                    'aws_region': 'global',
+                    'status': 'ACTIVE',
+                    'tags': tags,
+                    'metadata': {
+                        'record_count': zone.get('ResourceRecordSetCount'),
+                        'is_private': zone.get('Config', {}).get('PrivateZone', False),
+                        'comment': zone.get('Config', {}).get('Comment', ''),
+                    },
+                }
+
+    def _route53_zone_tags(self, r53, zone_ids):
+        """Fetch tags for hosted zones in batches of ``ROUTE53_TAG_BATCH_SIZE``."""
+        tags_by_zone = {}
+        for start in range(0, len(zone_ids), ROUTE53_TAG_BATCH_SIZE):
+            batch = zone_ids[start:start + ROUTE53_TAG_BATCH_SIZE]
+            try:
+                tag_resp = r53.list_tags_for_resources(ResourceType='hostedzone', ResourceIds=batch)
+            except Exception as e:
+                logger.debug(f"Error listing Route53 tags: {e}")
+                continue
+            for tag_set in tag_resp.get('ResourceTagSets', []):
+                tags_by_zone[tag_set['ResourceId']] = self._normalize_tags(tag_set.get('Tags', []))
+        return tags_by_zone
@@ -1,32 +1,48 @@
 import logging
 
 from celery import shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Q
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from accounts.models import AWSAccount
-from assets.models import Asset, DiscoveryJob
+from assets.models import DiscoveryJob
+from discovery import events
+from discovery.models import DiscoveryLogEntry, DiscoveryShard, DiscoveryUnitHistory, DiscoveryUnitRun
+from discovery.serializers import DiscoveryUnitRunSerializer
 
 logger = logging.getLogger(__name__)
 
+ERROR = DiscoveryLogEntry.Level.ERROR
+WARNING = DiscoveryLogEntry.Level.WARNING
 
-@shared_task(acks_late=True, time_limit=1800)
-def run_discovery_task(job_id):
-    """Execute a discovery job inside the Celery worker."""
-    from discovery.aws_discoverer import AWSResourceDiscoverer
+# Keys of the ``progress`` event, in the order ``AssetIngestor`` reports counts.
+PROGRESS_FIELDS = ('resources_discovered', 'resources_new', 'resources_updated', 'resources_unchanged')
+
+# Delay before a shard with failed units is re-run.
+UNIT_RETRY_COUNTDOWN = 60
+
+# Log entries deleted per statement when pruning old job logs.
+PRUNE_BATCH_SIZE = 10000
 
+
+@shared_task(acks_late=True, time_limit=300)
+def run_discovery_task(job_id):
+    """Start a discovery job by fanning out one shard task per account."""
     job = DiscoveryJob.objects.get(pk=job_id)
     job.status = DiscoveryJob.Status.RUNNING
     job.started_at = timezone.now()
     job.save(update_fields=['status', 'started_at'])
-
-    total_discovered = 0
-    total_new = 0
-    total_updated = 0
-    total_decommissioned = 0
-    log_lines = []
+    events.publish_job(job)
 
     try:
-        if job.aws_account_id:
+        target_ids = list(job.target_accounts.values_list('id', flat=True))
+        if target_ids:
+            accounts = AWSAccount.objects.filter(id__in=target_ids, is_active=True)
+        elif job.aws_account_id:
             accounts = AWSAccount.objects.filter(id=job.aws_account_id, is_active=True)
         else:
             accounts = AWSAccount.objects.filter(is_active=True)
@@ -35,82 +51,425 @@ def run_discovery_task(job_id):
             job.status = DiscoveryJob.Status.FAILED
             job.error_message = 'No active accounts found'
             job.completed_at = timezone.now()
-            job.save()
+            job.save(update_fields=['status', 'error_message', 'completed_at'])
+            events.publish_job(job)
             return
 
-        def flush_logs():
-            job.log_output = '\n'.join(log_lines)
-            job.save(update_fields=['log_output'])
-
+        # Redelivered tasks reuse the shards created by the first delivery.
         for account in accounts:
-            discovery_start = timezone.now()
-            log_lines.append(f"Starting discovery for {account.account_name} ({account.account_id})")
-            flush_logs()
-            try:
-                discoverer = AWSResourceDiscoverer(account)
-                resources = discoverer.discover_all_resources()
-                log_lines.append(f"  Found {len(resources)} resources")
-
-                new_count = 0
-                updated_count = 0
-                for resource in resources:
-                    asset, created = discoverer.upsert_asset(resource, account)
-                    if created:
-                        new_count += 1
-                    else:
-                        updated_count += 1
-
-                # Mark stale assets as DECOMMISSIONED
-                stale_assets = Asset.objects.filter(
-                    aws_account=account,
-                    asset_type='AWS_SERVICE',
-                    last_seen_at__lt=discovery_start,
-                ).exclude(
-                    status='DECOMMISSIONED',
-                )
-                decom_count = stale_assets.update(status='DECOMMISSIONED')
-                total_decommissioned += decom_count
+            shard, created = DiscoveryShard.objects.get_or_create(job=job, aws_account=account)
+            if created:
+                shard.predicted_duration_seconds = _predict_shard_seconds(job, account)
+                shard.save(update_fields=['predicted_duration_seconds'])
+        predictions = list(job.shards.values_list('predicted_duration_seconds', flat=True))
+        if predictions and None not in predictions:
+            # Accounts run in parallel, so the job takes as long as the slowest one.
+            job.predicted_duration_seconds = max(predictions)
+            job.save(update_fields=['predicted_duration_seconds'])
+
+        # Queue the accounts expected to take longest first (and new ones before those).
+        pending = list(job.shards.filter(status=DiscoveryShard.Status.PENDING).order_by(
+            F('predicted_duration_seconds').desc(nulls_first=True),
+        ).values_list('id', flat=True))
+        job.append_log(f"Queued discovery for {len(pending)} account(s)")
+        if job.predicted_duration_seconds is not None:
+            job.append_log(f"Predicted duration: {_format_seconds(job.predicted_duration_seconds)}")
+        for shard_id in pending:
+            discover_account_task.delay(str(shard_id))
+        if not pending:
+            finalize_discovery_task.delay(str(job.id))
 
-                total_discovered += len(resources)
-                total_new += new_count
-                total_updated += updated_count
-
-                account.last_discovery_at = timezone.now()
-                account.save(update_fields=['last_discovery_at'])
+    except Exception as e:
+        job.status = DiscoveryJob.Status.FAILED
+        job.error_message = str(e)
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'completed_at'])
+        events.publish_job(job)
+        logger.error(f"Discovery job failed: {e}")
 
-                log_lines.append(f"  New: {new_count}, Updated: {updated_count}, Decommissioned: {decom_count}")
 
-                if discoverer.errors:
-                    for err in discoverer.errors:
-                        log_lines.append(f"  Warning: {err}")
+@shared_task(acks_late=True, soft_time_limit=1740, time_limit=1800)
+def discover_account_task(shard_id, continuation=False):
+    """Discover and ingest a single account's resources for a discovery job.
 
-                flush_logs()
+    Each (service, region) unit is checkpointed as a DiscoveryUnitRun once its
+    resources are written. A redelivered or re-queued task resumes the shard,
+    skipping completed units and units that failed for good. Units that
+    failed with a retryable error are re-run in a follow-up task; only
+    completed units are later decommissioned.
 
-            except Exception as e:
-                log_lines.append(f"  ERROR: {e}")
-                logger.error(f"Discovery failed for {account.account_id}: {e}")
-                flush_logs()
+    A ``continuation`` picks up after a task that reached its time limit
+    having checkpointed units; it does not count toward
+    ``DISCOVERY_SHARD_MAX_ATTEMPTS``.
+    """
+    from discovery.aws_discoverer import AWSResourceDiscoverer
+    from discovery.deadlines import job_deadline
+    from discovery.ingest import AssetIngestor
 
-        job.status = DiscoveryJob.Status.COMPLETED
-        job.resources_discovered = total_discovered
-        job.resources_new = total_new
-        job.resources_updated = total_updated
-        job.resources_decommissioned = total_decommissioned
-        log_lines.append('Refreshing account costs...')
-        job.log_output = '\n'.join(log_lines)
-        job.completed_at = timezone.now()
-        job.save()
+    shard = DiscoveryShard.objects.select_related('job', 'aws_account').get(pk=shard_id)
+    if shard.status in (DiscoveryShard.Status.COMPLETED, DiscoveryShard.Status.FAILED):
+        return
+    job = shard.job
+    account = shard.aws_account
+    max_attempts = getattr(settings, 'DISCOVERY_SHARD_MAX_ATTEMPTS', 3)
+
+    if not continuation:
+        shard.attempts += 1
+    if shard.attempts > max_attempts:
+        shard.status = DiscoveryShard.Status.FAILED
+        shard.error_message = f'Gave up after {max_attempts} attempts'
+        job.append_log(shard.error_message, level=ERROR, account_id=account.account_id)
+        _finish_shard(shard)
+        return
 
-        # Refresh costs after successful discovery
-        refresh_costs_task.delay()
+    done = set(shard.units.filter(
+        Q(status=DiscoveryUnitRun.Status.COMPLETED) | Q(permanent_error=True),
+    ).values_list('service', 'region'))
+    if shard.status == DiscoveryShard.Status.RUNNING:
+        job.append_log(
+            f"Resuming discovery for {account.account_name} ({account.account_id}), "
+            f"{len(done)} unit(s) already done",
+            account_id=account.account_id,
+        )
+    else:
+        shard.status = DiscoveryShard.Status.RUNNING
+        shard.started_at = timezone.now()
+        job.append_log(
+            f"Starting discovery for {account.account_name} ({account.account_id})",
+            account_id=account.account_id,
+        )
+    shard.save(update_fields=['status', 'started_at', 'attempts'])
+
+    def on_batch(*counts):
+        job.record_progress(*counts)
+        shard.record_progress(*counts)
+        events.publish(job.pk, 'progress', dict(zip(PROGRESS_FIELDS, counts)))
+
+    results = []
+
+    def on_marker(result):
+        run = _checkpoint_unit(shard, result)
+        events.publish(job.pk, 'unit', DiscoveryUnitRunSerializer(run).data)
+        results.append(result)
 
+    try:
+        discoverer = AWSResourceDiscoverer(
+            account,
+            completed_units=done,
+            regions=job.target_regions,
+            service_types=job.target_service_types,
+            empty_units=DiscoveryUnitHistory.empty_units(account),
+            unit_durations=DiscoveryUnitHistory.durations(account),
+            deadline=job_deadline(job),
+        )
+        ingestor = AssetIngestor(account)
+        ingestor.ingest(
+            discoverer.iter_resources(with_markers=True),
+            on_batch=on_batch,
+            on_marker=on_marker,
+        )
+        _record_results(shard, discoverer, results, max_attempts)
+    except SoftTimeLimitExceeded:
+        job.append_log("Time limit reached, continuing in a new task", account_id=account.account_id)
+        # A task that checkpointed nothing counts as a failed attempt.
+        discover_account_task.delay(str(shard.id), continuation=bool(results))
     except Exception as e:
-        job.status = DiscoveryJob.Status.FAILED
-        job.error_message = str(e)
-        job.log_output = '\n'.join(log_lines)
+        # Leaving the shard RUNNING would keep the whole job from finishing.
+        _fail_shard(shard, e)
+
+
+def _record_results(shard, discoverer, results, max_attempts):
+    """Log a shard's unit results, then retry its failed units or finish it."""
+    from discovery.aws_discoverer import is_retryable_error
+
+    job = shard.job
+    account = shard.aws_account
+    for line in discoverer.timing_summary():
+        logger.info(f"Discovery API timing for {account.account_id}: {line}")
+
+    def log(*lines, **kwargs):
+        job.append_log(*lines, account_id=account.account_id, **kwargs)
+
+    for result in results:
+        if result.error:
+            log(str(result.error), level=WARNING, region=result.unit.region, service=result.unit.spec.key)
+    source = discoverer.config_source
+    if source is not None and source.error is not None:
+        log(f"Config aggregator {source.aggregator_name} unavailable, discovered directly: {source.error}", level=WARNING)
+    elif source is not None:
+        log(f"Read {source.units_served} unit(s) from Config aggregator {source.aggregator_name}")
+    if discoverer.timed_out_units:
+        log(
+            f"{len(discoverer.timed_out_units)} unit(s) ran out of time; "
+            f"their stale assets were not decommissioned",
+            level=WARNING,
+        )
+    if discoverer.skipped_units:
+        _checkpoint_skipped_units(shard, discoverer.skipped_units)
+        reasons = [reason for _, reason in discoverer.skipped_units]
+        log(
+            f"Skipped {reasons.count('empty')} unit(s) empty in recent runs "
+            f"and {reasons.count('unavailable')} not offered in their region"
+        )
+
+    # A run that failed before planning its units has nothing checkpointed.
+    planning_failed = bool(discoverer.errors) and not results
+    if planning_failed:
+        log(*discoverer.errors, level=WARNING)
+    retryable = [r for r in results if r.error and is_retryable_error(r.error)]
+    if (retryable or planning_failed) and shard.attempts < max_attempts:
+        if planning_failed:
+            log("Could not plan the account's units, retrying")
+        else:
+            log(f"{len(retryable)} unit(s) failed, retrying them")
+        discover_account_task.apply_async(args=[str(shard.id)], countdown=UNIT_RETRY_COUNTDOWN)
+        return
+
+    failed_units = shard.units.filter(status=DiscoveryUnitRun.Status.FAILED).count()
+    if failed_units or planning_failed:
+        shard.status = DiscoveryShard.Status.FAILED
+        if planning_failed:
+            shard.error_message = discoverer.errors[0]
+        else:
+            shard.error_message = f'{failed_units} unit(s) failed; their stale assets were not decommissioned'
+    else:
+        shard.status = DiscoveryShard.Status.COMPLETED
+        account.last_discovery_at = timezone.now()
+        account.save(update_fields=['last_discovery_at'])
+
+    shard.refresh_from_db(fields=['resources_new', 'resources_updated', 'resources_unchanged'])
+    shard.resources_discovered = sum(shard.units.values_list('resources_discovered', flat=True))
+    log(
+        f"Found {shard.resources_discovered} resources, "
+        f"New: {shard.resources_new}, Updated: {shard.resources_updated}, "
+        f"Unchanged: {shard.resources_unchanged}"
+    )
+    if shard.status == DiscoveryShard.Status.FAILED:
+        log(shard.error_message, level=ERROR)
+    _finish_shard(shard, 'resources_discovered')
+
+
+def _predict_shard_seconds(job, account):
+    """Expected run time of ``account``'s shard of ``job`` from its unit history.
+
+    Mirrors ``AWSResourceDiscoverer.plan_units`` on the units that have a
+    recorded duration; None if none of them has one.
+    """
+    from discovery.aws_discoverer import SERVICES
+    from discovery.scheduler import predict_makespan
+
+    specs = {spec.key: spec for spec in SERVICES}
+    service_types = set(job.target_service_types)
+    targeted = bool(job.target_regions or service_types)
+    regions = set(job.target_regions or account.discovery_regions or settings.DISCOVERY_REGIONS)
+    skipped = set() if targeted else DiscoveryUnitHistory.empty_units(account)
+
+    durations = []
+    for (service, region), seconds in DiscoveryUnitHistory.durations(account).items():
+        spec = specs.get(service)
+        if spec is None or (service, region) in skipped:
+            continue
+        if service_types and service_types.isdisjoint(spec.asset_types):
+            continue
+        if spec.is_global:
+            if job.target_regions and not service_types:
+                continue
+        elif regions and region not in regions:
+            continue
+        durations.append(seconds)
+    if not durations:
+        return None
+    return predict_makespan(durations, getattr(settings, 'DISCOVERY_MAX_WORKERS', 10))
+
+
+def _format_seconds(seconds):
+    minutes, seconds = divmod(round(seconds), 60)
+    return f'{minutes}m {seconds}s' if minutes else f'{seconds}s'
+
+
+def _checkpoint_unit(shard, result):
+    from discovery.deadlines import DeadlineExceeded
+
+    from discovery.aws_discoverer import is_retryable_error
+
+    if isinstance(result.error, DeadlineExceeded):
+        status = DiscoveryUnitRun.Status.TIMED_OUT
+    elif result.error:
+        status = DiscoveryUnitRun.Status.FAILED
+    else:
+        status = DiscoveryUnitRun.Status.COMPLETED
+    if not result.error:
+        duration = None
+        if result.started_at and result.completed_at:
+            duration = (result.completed_at - result.started_at).total_seconds()
+        DiscoveryUnitHistory.record(
+            shard.aws_account, result.unit.spec.key, result.unit.region, result.resources, duration,
+        )
+    run, _ = DiscoveryUnitRun.objects.update_or_create(
+        shard=shard,
+        service=result.unit.spec.key,
+        region=result.unit.region,
+        defaults={
+            'status': status,
+            'started_at': result.started_at,
+            'completed_at': result.completed_at,
+            'resources_discovered': result.resources,
+            'error_message': str(result.error or ''),
+            'permanent_error': bool(result.error) and not is_retryable_error(result.error),
+            **(result.stats or {}),
+        },
+    )
+    return run
+
+
+def _checkpoint_skipped_units(shard, skipped_units):
+    """Record units left out of the plan as completed with nothing found.
+
+    They are known to be empty, so their asset types stay in scope for
+    decommissioning when they share them with units that did run (RDS
+    clusters and instances, for example). Units skipped as empty that had
+    resources written since (see ``DiscoveryUnitHistory.clear_empty``) are
+    left out, so those assets are not decommissioned unseen.
+    """
+    still_empty = DiscoveryUnitHistory.empty_units(shard.aws_account)
+    skipped_units = [
+        (unit, reason) for unit, reason in skipped_units
+        if reason != 'empty' or (unit.spec.key, unit.region) in still_empty
+    ]
+    DiscoveryUnitRun.objects.bulk_create(
+        [
+            DiscoveryUnitRun(
+                shard=shard,
+                service=unit.spec.key,
+                region=unit.region,
+                status=DiscoveryUnitRun.Status.COMPLETED,
+                started_at=shard.started_at,
+                completed_at=shard.started_at,
+                error_message=f'Skipped: {reason}',
+            )
+            for unit, reason in skipped_units
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _fail_shard(shard, error):
+    account_id = shard.aws_account.account_id
+    shard.status = DiscoveryShard.Status.FAILED
+    shard.error_message = str(error)
+    shard.job.append_log(str(error), level=ERROR, account_id=account_id)
+    logger.error(f"Discovery failed for {account_id}: {error}")
+    _finish_shard(shard)
+
+
+def _finish_shard(shard, *fields):
+    """Save a shard's final state and finalize the job once no shard is left running.
+
+    Resource counters are maintained with F() updates while the shard runs, so
+    only the status fields (plus any extra ``fields``) are written here.
+    """
+    shard.completed_at = timezone.now()
+    shard.save(update_fields=['status', 'error_message', 'completed_at', 'attempts', *fields])
+    _finalize_if_done(shard.job)
+
+
+def _finalize_if_done(job):
+    if not job.shards.filter(
+        status__in=[DiscoveryShard.Status.PENDING, DiscoveryShard.Status.RUNNING],
+    ).exists():
+        finalize_discovery_task.delay(str(job.id))
+
+
+@shared_task
+def fail_stale_shards_task():
+    """Beat task: fail RUNNING shards whose task is gone so their jobs can finish.
+
+    A task killed at its hard time limit is acknowledged and never delivered
+    again. Its shard is failed once nothing was checkpointed for
+    ``DISCOVERY_SHARD_STALE_MINUTES``.
+    """
+    from datetime import timedelta
+
+    cutoff = timezone.now() - timedelta(minutes=getattr(settings, 'DISCOVERY_SHARD_STALE_MINUTES', 120))
+    stale = DiscoveryShard.objects.filter(status=DiscoveryShard.Status.RUNNING).annotate(
+        last_activity=Coalesce(Max('units__completed_at'), 'started_at'),
+    ).filter(last_activity__lt=cutoff).select_related('job', 'aws_account')
+    failed = 0
+    for shard in stale:
+        error = 'Discovery task stopped without finishing'
+        # The shard's own task may have finished in the meantime.
+        if not DiscoveryShard.objects.filter(pk=shard.pk, status=DiscoveryShard.Status.RUNNING).update(
+            status=DiscoveryShard.Status.FAILED, error_message=error, completed_at=timezone.now(),
+        ):
+            continue
+        failed += 1
+        shard.job.append_log(error, level=ERROR, account_id=shard.aws_account.account_id)
+        _finalize_if_done(shard.job)
+    return failed
+
+
+@shared_task(acks_late=True, time_limit=600)
+def finalize_discovery_task(job_id):
+    """Aggregate shard results, decommission stale assets and complete the job.
+
+    A job with units that ran out of time ends PARTIAL: what they found is
+    kept, but only the completed units' scopes are decommissioned.
+    """
+    from discovery.decommission import decommission_stale_assets
+
+    with transaction.atomic():
+        # Several shards may finish at once and each enqueue a finalizer;
+        # the row lock lets only the first one complete the job.
+        job = DiscoveryJob.objects.select_for_update().get(pk=job_id)
+        if job.status != DiscoveryJob.Status.RUNNING:
+            return
+
+        shards = list(job.shards.select_related('aws_account'))
+        decommissioned = decommission_stale_assets(
+            DiscoveryUnitRun.objects.filter(shard__job=job),
+        )
+        total_decommissioned = sum(decommissioned.values())
+        timed_out = DiscoveryUnitRun.objects.filter(
+            shard__job=job, status=DiscoveryUnitRun.Status.TIMED_OUT,
+        ).count()
+
+        job.status = DiscoveryJob.Status.PARTIAL if timed_out else DiscoveryJob.Status.COMPLETED
+        job.resources_discovered = sum(s.resources_discovered for s in shards)
+        job.resources_new = sum(s.resources_new for s in shards)
+        job.resources_updated = sum(s.resources_updated for s in shards)
+        job.resources_unchanged = sum(s.resources_unchanged for s in shards)
+        job.resources_decommissioned = total_decommissioned
         job.completed_at = timezone.now()
-        job.save()
-        logger.error(f"Discovery job failed: {e}")
+        job.save(update_fields=[
+            'status', 'resources_discovered', 'resources_new', 'resources_updated',
+            'resources_unchanged', 'resources_decommissioned', 'completed_at',
+        ])
+        for shard in shards:
+            job.append_log(
+                f"Decommissioned: {decommissioned.get(shard.aws_account_id, 0)}",
+                account_id=shard.aws_account.account_id,
+            )
+            if shard.predicted_duration_seconds is not None and shard.started_at and shard.completed_at:
+                job.append_log(
+                    f"Took {_format_seconds((shard.completed_at - shard.started_at).total_seconds())}, "
+                    f"predicted {_format_seconds(shard.predicted_duration_seconds)}",
+                    account_id=shard.aws_account.account_id,
+                )
+        if timed_out:
+            job.append_log(
+                f"{timed_out} unit(s) did not finish within their deadline or the job budget",
+                level=WARNING,
+            )
+        if job.predicted_duration_seconds is not None and job.started_at:
+            job.append_log(
+                f"Job took {_format_seconds(job.duration.total_seconds())}, "
+                f"predicted {_format_seconds(job.predicted_duration_seconds)}"
+            )
+        job.append_log('Refreshing account costs...')
+
+        transaction.on_commit(lambda: events.publish_job(job))
+        # Refresh costs after successful discovery
+        transaction.on_commit(refresh_costs_task.delay)
 
 
 @shared_task
@@ -146,7 +505,7 @@ def check_scheduled_discovery():
     # Find latest successful job
     last_job = (
         DiscoveryJob.objects
-        .filter(status=DiscoveryJob.Status.COMPLETED)
+        .filter(status__in=[DiscoveryJob.Status.COMPLETED, DiscoveryJob.Status.PARTIAL])
         .order_by('-completed_at')
         .first()
     )
@@ -166,3 +525,28 @@ def refresh_costs_task():
     from accounts.cost_explorer import refresh_account_costs
 
     return refresh_account_costs()
+
+
+@shared_task(time_limit=1800)
+def prune_discovery_logs_task():
+    """Delete the logs of jobs that finished more than DISCOVERY_LOG_RETENTION_DAYS ago.
+
+    The jobs themselves and their counters are kept. Entries are deleted in
+    batches so a large backlog does not hold one long transaction.
+    """
+    from datetime import timedelta
+
+    days = settings.DISCOVERY_LOG_RETENTION_DAYS
+    if days <= 0:
+        return 0
+    jobs = DiscoveryJob.objects.filter(completed_at__lt=timezone.now() - timedelta(days=days))
+    entries = DiscoveryLogEntry.objects.filter(job__in=jobs)
+    deleted = 0
+    while True:
+        ids = list(entries.values_list('id', flat=True)[:PRUNE_BATCH_SIZE])
+        if not ids:
+            break
+        deleted += DiscoveryLogEntry.objects.filter(id__in=ids).delete()[0]
+    cleared = jobs.exclude(log_output='').update(log_output='')
+    logger.info(f"Pruned {deleted} discovery log entries and the log text of {cleared} jobs older than {days} days")
+    return deleted
@@ -0,0 +1,195 @@
+"""
+Resource changes named by AWS change events.
+
+The event consumer (see ``discovery.incremental``) reads EventBridge events
+from SQS, either directly or wrapped in an SNS notification. Three kinds of
+events are understood:
+
+- events listing the changed resources' ARNs in ``resources``, such as
+  "EC2 Instance State-change Notification"
+- "Configuration Item Change Notification" events from AWS Config
+- "AWS API Call via CloudTrail" events, which usually list no ARNs: EC2
+  instance and VPC ids, and the resource named in the request of other
+  services (see ``ID_PARAMETERS``), are taken from the event; calls that
+  name no resource rescan the service's unit in the event's region
+
+Each event becomes ``ResourceChange`` tuples; ``coalesce`` merges a burst of
+them into one refresh per resource, or per (service, region) unit.
+"""
+import json
+import re
+from collections import namedtuple
+
+from discovery.aws_discoverer import DESCRIBE_BY_ID_SERVICES, GLOBAL_REGION, SERVICES
+
+# ``resource_id`` is None when the whole (service, region) unit has to be rescanned.
+ResourceChange = namedtuple('ResourceChange', ['account_id', 'region', 'service', 'resource_id'])
+
+SPECS = {spec.key: spec for spec in SERVICES}
+
+# (ARN service, pattern for the ARN's resource part, service key); the
+# ``id`` group is the resource's ``aws_resource_id``.
+ARN_RESOURCES = [
+    ('ec2', re.compile(r'instance/(?P<id>[^/]+)$'), 'ec2'),
+    ('ec2', re.compile(r'vpc/(?P<id>[^/]+)$'), 'vpc'),
+    ('eks', re.compile(r'cluster/(?P<id>[^/]+)$'), 'eks'),
+    ('rds', re.compile(r'cluster:(?P<id>.+)$'), 'rds_clusters'),
+    ('rds', re.compile(r'db:(?P<id>.+)$'), 'rds_instances'),
+    ('elasticache', re.compile(r'cluster:(?P<id>.+)$'), 'elasticache'),
+    ('elasticloadbalancing', re.compile(r'loadbalancer/(?:app|net)/(?P<id>[^/]+)/'), 'elbv2'),
+    ('lambda', re.compile(r'function:(?P<id>[^:]+)'), 'lambda'),
+    ('ecr', re.compile(r'repository/(?P<id>.+)$'), 'ecr'),
+    ('cognito-idp', re.compile(r'userpool/(?P<id>.+)$'), 'cognito'),
+    ('es', re.compile(r'domain/(?P<id>[^/]+)$'), 'opensearch'),
+    ('kafka', re.compile(r'cluster/(?P<id>[^/]+)/'), 'msk'),
+    ('s3', re.compile(r'(?P<id>[^/]+)$'), 's3'),
+    ('cloudfront', re.compile(r'distribution/(?P<id>.+)$'), 'cloudfront'),
+    ('route53', re.compile(r'hostedzone/(?P<id>.+)$'), 'route53'),
+]
+
+# CloudTrail event sources whose calls rescan these units. EC2 is left out:
+# most of its calls concern resources that are not inventoried (security
+# groups, network interfaces...), so only the instance and VPC ids found in
+# its events are refreshed.
+EVENT_SOURCE_SERVICES = {
+    's3.amazonaws.com': ['s3'],
+    'cloudfront.amazonaws.com': ['cloudfront'],
+    'route53.amazonaws.com': ['route53'],
+    'eks.amazonaws.com': ['eks'],
+    'rds.amazonaws.com': ['rds_clusters', 'rds_instances'],
+    'elasticache.amazonaws.com': ['elasticache'],
+    'elasticloadbalancing.amazonaws.com': ['elbv2'],
+    'lambda.amazonaws.com': ['lambda'],
+    'ecr.amazonaws.com': ['ecr'],
+    'cognito-idp.amazonaws.com': ['cognito'],
+    'es.amazonaws.com': ['opensearch'],
+    'kafka.amazonaws.com': ['msk'],
+}
+
+# CloudTrail request parameters naming the resources a call changed, per
+# event source: (parameter, service key). Values may be names or ARNs.
+ID_PARAMETERS = {
+    'rds.amazonaws.com': [('dBClusterIdentifier', 'rds_clusters'), ('dBInstanceIdentifier', 'rds_instances')],
+    's3.amazonaws.com': [('bucketName', 's3')],
+    'lambda.amazonaws.com': [('functionName', 'lambda')],
+    'ecr.amazonaws.com': [('repositoryName', 'ecr')],
+    'eks.amazonaws.com': [('clusterName', 'eks'), ('name', 'eks')],
+    'elasticloadbalancing.amazonaws.com': [('loadBalancerArn', 'elbv2')],
+}
+
+
+def parse_arn(arn, account_id='', region=''):
+    """The change of the resource named by ``arn``; None if it is not discovered.
+
+    ``account_id`` and ``region`` are used when the ARN leaves them out.
+    """
+    parts = arn.split(':', 5) if isinstance(arn, str) else []
+    if len(parts) != 6 or parts[0] != 'arn':
+        return None
+    _, _, arn_service, arn_region, arn_account, resource = parts
+    for service, pattern, key in ARN_RESOURCES:
+        if service != arn_service:
+            continue
+        match = pattern.match(resource)
+        if match:
+            unit_region = GLOBAL_REGION if SPECS[key].is_global else arn_region or region
+            return ResourceChange(arn_account or account_id, unit_region, key, match.group('id'))
+    return None
+
+
+def parse_message(body):
+    """The changes of an SQS message body holding an EventBridge event.
+
+    Raises ``ValueError`` if the body is not JSON.
+    """
+    event = json.loads(body)
+    if event.get('Type') == 'Notification' and 'Message' in event:
+        event = json.loads(event['Message'])
+    return changes_from_event(event)
+
+
+def changes_from_event(event):
+    """The ``ResourceChange`` tuples of one EventBridge event (possibly none)."""
+    detail = event.get('detail') or {}
+    if not isinstance(detail, dict) or detail.get('errorCode') or detail.get('readOnly'):
+        # Failed and read-only API calls change nothing.
+        return []
+    account_id = event.get('account') or detail.get('recipientAccountId') or ''
+    region = event.get('region') or detail.get('awsRegion') or ''
+
+    arns = list(event.get('resources') or [])
+    item = detail.get('configurationItem')
+    if isinstance(item, dict) and (item.get('ARN') or item.get('arn')):
+        arns.append(item.get('ARN') or item.get('arn'))
+    changes = [change for change in (parse_arn(arn, account_id, region) for arn in arns) if change]
+    if changes or not detail.get('eventSource'):
+        return changes
+
+    source = detail['eventSource']
+    if source == 'ec2.amazonaws.com':
+        return [
+            ResourceChange(account_id, region, key, resource_id)
+            for key, resource_id in _ec2_ids(detail)
+        ]
+    changes = _request_changes(source, detail, account_id, region)
+    if changes:
+        return changes
+    return [
+        ResourceChange(account_id, GLOBAL_REGION if SPECS[key].is_global else region, key, None)
+        for key in EVENT_SOURCE_SERVICES.get(source, [])
+    ]
+
+
+def _request_changes(source, detail, account_id, region):
+    """The changes of the resources named in a CloudTrail event's request."""
+    parameters = detail.get('requestParameters') or {}
+    changes = []
+    for name, key in ID_PARAMETERS.get(source, []):
+        value = parameters.get(name)
+        if not value or not isinstance(value, str):
+            continue
+        if value.startswith('arn:'):
+            change = parse_arn(value, account_id, region)
+        else:
+            change = ResourceChange(account_id, GLOBAL_REGION if SPECS[key].is_global else region, key, value)
+        if change:
+            changes.append(change)
+    return changes
+
+
+def _ec2_ids(detail):
+    """(service key, id) of the instances and VPCs named by an EC2 CloudTrail event."""
+    ids = []
+    for section in ('requestParameters', 'responseElements'):
+        elements = detail.get(section) or {}
+        for item in (elements.get('instancesSet') or {}).get('items', []):
+            if item.get('instanceId'):
+                ids.append(('ec2', item['instanceId']))
+    if 'Vpc' in detail.get('eventName', ''):
+        vpc_id = (detail.get('requestParameters') or {}).get('vpcId')
+        vpc_id = vpc_id or ((detail.get('responseElements') or {}).get('vpc') or {}).get('vpcId')
+        if vpc_id:
+            ids.append(('vpc', vpc_id))
+    return ids
+
+
+def group_key(change):
+    return (change.account_id, change.region, change.service)
+
+
+def coalesce(changes):
+    """Merge changes into {(account id, region, service key): resource ids}.
+
+    The ids are a set, or None when the unit has to be rescanned: because a
+    change named no resource, or the service cannot be described by id.
+    """
+    groups = {}
+    for change in changes:
+        key = group_key(change)
+        ids = groups.get(key, set())
+        if ids is None or change.resource_id is None or change.service not in DESCRIBE_BY_ID_SERVICES:
+            groups[key] = None
+        else:
+            ids.add(change.resource_id)
+            groups[key] = ids
+    return groups
@@ -0,0 +1,132 @@
+"""
+Discovery units answered by an AWS Config aggregator.
+
+Accounts whose management account uses the CONFIG_AGGREGATOR discovery
+backend read their resources from that aggregator instead of calling every
+service's describe/list APIs in every region. One paginated advanced query
+per account returns all supported resource types in all regions, which is
+split into the same (service, region) units the direct discoverers produce,
+so checkpoints, telemetry and decommissioning work unchanged.
+
+A unit is only read from the aggregator if the aggregator holds resources of
+its type for the account in its region: otherwise Config may not record that
+type there (or the account is not aggregated), and an empty answer would get
+the unit's assets decommissioned. Such units, services Config does not cover
+here (see ``config_items.CONFIG_TYPES``), and everything if the aggregator
+cannot be read, are discovered directly. Global units need their type
+recorded in its home region (CloudFront) or, for S3 buckets, which are
+recorded in the region they live in, in every region the account is
+recorded in.
+"""
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from discovery.config_items import CONFIG_TYPES, SERVICE_KEYS, parse_item, resource_from_item
+
+logger = logging.getLogger(__name__)
+
+# Results per SelectAggregateResourceConfig call (the API maximum).
+QUERY_PAGE_SIZE = 100
+
+# Config resource types of global services recorded in a single region.
+HOME_REGIONS = {'AWS::CloudFront::Distribution': 'us-east-1'}
+
+QUERY_FIELDS = (
+    'resourceId', 'resourceName', 'resourceType', 'arn', 'accountId', 'awsRegion',
+    'configuration', 'tags', 'configurationItemStatus',
+)
+
+
+class ConfigAggregatorSource:
+    def __init__(self, client, aggregator_name, account_id, service_keys):
+        self.client = client
+        self.aggregator_name = aggregator_name
+        self.account_id = account_id
+        self.resource_types = sorted({CONFIG_TYPES[key][0] for key in service_keys if key in CONFIG_TYPES})
+        # Set when the aggregator could not be read; every unit is then discovered directly.
+        self.error = None
+        # Units answered from the aggregator so far.
+        self.units_served = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        # region -> Config resource types the aggregator holds for the account there
+        self._recorded = {}
+        # (service key, region) -> resource dicts
+        self._resources = defaultdict(list)
+
+    def covers(self, unit):
+        """Whether ``unit`` is read from the aggregator rather than discovered directly."""
+        if unit.spec.key not in CONFIG_TYPES:
+            return False
+        self._load()
+        if self.error is not None:
+            return False
+        resource_type = CONFIG_TYPES[unit.spec.key][0]
+        if not unit.spec.is_global:
+            return resource_type in self._recorded.get(unit.region, ())
+        if resource_type in HOME_REGIONS:
+            return resource_type in self._recorded.get(HOME_REGIONS[resource_type], ())
+        return bool(self._recorded) and all(resource_type in types for types in self._recorded.values())
+
+    def resources(self, unit):
+        """The resource dicts of ``unit``; each unit's resources are handed out once."""
+        with self._lock:
+            self.units_served += 1
+            if not unit.spec.is_global:
+                return self._resources.pop((unit.spec.key, unit.region), [])
+            # Global services (S3, CloudFront) are recorded in the region they live in.
+            keys = [key for key in self._resources if key[0] == unit.spec.key]
+            return [resource for key in keys for resource in self._resources.pop(key)]
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                self._recorded = self._recorded_types()
+                if self._recorded and self.resource_types:
+                    self._query()
+            except Exception as e:
+                self.error = e
+                self._resources.clear()
+                logger.warning(
+                    f"Config aggregator {self.aggregator_name} unavailable for {self.account_id}, "
+                    f"discovering directly: {e}"
+                )
+
+    def _recorded_types(self):
+        """{region: resource types} the aggregator holds resources of for the account."""
+        recorded = defaultdict(set)
+        for row in self._select(
+            f"SELECT awsRegion, resourceType, COUNT(*) "
+            f"WHERE accountId = '{self.account_id}' GROUP BY awsRegion, resourceType"
+        ):
+            if row.get('COUNT(*)'):
+                recorded[row['awsRegion']].add(row['resourceType'])
+        return dict(recorded)
+
+    def _query(self):
+        types = ', '.join(f"'{resource_type}'" for resource_type in self.resource_types)
+        for result in self._select(
+            f"SELECT {', '.join(QUERY_FIELDS)} "
+            f"WHERE accountId = '{self.account_id}' AND resourceType IN ({types})"
+        ):
+            item = parse_item(result)
+            resource = resource_from_item(item)
+            if resource is not None:
+                self._resources[(SERVICE_KEYS[item.resource_type], item.region)].append(resource)
+
+    def _select(self, expression):
+        """The rows of an advanced query over the aggregator, as dicts."""
+        paginator = self.client.get_paginator('select_aggregate_resource_config')
+        pages = paginator.paginate(
+            Expression=expression,
+            ConfigurationAggregatorName=self.aggregator_name,
+            PaginationConfig={'PageSize': QUERY_PAGE_SIZE},
+        )
+        for page in pages:
+            for result in page.get('Results', []):
+                yield json.loads(result)
@@ -0,0 +1,364 @@
+"""
+Mapping of AWS Config configuration items to discovered resource dicts.
+
+AWS Config records most of the resources discovery looks for, with the same
+data the describe/list APIs return. ``resource_from_item`` turns a
+configuration item, from an aggregator query or a configuration snapshot,
+into the resource dict the direct discoverers produce for it, so both feed
+the same ``AssetIngestor``.
+
+Config stores SDK-modelled resources with camelCase keys (``dBInstanceStatus``)
+and newer resource types with their CloudFormation PascalCase properties
+(``DomainName``); ``_get`` accepts either.
+"""
+import json
+from collections import namedtuple
+
+ConfigItem = namedtuple('ConfigItem', [
+    'resource_type', 'resource_id', 'resource_name', 'arn', 'account_id', 'region',
+    'status', 'configuration', 'tags',
+])
+
+# Configuration item statuses of resources that no longer exist.
+DELETED_STATUSES = {'ResourceDeleted', 'ResourceDeletedNotRecorded', 'ResourceNotRecorded'}
+
+
+def _get(data, *path, default=None):
+    """Follow ``path`` through nested dicts, matching camelCase or PascalCase keys."""
+    for name in path:
+        if not isinstance(data, dict):
+            return default
+        for key in (name, name[:1].upper() + name[1:]):
+            if key in data:
+                data = data[key]
+                break
+        else:
+            return default
+    return default if data is None else data
+
+
+def _tags(raw):
+    """Tags as a dict, from a snapshot's ``{key: value}`` or a query's ``[{key, value}]``."""
+    if isinstance(raw, dict):
+        return raw
+    return {_get(t, 'key', default=''): _get(t, 'value', default='') for t in raw or () if isinstance(t, dict)}
+
+
+def parse_item(raw):
+    """A ConfigItem from an aggregator query result or a snapshot's configuration item."""
+    configuration = raw.get('configuration') or {}
+    if isinstance(configuration, str):
+        configuration = json.loads(configuration)
+    return ConfigItem(
+        resource_type=raw.get('resourceType', ''),
+        resource_id=raw.get('resourceId', ''),
+        resource_name=raw.get('resourceName') or '',
+        arn=raw.get('arn') or raw.get('ARN') or '',
+        account_id=raw.get('accountId') or raw.get('awsAccountId') or '',
+        region=raw.get('awsRegion', ''),
+        status=raw.get('configurationItemStatus', ''),
+        configuration=configuration,
+        tags=_tags(raw.get('tags')),
+    )
+
+
+def _ec2_instance(item, cfg):
+    instance_id = item.resource_id
+    ips = [ip for ip in (_get(cfg, 'publicIpAddress'), _get(cfg, 'privateIpAddress')) if ip]
+    dns = [name for name in (_get(cfg, 'publicDnsName'), _get(cfg, 'privateDnsName')) if name]
+    state = _get(cfg, 'state', 'name', default='unknown')
+    return {
+        'name': item.tags.get('Name', instance_id),
+        'aws_service_type': 'EC2',
+        'aws_resource_id': instance_id,
+        'aws_resource_arn': item.arn,
+        'aws_region': item.region,
+        'status': 'ACTIVE' if state == 'running' else 'INACTIVE' if state == 'stopped' else 'UNKNOWN',
+        'ip_addresses': ips,
+        'dns_names': dns,
+        'tags': item.tags,
+        'metadata': {
+            'instance_type': _get(cfg, 'instanceType'),
+            'state': state,
+            'launch_time': str(_get(cfg, 'launchTime', default='')),
+            'vpc_id': _get(cfg, 'vpcId'),
+            'subnet_id': _get(cfg, 'subnetId'),
+            'ami_id': _get(cfg, 'imageId'),
+            'platform': _get(cfg, 'platform', default='linux'),
+            'architecture': _get(cfg, 'architecture'),
+            'key_name': _get(cfg, 'keyName'),
+        },
+    }
+
+
+def _vpc(item, cfg):
+    return {
+        'name': item.tags.get('Name', item.resource_id),
+        'aws_service_type': 'VPC',
+        'aws_resource_id': item.resource_id,
+        'aws_resource_arn': item.arn,
+        'aws_region': item.region,
+        'status': 'ACTIVE' if _get(cfg, 'state') == 'available' else 'UNKNOWN',
+        'tags': item.tags,
+        'metadata': {
+            'cidr_block': _get(cfg, 'cidrBlock'),
+            'is_default': _get(cfg, 'isDefault', default=False),
+            'dhcp_options_id': _get(cfg, 'dhcpOptionsId'),
+            'instance_tenancy': _get(cfg, 'instanceTenancy'),
+        },
+    }
+
+
+def _eks_cluster(item, cfg):
+    name = _get(cfg, 'name') or item.resource_name or item.resource_id
+    endpoint = _get(cfg, 'endpoint')
+    return {
+        'name': name,
+        'aws_service_type': 'EKS',
+        'aws_resource_id': name,
+        'aws_resource_arn': item.arn,
+        'aws_region': item.region,
+        'status': 'ACTIVE' if _get(cfg, 'status', default='ACTIVE') == 'ACTIVE' else 'UNKNOWN',
+        'tags': item.tags,
+        'metadata': {
+            'version': _get(cfg, 'version'),
+            'platform_version': _get(cfg, 'platformVersion'),
+            'endpoint': endpoint,
+            'role_arn': _get(cfg, 'roleArn'),
+            'vpc_id': _get(cfg, 'resourcesVpcConfig', 'vpcId'),
+            'created_at': str(_get(cfg, 'createdAt', default='')),
+        },
+        'dns_names': [endpoint] if endpoint else [],
+    }
+
+
+def _rds_cluster(item, cfg):
+    identifier = _get(cfg, 'dBClusterIdentifier') or item.resource_name
+    dns = [endpoint for endpoint in (_get(cfg, 'endpoint'), _get(cfg, 'readerEndpoint')) if endpoint]
+    return {
+        'name': identifier,
+        'aws_service_type': 'RDS',
+        'aws_resource_id': identifier,
+        'aws_resource_arn': item.arn,
+        'aws_region': item.region,
+        'status': 'ACTIVE' if _get(cfg, 'status') == 'available' else 'UNKNOWN',
+        'dns_names': dns,
+        'tags': item.tags,
+        'metadata': {
+            'engine': _get(cfg, 'engine'),
+            'engine_version': _get(cfg, 'engineVersion'),
+            'storage_encrypted': _get(cfg, 'storageEncrypted'),
+            'multi_az': _get(cfg, 'multiAZ'),
+            'cluster_members': [
+                _get(member, 'dBInstanceIdentifier') for member in _get(cfg, 'dBClusterMembers', default=[])
+            ],
+            'created_at': str(_get(cfg, 'clusterCreateTime', default='')),
+        },
+    }
+
+
+def _rds_instance(item, cfg):
+    if _get(cfg, 'dBClusterIdentifier'):
+        return None  # cluster members are covered by the cluster
+    identifier = _get(cfg, 'dBInstanceIdentifier') or item.resource_name
+    address = _get(cfg, 'endpoint', 'address')
+    return {
+        'name': identifier,
+        'aws_service_type': 'RDS',
+        'aws_resource_id': identifier,
+        'aws_resource_arn': item.arn,
+        'aws_region': item.region,
+        'status': 'ACTIVE' if _get(cfg, 'dBInstanceStatus') == 'available' else 'UNKNOWN',
+        'dns_names': [address] if address else [],
+        'tags': item.tags,
+        'metadata': {
+            'engine': _get(cfg, 'engine'),
+            'engine_version': _get(cfg, 'engineVersion'),
+            'instance_class': _get(cfg, 'dBInstanceClass'),
+            'storage_type': _get(cfg, 'storageType'),
+            'allocated_storage': _get(cfg, 'allocatedStorage'),
+            'multi_az': _get(cfg, 'multiAZ'),
+            'storage_encrypted': _get(cfg, 'storageEncrypted'),
+            'created_at': str(_get(cfg, 'instanceCreateTime', default='')),
+        },
+    }
+
+
+def _elasticache_cluster(item, cfg):
+    cluster_id = _get(cfg, 'cacheClusterId') or item.resource_id
+    dns = [_get(cfg, 'configurationEndpoint', 'address')]
+    dns.extend(_get(node, 'endpoint', 'address') for node in _get(cfg, 'cacheNodes', default=[]))
+    return {
+        'name': cluster_id,
+        'aws_service_type': 'ELASTICACHE',
+        'aws_resource_id': cluster_id,
+        'aws_resource_arn': item.arn,
+        'aws_region': item.region,
+        'status': 'ACTIVE' if _get(cfg, 'cacheClusterStatus') == 'available' else 'UNKNOWN',
+        'dns_names': [address for address in dns if address],
+        'tags': item.tags,
+        'metadata': {
+            'engine': _get(cfg, 'engine'),
+            'engine_version': _get(cfg, 'engineVersion'),
+            'cache_node_type': _get(cfg, 'cacheNodeType'),
+            'num_cache_nodes': _get(cfg, 'numCacheNodes'),
+            'created_at': str(_get(cfg, 'cacheClusterCreateTime', default='')),
+        },
+    }
+
+
+def _load_balancer(item, cfg):
+    lb_type = _get(cfg, 'type', default='application')
+    dns_name = _get(cfg, 'dNSName')
+    return {
+        'name': _get(cfg, 'loadBalancerName') or item.resource_name,
+        'aws_service_type': 'ALB' if lb_type == 'application' else 'NLB',
+        'aws_resource_id': _get(cfg, 'loadBalancerName') or item.resource_name,
+        'aws_resource_arn': item.arn,
+        'aws_region': item.region,
+        'status': 'ACTIVE' if _get(cfg, 'state', 'code') == 'active' else 'UNKNOWN',
+        'dns_names': [dns_name] if dns_name else [],
+        'tags': item.tags,
+        'metadata': {
+            'type': lb_type,
+            'scheme': _get(cfg, 'scheme'),
+            'vpc_id': _get(cfg, 'vpcId'),
+            'availability_zones': [_get(az, 'zoneName') for az in _get(cfg, 'availabilityZones', default=[])],
+            'created_at': str(_get(cfg, 'createdTime', default='')),
+        },
+    }
+
+
+def _lambda_function(item, cfg):
+    name = _get(cfg, 'functionName') or item.resource_name or item.resource_id
+    return {
+        'name': name,
+        'aws_service_type': 'LAMBDA',
+        'aws_resource_id': name,
+        'aws_resource_arn': item.arn,
+        'aws_region': item.region,
+        'status': 'ACTIVE',
+        'tags': item.tags,
+        'metadata': {
+            'runtime': _get(cfg, 'runtime'),
+            'handler': _get(cfg, 'handler'),
+            'memory_size': _get(cfg, 'memorySize'),
+            'timeout': _get(cfg, 'timeout'),
+            'last_modified': _get(cfg, 'lastModified'),
+            'code_size': _get(cfg, 'codeSize'),
+            'description': _get(cfg, 'description'),
+        },
+    }
+
+
+def _ecr_repository(item, cfg):
+    name = _get(cfg, 'repositoryName') or item.resource_name or item.resource_id
+    uri = _get(cfg, 'repositoryUri', default='')
+    return {
+        'name': name,
+        'aws_service_type': 'ECR',
+        'aws_resource_id': name,
+        'aws_resource_arn': item.arn,
+        'aws_region': item.region,
+        'url': f'https://{uri}' if uri else '',
+        'status': 'ACTIVE',
+        'dns_names': [uri] if uri else [],
+        'tags': item.tags,
+        'metadata': {
+            'repository_uri': uri,
+            'created_at': str(_get(cfg, 'createdAt', default='')),
+        },
+    }
+
+
+def _opensearch_domain(item, cfg):
+    name = _get(cfg, 'domainName') or item.resource_name
+    dns = [_get(cfg, 'endpoint') or _get(cfg, 'domainEndpoint')]
+    dns.extend((_get(cfg, 'endpoints') or _get(cfg, 'domainEndpoints') or {}).values())
+    return {
+        'name': name,
+        'aws_service_type': 'OPENSEARCH',
+        'aws_resource_id': name,
+        'aws_resource_arn': item.arn,
+        'aws_region': item.region,
+        'status': 'ACTIVE' if not _get(cfg, 'deleted', default=False) else 'INACTIVE',
+        'dns_names': [endpoint for endpoint in dns if endpoint],
+        'tags': item.tags,
+        'metadata': {
+            'engine_version': _get(cfg, 'engineVersion'),
+            'instance_type': _get(cfg, 'clusterConfig', 'instanceType'),
+            'instance_count': _get(cfg, 'clusterConfig', 'instanceCount'),
+            'ebs_enabled': _get(cfg, 'eBSOptions', 'eBSEnabled'),
+            'encryption_at_rest': _get(cfg, 'encryptionAtRestOptions', 'enabled'),
+            'created': _get(cfg, 'created'),
+        },
+    }
+
+
+def _s3_bucket(item, cfg):
+    name = item.resource_name or item.resource_id
+    return {
+        'name': name,
+        'aws_service_type': 'S3',
+        'aws_resource_id': name,
+        'aws_resource_arn': item.arn or f'arn:aws:s3:::{name}',
+        'aws_region': item.region,
+        'url': f's3://{name}',
+        'dns_names': [f'{name}.s3.{item.region}.amazonaws.com'],
+        'status': 'ACTIVE',
+        'tags': item.tags,
+        'metadata': {
+            'created_at': str(_get(cfg, 'creationDate', default='')),
+        },
+    }
+
+
+def _cloudfront_distribution(item, cfg):
+    distribution = _get(cfg, 'distributionConfig', default={})
+    dns = [_get(cfg, 'domainName')] + list(_get(distribution, 'aliases', 'items', default=[]))
+    return {
+        'name': _get(distribution, 'comment') or item.resource_id,
+        'aws_service_type': 'CLOUDFRONT',
+        'aws_resource_id': item.resource_id,
+        'aws_resource_arn': item.arn,
+        'aws_region': 'global',
+        'status': 'ACTIVE' if _get(distribution, 'enabled') else 'INACTIVE',
+        'dns_names': [name for name in dns if name],
+        'tags': item.tags,
+        'metadata': {
+            'status': _get(cfg, 'status'),
+            'price_class': _get(distribution, 'priceClass'),
+            'http_version': _get(distribution, 'httpVersion'),
+            'is_ipv6_enabled': _get(distribution, 'isIPV6Enabled'),
+            'web_acl_id': _get(distribution, 'webACLId'),
+        },
+    }
+
+
+# Discoverer service key -> (Config resource type, mapper). Services missing
+# here (Route 53, Cognito, MSK) are always discovered through their APIs.
+CONFIG_TYPES = {
+    'ec2': ('AWS::EC2::Instance', _ec2_instance),
+    'vpc': ('AWS::EC2::VPC', _vpc),
+    'eks': ('AWS::EKS::Cluster', _eks_cluster),
+    'rds_clusters': ('AWS::RDS::DBCluster', _rds_cluster),
+    'rds_instances': ('AWS::RDS::DBInstance', _rds_instance),
+    'elasticache': ('AWS::ElastiCache::CacheCluster', _elasticache_cluster),
+    'elbv2': ('AWS::ElasticLoadBalancingV2::LoadBalancer', _load_balancer),
+    'lambda': ('AWS::Lambda::Function', _lambda_function),
+    'ecr': ('AWS::ECR::Repository', _ecr_repository),
+    'opensearch': ('AWS::OpenSearch::Domain', _opensearch_domain),
+    's3': ('AWS::S3::Bucket', _s3_bucket),
+    'cloudfront': ('AWS::CloudFront::Distribution', _cloudfront_distribution),
+}
+
+# Config resource type -> discoverer service key.
+SERVICE_KEYS = {resource_type: key for key, (resource_type, _) in CONFIG_TYPES.items()}
+
+
+def resource_from_item(item):
+    """The resource dict for a ConfigItem, or None for deleted or unsupported resources."""
+    key = SERVICE_KEYS.get(item.resource_type)
+    if key is None or item.status in DELETED_STATUSES:
+        return None
+    return CONFIG_TYPES[key][1](item, item.configuration)
@@ -0,0 +1,136 @@
+"""
+Streaming reader for AWS Config configuration snapshot files.
+
+Config delivers snapshots as JSON documents, usually gzipped, of the form
+``{"fileVersion": ..., "configurationItems": [...]}`` that can run to
+hundreds of megabytes. ``iter_items`` decodes the items one at a time with
+``json.JSONDecoder.raw_decode`` over a sliding text buffer, so memory is
+bounded by the largest single item rather than the file. A file holding a
+bare JSON array of configuration items is read the same way.
+"""
+import gzip
+import json
+import os
+
+# Characters read from a file at a time.
+CHUNK_SIZE = 1 << 20
+
+# Largest configuration item read; a larger one is taken for a malformed file.
+MAX_ITEM_CHARS = 32 << 20
+
+# A decode error this close to the end of the buffer may just be a value cut
+# off by the chunk boundary (a literal, number or escape sequence).
+TRUNCATION_MARGIN = 8
+
+ITEMS_KEY = '"configurationItems"'
+
+_WHITESPACE = ' \t\r\n'
+
+_decoder = json.JSONDecoder()
+
+
+class SnapshotFormatError(ValueError):
+    """A file is not a Config snapshot (or a JSON array of configuration items)."""
+
+
+def snapshot_files(paths):
+    """Expand ``paths`` into snapshot files, walking directories for ``*.json`` and ``*.json.gz``."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(('.json', '.json.gz')):
+                    yield os.path.join(root, name)
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+class _Reader:
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ''
+        self.pos = 0
+
+    def fill(self):
+        """Append the next chunk, dropping what was consumed; False at end of file."""
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """The next non-whitespace character, '' at end of file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise SnapshotFormatError(f"expected {char!r}, found {found or 'end of file'!r}")
+        self.pos += 1
+
+    def skip_past(self, text):
+        """Move past the next occurrence of ``text``; False if there is none."""
+        while True:
+            index = self.buffer.find(text, self.pos)
+            if index >= 0:
+                self.pos = index + len(text)
+                return True
+            # A match could still start in the last len(text) - 1 characters.
+            self.pos = max(self.pos, len(self.buffer) - len(text) + 1)
+            if not self.fill():
+                return False
+
+    def decode(self):
+        """Decode the next JSON value, reading more input as needed.
+
+        Raises ``SnapshotFormatError`` as soon as the value cannot be
+        completed by reading on, instead of buffering the rest of the file.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                truncated = e.msg.startswith('Unterminated string') or e.pos >= len(self.buffer) - TRUNCATION_MARGIN
+                if not truncated:
+                    raise SnapshotFormatError(f'malformed configuration item: {e}') from e
+                if len(self.buffer) - self.pos > MAX_ITEM_CHARS:
+                    raise SnapshotFormatError(f'configuration item larger than {MAX_ITEM_CHARS} characters') from e
+                if self.fill():
+                    continue
+                raise
+            self.pos = end
+            return value
+
+
+def iter_items(path):
+    """Yield the raw configuration item dicts of the snapshot file at ``path``."""
+    with _open(path) as f:
+        reader = _Reader(f)
+        if reader.peek() == '{':
+            if not reader.skip_past(ITEMS_KEY):
+                raise SnapshotFormatError('no configurationItems found')
+            reader.expect(':')
+        reader.expect('[')
+        if reader.peek() == ']':
+            return
+        while True:
+            yield reader.decode()
+            if reader.peek() == ']':
+                return
+            reader.expect(',')
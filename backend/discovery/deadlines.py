@@ -0,0 +1,57 @@
+"""
+Per-unit deadlines and the job time budget for discovery.
+
+Every unit may run for ``DISCOVERY_UNIT_TIMEOUT`` seconds, overridden per
+service key or region by ``DISCOVERY_UNIT_TIMEOUTS``, and never past the end
+of the job's budget (``DISCOVERY_JOB_BUDGET`` seconds after it started).
+
+The discoverer sets ``current_deadline`` while it runs a unit. Cancellation
+is cooperative: a hook on every discovery client raises ``DeadlineExceeded``
+before a request is sent once the deadline has passed, so a unit stuck
+retrying (or waiting for rate tokens) stops at its next request. A single
+request is bounded by the clients' own connect and read timeouts.
+"""
+import contextvars
+import time
+from datetime import timedelta
+
+from django.conf import settings
+
+# time.monotonic() value after which the unit running in this context must stop.
+current_deadline = contextvars.ContextVar('discovery_unit_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """A unit passed its deadline, or was not started before the job budget ran out."""
+
+
+def unit_timeout(service, region):
+    """Seconds a (service, region) unit may run, or None for no limit.
+
+    A service or region override replaces the default; if both exist the
+    smaller one applies. 0 means no limit.
+    """
+    overrides = getattr(settings, 'DISCOVERY_UNIT_TIMEOUTS', {})
+    limits = [overrides[key] for key in (service, region) if key in overrides]
+    if not limits:
+        limits = [getattr(settings, 'DISCOVERY_UNIT_TIMEOUT', 0)]
+    limits = [limit for limit in limits if limit > 0]
+    return min(limits) if limits else None
+
+
+def job_deadline(job):
+    """Wall-clock end of ``job``'s time budget, or None without a budget."""
+    budget = getattr(settings, 'DISCOVERY_JOB_BUDGET', 0)
+    if budget <= 0 or job is None or job.started_at is None:
+        return None
+    return job.started_at + timedelta(seconds=budget)
+
+
+def attach(client):
+    """Stop ``client``'s requests once the unit running in the calling thread is past its deadline."""
+    def before_send(**kwargs):
+        deadline = current_deadline.get()
+        if deadline is not None and time.monotonic() > deadline:
+            raise DeadlineExceeded('Unit deadline exceeded')
+
+    client.meta.events.register('before-send', before_send, unique_id='discovery-deadline')
@@ -0,0 +1,81 @@
+"""
+Scoped decommissioning of assets that discovery no longer sees.
+
+Only the (region, service) units that completed in a job are trusted: for each
+account and region, an asset type is in scope once every unit that produces
+it there has completed (RDS instances and clusters share the ``RDS`` type, for
+example). Assets of an in-scope type not seen since the earliest of those
+units started are marked DECOMMISSIONED, with one UPDATE per account and
+region.
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+
+from assets.models import Asset
+from discovery.aws_discoverer import GLOBAL_REGION, SERVICES
+from discovery.models import DiscoveryUnitRun
+
+
+def decommission_stale_assets(unit_runs):
+    """Decommission stale assets covered by ``unit_runs``; return counts per account id."""
+    return decommission_scanned_units(unit_runs.filter(status=DiscoveryUnitRun.Status.COMPLETED).values_list(
+        'shard__aws_account_id', 'region', 'service', 'started_at',
+    ))
+
+
+def decommission_scanned_units(scans):
+    """Decommission stale assets of completed unit scans; return counts per account id.
+
+    ``scans`` are (account pk, region, service key, started_at) tuples.
+    """
+    started = defaultdict(dict)
+    for account_id, region, service, started_at in scans:
+        if started_at:
+            started[(account_id, region)][service] = started_at
+
+    counts = defaultdict(int)
+    for (account_id, region), by_service in started.items():
+        scope = _stale_scope(region, by_service)
+        if not scope:
+            continue
+        assets = Asset.objects.filter(
+            scope, aws_account_id=account_id, asset_type=Asset.AssetType.AWS_SERVICE,
+        ).exclude(status=Asset.Status.DECOMMISSIONED)
+        if region != GLOBAL_REGION:
+            assets = assets.filter(aws_region=region)
+        counts[account_id] += assets.update(
+            status=Asset.Status.DECOMMISSIONED, discovery_fingerprint='',
+        )
+    return counts
+
+
+def decommission_resources(account, region, asset_types, resource_ids):
+    """Decommission the assets of resources that were described by id and not found.
+
+    Assets of global services are matched in any region.
+    """
+    assets = Asset.objects.filter(
+        aws_account=account, aws_service_type__in=asset_types,
+        aws_resource_id__in=resource_ids, asset_type=Asset.AssetType.AWS_SERVICE,
+    )
+    if region != GLOBAL_REGION:
+        assets = assets.filter(aws_region=region)
+    return assets.exclude(status=Asset.Status.DECOMMISSIONED).update(
+        status=Asset.Status.DECOMMISSIONED, discovery_fingerprint='',
+    )
+
+
+def _stale_scope(region, by_service):
+    is_global = region == GLOBAL_REGION
+    scope = Q()
+    asset_types = {t for spec in SERVICES if spec.key in by_service for t in spec.asset_types}
+    for asset_type in sorted(asset_types):
+        producers = [
+            spec.key for spec in SERVICES
+            if asset_type in spec.asset_types and spec.is_global == is_global
+        ]
+        if all(key in by_service for key in producers):
+            cutoff = min(by_service[key] for key in producers)
+            scope |= Q(aws_service_type=asset_type, last_seen_at__lt=cutoff)
+    return scope
@@ -0,0 +1,180 @@
+"""
+Live discovery progress over Redis pub/sub and Server-Sent Events.
+
+Celery workers ``publish`` events on a per-job channel as a job runs:
+
+- ``job``: the job's list representation, sent whenever its status changes
+- ``progress``: counters to add to the job's resource totals
+- ``unit``: a finished (account, service, region) unit with its telemetry
+- ``log``: new log entries
+
+``job_event_stream`` relays them to a browser as an ``text/event-stream``
+body. It starts with a ``job`` snapshot and the log entries the client has
+not seen, so a reconnecting client catches up with one query and then only
+listens to Redis. Every event carries a per-job sequence number; events
+already reflected in the snapshot are not relayed, so progress published
+while it is read is not counted twice.
+
+Each open stream holds a web server thread. Streams are closed after
+``STREAM_MAX_SECONDS`` (EventSource reconnects with ``Last-Event-ID``), and
+a process serves at most ``DISCOVERY_STREAM_MAX_CONNECTIONS`` at a time.
+Without Redis, or past that limit, the stream ends after the snapshot and
+asks the browser to reconnect in ``FALLBACK_RETRY_MS``, which amounts to
+polling.
+"""
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from discovery import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Comment line sent when nothing happened for this long, so proxies keep the connection open.
+KEEPALIVE_SECONDS = 15
+
+# Streams are closed after this long; EventSource reconnects on its own.
+STREAM_MAX_SECONDS = 30
+
+FALLBACK_RETRY_MS = 5000
+
+# A job's sequence counter outlives any job by far.
+SEQUENCE_TTL_SECONDS = 7 * 24 * 3600
+
+_open_streams = 0
+_open_streams_lock = threading.Lock()
+
+TERMINAL_STATUSES = ('COMPLETED', 'PARTIAL', 'FAILED')
+
+
+def channel(job_id):
+    return f'discovery:job:{job_id}'
+
+
+def sequence_key(job_id):
+    return f'discovery:job:{job_id}:seq'
+
+
+def publish(job_id, event, data):
+    """Publish ``event`` for a job; a no-op without Redis.
+
+    Call it after the change is saved: a stream that read the sequence number
+    before reading its snapshot relays only the events numbered after it.
+    """
+    client = redis_client.get_redis()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline()
+        pipe.incr(sequence_key(job_id))
+        pipe.expire(sequence_key(job_id), SEQUENCE_TTL_SECONDS)
+        seq = pipe.execute()[0]
+        client.publish(channel(job_id), json.dumps({'event': event, 'data': data, 'seq': seq}, default=str))
+    except Exception as e:
+        redis_client.mark_unavailable(e)
+
+
+def publish_job(job):
+    """Publish a ``job`` snapshot of ``job`` as stored in the database."""
+    from assets.models import DiscoveryJob
+    from assets.serializers import DiscoveryJobListSerializer
+
+    job = DiscoveryJob.objects.select_related('aws_account', 'triggered_by').defer(
+        *DiscoveryJob.LIST_DEFERRED_FIELDS,
+    ).get(pk=job.pk)
+    publish(job.pk, 'job', DiscoveryJobListSerializer(job).data)
+
+
+def _claim_stream():
+    """Count a live stream in; False once this process serves its limit."""
+    global _open_streams
+    with _open_streams_lock:
+        if _open_streams >= getattr(settings, 'DISCOVERY_STREAM_MAX_CONNECTIONS', 4):
+            return False
+        _open_streams += 1
+        return True
+
+
+def _release_stream():
+    global _open_streams
+    with _open_streams_lock:
+        _open_streams -= 1
+
+
+def format_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def job_event_stream(job, after=0):
+    """Yield the SSE body for ``job``, starting with entries after log entry ``after``."""
+    from assets.serializers import DiscoveryJobListSerializer
+    from discovery.serializers import DiscoveryLogEntrySerializer
+
+    client = redis_client.get_redis()
+    if client is not None and not _claim_stream():
+        client = None
+    pubsub = None
+    snapshot_seq = 0
+    if client is not None:
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(channel(job.pk))
+            snapshot_seq = int(client.get(sequence_key(job.pk)) or 0)
+        except Exception as e:
+            redis_client.mark_unavailable(e)
+            pubsub = None
+        if pubsub is None:
+            _release_stream()
+
+    try:
+        # Subscribed and numbered first, so nothing published while the
+        # snapshot is read is lost, and nothing it already holds is repeated.
+        job.refresh_from_db()
+        yield format_event('job', DiscoveryJobListSerializer(job).data)
+        last_id = after
+        for entry in job.log_entries.filter(id__gt=after).order_by('id').iterator():
+            yield format_event('log', [DiscoveryLogEntrySerializer(entry).data], entry.id)
+            last_id = entry.id
+        if job.status in TERMINAL_STATUSES:
+            return
+        if pubsub is None:
+            yield f'retry: {FALLBACK_RETRY_MS}\n\n'
+            return
+
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        while time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=KEEPALIVE_SECONDS)
+            if message is None:
+                yield ': keepalive\n\n'
+                continue
+            payload = json.loads(message['data'])
+            if payload.get('seq') is not None and payload['seq'] <= snapshot_seq:
+                continue
+            event, data = payload['event'], payload['data']
+            if event == 'log':
+                data = [entry for entry in data if entry['id'] > last_id]
+                if not data:
+                    continue
+                last_id = data[-1]['id']
+                yield format_event(event, data, last_id)
+            else:
+                yield format_event(event, data)
+            if event == 'job' and data.get('status') in TERMINAL_STATUSES:
+                return
+    except Exception as e:
+        logger.warning(f"Discovery event stream for job {job.pk} ended: {e}")
+    finally:
+        if pubsub is not None:
+            _release_stream()
+            try:
+                pubsub.close()
+            except Exception:
+                pass
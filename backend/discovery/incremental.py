@@ -0,0 +1,184 @@
+"""
+Incremental asset updates from an SQS queue of AWS change events.
+
+``EventConsumer`` receives messages for a short window after the first one
+arrives, so a burst of events about the same resources (create, tag,
+modify...) is coalesced (see ``change_events.coalesce``) and refreshed once:
+
+- resources of ``DESCRIBE_BY_ID_SERVICES`` are re-described by id with the
+  discoverer methods; ids that are no longer found are decommissioned
+- any other change re-runs its (service, region) unit and decommissions the
+  unit's stale assets, like a targeted scan
+
+AWS is asked for the current state every time, so events that arrive late,
+twice or out of order do no harm. Messages are deleted once their changes
+are applied; those whose refresh failed with a retryable error are left for
+SQS to deliver again.
+"""
+import logging
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.models import AWSAccount
+from discovery.aws_discoverer import AWSResourceDiscoverer, DiscoveryUnit, is_retryable_error
+from discovery.change_events import SPECS, coalesce, group_key, parse_message
+from discovery.decommission import decommission_resources, decommission_scanned_units
+from discovery.ingest import AssetIngestor
+from discovery.models import DiscoveryUnitHistory
+
+logger = logging.getLogger(__name__)
+
+# Longest wait of one ReceiveMessage call (the SQS maximum).
+LONG_POLL_SECONDS = 20
+
+# Messages per ReceiveMessage / DeleteMessageBatch call (the SQS maximum).
+SQS_BATCH_SIZE = 10
+
+
+def apply_changes(groups):
+    """Refresh the assets behind coalesced changes.
+
+    Returns (counts, keys of the groups that failed with a retryable error).
+    """
+    counts = Counter()
+    failed = set()
+    by_account = defaultdict(list)
+    for key, ids in groups.items():
+        by_account[key[0]].append((key, ids))
+    accounts = {
+        account.account_id: account
+        for account in AWSAccount.objects.filter(is_active=True, account_id__in=list(by_account))
+    }
+
+    for account_id, items in by_account.items():
+        account = accounts.get(account_id)
+        if account is None:
+            counts['ignored'] += len(items)
+            continue
+        try:
+            discoverer = AWSResourceDiscoverer(account, config_aggregator=False)
+        except Exception as e:
+            logger.error(f"Cannot refresh changed resources of {account_id}: {e}")
+            failed.update(key for key, _ in items)
+            continue
+        # Only the asset types that can change are loaded for matching.
+        ingestor = AssetIngestor(
+            account, service_types={t for key, _ in items for t in SPECS[key[2]].asset_types},
+        )
+        scans = []
+        for key, ids in items:
+            _, region, service = key
+            if not region:
+                counts['ignored'] += 1
+                continue
+            unit = DiscoveryUnit(SPECS[service], region)
+            started_at = timezone.now()
+            resources = []
+            try:
+                discoverer.run_unit(unit, lambda resource: resources.append(resource) or True, ids=ids)
+            except Exception as e:
+                logger.warning(f"Refreshing {service} in {region} for {account_id} failed: {e}")
+                if is_retryable_error(e):
+                    failed.add(key)
+                continue
+            ingestor.ingest(resources)
+            if resources:
+                DiscoveryUnitHistory.clear_empty(account, [(service, region)])
+            if ids is None:
+                counts['units'] += 1
+                scans.append((account.pk, region, service, started_at))
+            else:
+                counts['resources'] += len(ids)
+                missing = ids - {resource['aws_resource_id'] for resource in resources}
+                if missing:
+                    counts['decommissioned'] += decommission_resources(
+                        account, region, unit.spec.asset_types, missing,
+                    )
+        counts['decommissioned'] += sum(decommission_scanned_units(scans).values())
+        counts['new'] += ingestor.new_count
+        counts['updated'] += ingestor.updated_count
+    return counts, failed
+
+
+class EventConsumer:
+    def __init__(self, client, queue_url, window=None, max_messages=None):
+        self.client = client
+        self.queue_url = queue_url
+        self.window = window if window is not None else settings.DISCOVERY_EVENTS_WINDOW_SECONDS
+        self.max_messages = max_messages or settings.DISCOVERY_EVENTS_MAX_MESSAGES
+
+    def receive(self):
+        """Wait for messages, then keep receiving for ``window`` seconds.
+
+        Returns an empty list if nothing arrived within one long poll.
+        """
+        messages = []
+        deadline = None
+        while len(messages) < self.max_messages:
+            wait = LONG_POLL_SECONDS
+            if deadline is not None:
+                wait = min(wait, int(deadline - time.monotonic()))
+                if wait <= 0:
+                    break
+            response = self.client.receive_message(
+                QueueUrl=self.queue_url,
+                MaxNumberOfMessages=min(SQS_BATCH_SIZE, self.max_messages - len(messages)),
+                WaitTimeSeconds=wait,
+            )
+            batch = response.get('Messages', [])
+            if not batch and deadline is None:
+                break
+            if deadline is None:
+                deadline = time.monotonic() + self.window
+            messages.extend(batch)
+        return messages
+
+    def process(self, messages):
+        """Apply the changes of ``messages`` and delete those that are done."""
+        changes = {}
+        for message in messages:
+            try:
+                changes[message['ReceiptHandle']] = parse_message(message['Body'])
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.warning(f"Dropping unreadable change event {message.get('MessageId')}: {e}")
+                changes[message['ReceiptHandle']] = []
+        groups = coalesce(change for message_changes in changes.values() for change in message_changes)
+        counts, failed = apply_changes(groups)
+
+        done = [
+            handle for handle, message_changes in changes.items()
+            if not any(group_key(change) in failed for change in message_changes)
+        ]
+        self.delete(done)
+        counts['messages'] = len(messages)
+        counts['changes'] = sum(len(message_changes) for message_changes in changes.values())
+        counts['retried'] = len(messages) - len(done)
+        return counts
+
+    def delete(self, receipt_handles):
+        for start in range(0, len(receipt_handles), SQS_BATCH_SIZE):
+            batch = receipt_handles[start:start + SQS_BATCH_SIZE]
+            response = self.client.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{'Id': str(n), 'ReceiptHandle': handle} for n, handle in enumerate(batch)],
+            )
+            for failure in response.get('Failed', []):
+                logger.warning(f"Could not delete change event: {failure.get('Message', failure.get('Code'))}")
+
+    def run(self, once=False, stop=None):
+        """Consume the queue until ``stop`` is set, or until it is empty with ``once``."""
+        while stop is None or not stop.is_set():
+            messages = self.receive()
+            if messages:
+                counts = self.process(messages)
+                logger.info(
+                    f"Applied {counts['changes']} change(s) from {counts['messages']} event(s): "
+                    f"{counts['resources']} resource(s) re-described, {counts['units']} unit(s) rescanned, "
+                    f"New: {counts['new']}, Updated: {counts['updated']}, "
+                    f"Decommissioned: {counts['decommissioned']}"
+                )
+            elif once:
+                return
@@ -0,0 +1,223 @@
+"""
+Batched asset ingest for discovery results.
+
+Instead of one ``update_or_create`` per resource, the ingestor loads the
+account's existing assets once, works out which discovered resources are
+new, changed or unchanged in memory and writes each group with a handful
+of bulk queries per batch.
+
+Change detection compares a fingerprint of the discovered values with the
+one stored on the asset at the last write, so unchanged assets only get
+their ``last_seen_at`` bumped and their JSON columns are never loaded.
+"""
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from assets.models import Asset
+
+logger = logging.getLogger(__name__)
+
+# Asset fields refreshed from the discovered resource dict on every run.
+SYNCED_FIELDS = [
+    'name', 'asset_type', 'aws_account', 'aws_region', 'aws_resource_id',
+    'aws_resource_arn', 'aws_service_type', 'status', 'metadata',
+    'ip_addresses', 'dns_names', 'url', 'tags',
+]
+
+# Fields needed to match resources to existing assets.
+MATCH_FIELDS = ['name', 'aws_service_type', 'aws_resource_id', 'aws_region', 'aws_resource_arn']
+
+
+def fingerprint(values):
+    """Stable hash of an asset's discovered values (see ``AssetIngestor._values``)."""
+    canonical = json.dumps(values, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class AssetIngestor:
+    """Upsert discovered resource dicts for a single account in batches.
+
+    Assets are matched by ARN first, then (resource id, region), then
+    (name, service type) within the account. With ``service_types`` only the
+    account's assets of those types are loaded, for callers that know which
+    types they will write.
+    """
+
+    def __init__(self, account, batch_size=None, service_types=None):
+        self.account = account
+        self.batch_size = batch_size or getattr(settings, 'DISCOVERY_BATCH_SIZE', 100)
+        self.service_types = service_types
+        self.discovered_count = 0
+        self.new_count = 0
+        self.updated_count = 0
+        self.unchanged_count = 0
+        self._by_arn = {}
+        self._by_resource_id = {}
+        self._by_name = {}
+        self._load_existing()
+
+    def _load_existing(self):
+        existing = (
+            Asset.objects
+            .filter(aws_account=self.account)
+            .only('id', 'asset_id', 'discovery_fingerprint', *MATCH_FIELDS)
+        )
+        if self.service_types is not None:
+            existing = existing.filter(aws_service_type__in=list(self.service_types))
+        for asset in existing.iterator(chunk_size=2000):
+            self._index(asset)
+
+    def _index(self, asset):
+        if asset.aws_resource_arn:
+            self._by_arn.setdefault(asset.aws_resource_arn, asset)
+        if asset.aws_resource_id and asset.aws_region:
+            self._by_resource_id.setdefault((asset.aws_resource_id, asset.aws_region), asset)
+        self._by_name.setdefault((asset.name, asset.aws_service_type), asset)
+
+    def _match(self, resource):
+        arn = resource.get('aws_resource_arn', '')
+        resource_id = resource.get('aws_resource_id', '')
+        region = resource.get('aws_region', '')
+        if arn:
+            return self._by_arn.get(arn)
+        if resource_id and region:
+            return self._by_resource_id.get((resource_id, region))
+        return self._by_name.get((resource.get('name', ''), resource.get('aws_service_type', '')))
+
+    def _values(self, resource):
+        return {
+            'name': resource.get('name', ''),
+            'asset_type': Asset.AssetType.AWS_SERVICE,
+            'aws_account_id': self.account.pk,
+            'aws_region': resource.get('aws_region', ''),
+            'aws_resource_id': resource.get('aws_resource_id', ''),
+            'aws_resource_arn': resource.get('aws_resource_arn', ''),
+            'aws_service_type': resource.get('aws_service_type', ''),
+            'status': resource.get('status', 'UNKNOWN'),
+            'metadata': resource.get('metadata', {}),
+            'ip_addresses': resource.get('ip_addresses', []),
+            'dns_names': resource.get('dns_names', []),
+            'url': resource.get('url', ''),
+            'tags': resource.get('tags', {}),
+        }
+
+    def _adopt_foreign_arns(self, resources):
+        """Pick up assets matched by ARN that are not (yet) attached to this account."""
+        missing = {
+            r['aws_resource_arn'] for r in resources
+            if r.get('aws_resource_arn') and r['aws_resource_arn'] not in self._by_arn
+        }
+        if not missing:
+            return
+        assets = Asset.objects.filter(aws_resource_arn__in=missing)
+        if self.service_types is None:
+            # The account's own assets are all indexed already.
+            assets = assets.exclude(aws_account=self.account)
+        for asset in assets.only('id', 'asset_id', 'discovery_fingerprint', *MATCH_FIELDS):
+            self._by_arn.setdefault(asset.aws_resource_arn, asset)
+
+    def ingest(self, resources, on_batch=None, on_marker=None):
+        """Persist an iterable of resource dicts in batches of ``batch_size``.
+
+        ``resources`` may be a generator; it is consumed lazily so at most one
+        batch is held in memory. ``on_batch(discovered, new, updated, unchanged)``
+        is called with the per-batch counts after each batch is committed.
+
+        Items that are not dicts are markers: each is passed to
+        ``on_marker(marker)`` once every resource that preceded it in the
+        stream has been committed.
+        """
+        batch = []
+        markers = []
+        for resource in resources:
+            if not isinstance(resource, dict):
+                if batch:
+                    markers.append(resource)
+                elif on_marker:
+                    on_marker(resource)
+                continue
+            batch.append(resource)
+            if len(batch) >= self.batch_size:
+                self._flush(batch, on_batch)
+                batch = []
+                markers = self._release(markers, on_marker)
+        if batch:
+            self._flush(batch, on_batch)
+        self._release(markers, on_marker)
+
+    def _release(self, markers, on_marker):
+        if on_marker:
+            for marker in markers:
+                on_marker(marker)
+        return []
+
+    def _flush(self, batch, on_batch):
+        before = (self.new_count, self.updated_count, self.unchanged_count)
+        self._write_batch(batch)
+        self.discovered_count += len(batch)
+        if on_batch:
+            after = (self.new_count, self.updated_count, self.unchanged_count)
+            on_batch(len(batch), *(a - b for a, b in zip(after, before)))
+
+    def _write_batch(self, resources):
+        now = timezone.now()
+        self._adopt_foreign_arns(resources)
+
+        to_create = []
+        to_update = {}
+        unchanged = {}
+        for resource in resources:
+            values = self._values(resource)
+            digest = fingerprint(values)
+            asset = self._match(resource)
+            if asset is None:
+                asset = Asset(**values, discovery_fingerprint=digest, discovered_at=now, last_seen_at=now)
+                to_create.append(asset)
+                self._index(asset)
+                continue
+            if asset._state.adding or asset.pk in to_update:
+                # Same resource reported twice in one batch; last one wins.
+                for field, value in values.items():
+                    setattr(asset, field, value)
+                asset.discovery_fingerprint = digest
+                continue
+            if asset.discovery_fingerprint != digest:
+                for field, value in values.items():
+                    setattr(asset, field, value)
+                asset.discovery_fingerprint = digest
+                asset.last_seen_at = now
+                asset.updated_at = now
+                to_update[asset.pk] = asset
+                unchanged.pop(asset.pk, None)
+            else:
+                unchanged[asset.pk] = asset
+
+        # Reserve ids in their own short transaction so the counter row is not
+        # locked for the duration of the bulk writes.
+        for asset, asset_id in zip(to_create, Asset.next_asset_ids(len(to_create))):
+            asset.asset_id = asset_id
+
+        with transaction.atomic():
+            if to_create:
+                Asset.objects.bulk_create(to_create, batch_size=self.batch_size)
+            if to_update:
+                Asset.objects.bulk_update(
+                    list(to_update.values()),
+                    SYNCED_FIELDS + ['discovery_fingerprint', 'last_seen_at', 'updated_at'],
+                    batch_size=self.batch_size,
+                )
+            if unchanged:
+                Asset.objects.filter(pk__in=list(unchanged)).update(last_seen_at=now)
+
+        self.new_count += len(to_create)
+        self.updated_count += len(to_update)
+        self.unchanged_count += len(unchanged)
+        logger.debug(
+            'Ingested batch for %s: %d new, %d changed, %d unchanged',
+            self.account.account_id, len(to_create), len(to_update), len(unchanged),
+        )
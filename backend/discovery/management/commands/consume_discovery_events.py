@@ -0,0 +1,44 @@
+import re
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.aws_clients import management_session
+from discovery.incremental import EventConsumer
+
+QUEUE_REGION = re.compile(r'sqs[.-]([a-z0-9-]+)\.amazonaws\.com')
+
+
+class Command(BaseCommand):
+    help = 'Apply AWS resource change events from an SQS queue to the asset inventory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue-url', type=str, help='SQS queue URL (default: DISCOVERY_EVENTS_QUEUE_URL)')
+        parser.add_argument('--endpoint-url', type=str, help='SQS endpoint (default: DISCOVERY_EVENTS_ENDPOINT_URL)')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        queue_url = options.get('queue_url') or settings.DISCOVERY_EVENTS_QUEUE_URL
+        if not queue_url:
+            raise CommandError('No queue configured; set DISCOVERY_EVENTS_QUEUE_URL or pass --queue-url.')
+        match = QUEUE_REGION.search(queue_url)
+        region = match.group(1) if match else settings.AWS_DEFAULT_REGION
+        client = management_session(None).client(
+            'sqs', region_name=region,
+            endpoint_url=options.get('endpoint_url') or settings.DISCOVERY_EVENTS_ENDPOINT_URL or None,
+        )
+
+        stop = threading.Event()
+
+        def request_stop(signum, frame):
+            self.stdout.write('Stopping after the current batch...')
+            stop.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        self.stdout.write(f'Consuming change events from {queue_url}')
+        EventConsumer(client, queue_url).run(once=options.get('once', False), stop=stop)
+        self.stdout.write(self.style.SUCCESS('Change event consumer stopped.'))
@@ -3,24 +3,40 @@ from django.utils import timezone
 
 from accounts.models import AWSAccount
 from assets.models import DiscoveryJob
-from discovery.aws_discoverer import AWSResourceDiscoverer
+from discovery.aws_discoverer import DISCOVERABLE_SERVICE_TYPES, AWSResourceDiscoverer
+from discovery.deadlines import job_deadline
+from discovery.ingest import AssetIngestor
 
 
 class Command(BaseCommand):
     help = 'Discover AWS resources across accounts'
 
     def add_arguments(self, parser):
-        parser.add_argument('--account-id', type=str, help='Specific AWS account ID (12 digits)')
+        parser.add_argument('--account-id', type=str, nargs='+', help='Specific AWS account ID(s) (12 digits)')
+        parser.add_argument('--region', type=str, nargs='+', help='Only scan these regions')
+        parser.add_argument(
+            '--service', type=str, nargs='+',
+            help=f"Only scan these service types ({', '.join(DISCOVERABLE_SERVICE_TYPES)})",
+        )
         parser.add_argument('--dry-run', action='store_true', help='Count resources without saving')
+        parser.add_argument('--batch-size', type=int, help='Assets written per bulk query (default: DISCOVERY_BATCH_SIZE)')
 
     def handle(self, *args, **options):
         account_id_filter = options.get('account_id')
+        regions = options.get('region') or []
+        service_types = [s.upper() for s in options.get('service') or []]
         dry_run = options.get('dry_run', False)
+        batch_size = options.get('batch_size')
+
+        unsupported = sorted(set(service_types) - set(DISCOVERABLE_SERVICE_TYPES))
+        if unsupported:
+            raise CommandError(f"Unsupported service type(s): {', '.join(unsupported)}")
 
         if account_id_filter:
-            accounts = AWSAccount.objects.filter(account_id=account_id_filter, is_active=True)
-            if not accounts.exists():
-                raise CommandError(f'No active account found with ID {account_id_filter}')
+            accounts = AWSAccount.objects.filter(account_id__in=account_id_filter, is_active=True)
+            missing = sorted(set(account_id_filter) - set(accounts.values_list('account_id', flat=True)))
+            if missing:
+                raise CommandError(f"No active account found with ID {', '.join(missing)}")
         else:
             accounts = AWSAccount.objects.filter(is_active=True)
 
@@ -33,60 +49,71 @@ class Command(BaseCommand):
             job = DiscoveryJob.objects.create(
                 status=DiscoveryJob.Status.RUNNING,
                 started_at=timezone.now(),
+                target_regions=regions,
+                target_service_types=service_types,
             )
+            if account_id_filter:
+                job.target_accounts.set(accounts)
 
         total_discovered = 0
         total_new = 0
         total_updated = 0
+        total_unchanged = 0
+        timed_out = 0
 
         for account in accounts:
             self.stdout.write(f'\nDiscovering: {account.account_name} ({account.account_id})')
             try:
-                discoverer = AWSResourceDiscoverer(account)
-                resources = discoverer.discover_all_resources()
-                self.stdout.write(f'  Found {len(resources)} resources')
+                discoverer = AWSResourceDiscoverer(
+                    account, regions=regions, service_types=service_types, deadline=job_deadline(job),
+                )
 
                 if dry_run:
-                    total_discovered += len(resources)
                     by_service = {}
-                    for r in resources:
+                    for r in discoverer.iter_resources():
                         svc = r.get('aws_service_type', 'OTHER')
                         by_service[svc] = by_service.get(svc, 0) + 1
+                    found = sum(by_service.values())
+                    self.stdout.write(f'  Found {found} resources')
+                    total_discovered += found
                     for svc, count in sorted(by_service.items()):
                         self.stdout.write(f'    {svc}: {count}')
                 else:
-                    new_count = 0
-                    updated_count = 0
-                    for resource in resources:
-                        asset, created = discoverer.upsert_asset(resource, account)
-                        if created:
-                            new_count += 1
-                        else:
-                            updated_count += 1
-                    total_discovered += len(resources)
-                    total_new += new_count
-                    total_updated += updated_count
+                    ingestor = AssetIngestor(account, batch_size=batch_size)
+                    ingestor.ingest(discoverer.iter_resources(), on_batch=job.record_progress)
+                    self.stdout.write(f'  Found {ingestor.discovered_count} resources')
+                    total_discovered += ingestor.discovered_count
+                    total_new += ingestor.new_count
+                    total_updated += ingestor.updated_count
+                    total_unchanged += ingestor.unchanged_count
                     account.last_discovery_at = timezone.now()
                     account.save(update_fields=['last_discovery_at'])
-                    self.stdout.write(f'  New: {new_count}, Updated: {updated_count}')
+                    self.stdout.write(
+                        f'  New: {ingestor.new_count}, Updated: {ingestor.updated_count}, '
+                        f'Unchanged: {ingestor.unchanged_count}'
+                    )
 
                 if discoverer.errors:
                     for err in discoverer.errors:
                         self.stderr.write(f'  Warning: {err}')
+                if discoverer.timed_out_units:
+                    timed_out += len(discoverer.timed_out_units)
+                    self.stderr.write(f'  Warning: {len(discoverer.timed_out_units)} unit(s) ran out of time')
 
             except Exception as e:
                 self.stderr.write(self.style.ERROR(f'  Error: {e}'))
 
         if job:
-            job.status = DiscoveryJob.Status.COMPLETED
+            job.status = DiscoveryJob.Status.PARTIAL if timed_out else DiscoveryJob.Status.COMPLETED
             job.resources_discovered = total_discovered
             job.resources_new = total_new
             job.resources_updated = total_updated
+            job.resources_unchanged = total_unchanged
             job.completed_at = timezone.now()
             job.save()
 
         prefix = '[DRY RUN] ' if dry_run else ''
         self.stdout.write(self.style.SUCCESS(
             f'\n{prefix}Discovery complete: {total_discovered} resources found, '
-            f'{total_new} new, {total_updated} updated'
+            f'{total_new} new, {total_updated} updated, {total_unchanged} unchanged'
         ))
@@ -0,0 +1,168 @@
+from collections import Counter, defaultdict
+from itertools import groupby
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.models import AWSAccount
+from assets.models import DiscoveryJob
+from discovery.aws_discoverer import GLOBAL_REGION, SERVICES
+from discovery.config_items import CONFIG_TYPES, parse_item, resource_from_item
+from discovery.config_snapshot import iter_items, snapshot_files
+from discovery.ingest import AssetIngestor
+from discovery.models import DiscoveryLogEntry, DiscoveryUnitHistory
+
+# Asset service types that Config snapshots can provide.
+SNAPSHOT_SERVICE_TYPES = sorted({t for spec in SERVICES if spec.key in CONFIG_TYPES for t in spec.asset_types})
+
+
+class Command(BaseCommand):
+    help = 'Ingest AWS Config snapshot files (.json or .json.gz) without calling AWS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Snapshot files, or directories to search for them')
+        parser.add_argument('--account-id', type=str, nargs='+', help='Only ingest these AWS account ID(s)')
+        parser.add_argument(
+            '--service', type=str, nargs='+',
+            help=f"Only ingest these service types ({', '.join(SNAPSHOT_SERVICE_TYPES)})",
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Count resources without saving')
+        parser.add_argument('--batch-size', type=int, help='Assets written per bulk query (default: DISCOVERY_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        account_id_filter = options.get('account_id')
+        service_types = {s.upper() for s in options.get('service') or []}
+        dry_run = options.get('dry_run', False)
+        batch_size = options.get('batch_size')
+
+        unsupported = sorted(service_types - set(SNAPSHOT_SERVICE_TYPES))
+        if unsupported:
+            raise CommandError(f"Unsupported service type(s): {', '.join(unsupported)}")
+
+        accounts = AWSAccount.objects.filter(is_active=True)
+        if account_id_filter:
+            accounts = accounts.filter(account_id__in=account_id_filter)
+            missing = sorted(set(account_id_filter) - set(accounts.values_list('account_id', flat=True)))
+            if missing:
+                raise CommandError(f"No active account found with ID {', '.join(missing)}")
+        self.accounts = {account.account_id: account for account in accounts}
+
+        files = list(snapshot_files(options['paths']))
+        if not files:
+            raise CommandError('No snapshot files found.')
+
+        job = None
+        if not dry_run:
+            job = DiscoveryJob.objects.create(
+                status=DiscoveryJob.Status.RUNNING,
+                started_at=timezone.now(),
+                target_service_types=sorted(service_types),
+            )
+            if account_id_filter:
+                job.target_accounts.set(accounts)
+
+        try:
+            self._ingest(files, job, service_types, dry_run, batch_size)
+        except Exception as e:
+            if job:
+                job.status = DiscoveryJob.Status.FAILED
+                job.error_message = str(e)
+                job.completed_at = timezone.now()
+                job.save(update_fields=['status', 'error_message', 'completed_at'])
+                job.append_log(f'Snapshot ingest failed: {e}', level=DiscoveryLogEntry.Level.ERROR)
+            raise
+
+    def _ingest(self, files, job, service_types, dry_run, batch_size):
+        ingestors = {}
+        by_service = Counter()
+        self.skipped = Counter()
+        errors = 0
+
+        for path in files:
+            self.stdout.write(f'\nReading: {path}')
+            self.written = defaultdict(set)
+            saved_before = sum(ingestor.discovered_count for ingestor in ingestors.values())
+            try:
+                resources = self._resources(path, service_types)
+                for account_id, group in groupby(resources, key=lambda pair: pair[0]):
+                    group = (resource for _, resource in group)
+                    if dry_run:
+                        by_service.update(r['aws_service_type'] for r in group)
+                        continue
+                    if account_id not in ingestors:
+                        ingestors[account_id] = AssetIngestor(self.accounts[account_id], batch_size=batch_size)
+                    ingestors[account_id].ingest(group, on_batch=job.record_progress)
+            except (OSError, ValueError) as e:
+                # Batches written before the error stay; the rest of the file is not read.
+                errors += 1
+                saved = sum(ingestor.discovered_count for ingestor in ingestors.values()) - saved_before
+                message = f'{e}; partially ingested, {saved} resource(s) saved' if saved else f'{e}; not ingested'
+                self.stderr.write(self.style.ERROR(f'  Error: {message}'))
+                if job:
+                    job.append_log(f'{path}: {message}', level=DiscoveryLogEntry.Level.ERROR)
+            finally:
+                if not dry_run:
+                    self._clear_empty_units()
+
+        if self.skipped['account']:
+            self.stderr.write(f"Skipped {self.skipped['account']} item(s) of accounts that are not configured")
+        self.stdout.write(f"Skipped {self.skipped['type']} deleted or unsupported item(s)")
+
+        if dry_run:
+            total = sum(by_service.values())
+            for svc, count in sorted(by_service.items()):
+                self.stdout.write(f'  {svc}: {count}')
+            self.stdout.write(self.style.SUCCESS(
+                f'\n[DRY RUN] Read {len(files)} file(s): {total} resources found'
+            ))
+            return
+
+        now = timezone.now()
+        AWSAccount.objects.filter(account_id__in=list(ingestors)).update(last_discovery_at=now)
+        totals = [
+            sum(getattr(ingestor, field) for ingestor in ingestors.values())
+            for field in ('discovered_count', 'new_count', 'updated_count', 'unchanged_count')
+        ]
+        job.status = DiscoveryJob.Status.COMPLETED
+        if errors == len(files) and not totals[0]:
+            job.status = DiscoveryJob.Status.FAILED
+            job.error_message = 'No snapshot file could be read'
+        elif errors:
+            job.status = DiscoveryJob.Status.PARTIAL
+            job.error_message = f'{errors} of {len(files)} snapshot file(s) could not be ingested completely'
+        job.resources_discovered, job.resources_new, job.resources_updated, job.resources_unchanged = totals
+        job.completed_at = now
+        job.save()
+        job.append_log(
+            f"Ingested {len(files) - errors} of {len(files)} Config snapshot file(s) completely "
+            f"for {len(ingestors)} account(s): "
+            f"{totals[0]} resources, New: {totals[1]}, Updated: {totals[2]}, Unchanged: {totals[3]}"
+        )
+        style = self.style.WARNING if errors else self.style.SUCCESS
+        self.stdout.write(style(
+            f"\nSnapshot ingest {'incomplete' if errors else 'complete'}: {totals[0]} resources found, "
+            f'{totals[1]} new, {totals[2]} updated, {totals[3]} unchanged'
+        ))
+
+    def _resources(self, path, service_types):
+        """Yield (account ID, resource dict) for the ingestible items of one file."""
+        for raw in iter_items(path):
+            item = parse_item(raw)
+            if item.account_id not in self.accounts:
+                self.skipped['account'] += 1
+                continue
+            resource = resource_from_item(item)
+            if resource is None or (service_types and resource['aws_service_type'] not in service_types):
+                self.skipped['type'] += 1
+                continue
+            self.written[item.account_id].add((resource['aws_service_type'], resource['aws_region']))
+            yield item.account_id, resource
+
+    def _clear_empty_units(self):
+        """Have scans stop skipping the empty units that produce the ingested resources."""
+        for account_id, written in self.written.items():
+            DiscoveryUnitHistory.clear_empty(self.accounts[account_id], {
+                (spec.key, GLOBAL_REGION if spec.is_global else region)
+                for asset_type, region in written
+                for spec in SERVICES if asset_type in spec.asset_types
+            })
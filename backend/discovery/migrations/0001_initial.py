@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-17 00:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0004_awsaccount_discovery_regions'),
+        ('assets', '0004_discoveryjob_resources_decommissioned'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscoveryShard',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('resources_discovered', models.IntegerField(default=0)),
+                ('resources_new', models.IntegerField(default=0)),
+                ('resources_updated', models.IntegerField(default=0)),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('aws_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.awsaccount')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='assets.discoveryjob')),
+            ],
+            options={
+                'unique_together': {('job', 'aws_account')},
+            },
+        ),
+    ]
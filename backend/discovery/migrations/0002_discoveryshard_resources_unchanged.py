@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discovery', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryshard',
+            name='resources_unchanged',
+            field=models.IntegerField(default=0),
+        ),
+    ]
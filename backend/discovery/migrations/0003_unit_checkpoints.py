@@ -0,0 +1,34 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discovery', '0002_discoveryshard_resources_unchanged'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryshard',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='DiscoveryUnitRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service', models.CharField(max_length=50)),
+                ('region', models.CharField(max_length=30)),
+                ('status', models.CharField(choices=[('COMPLETED', 'Completed'), ('FAILED', 'Failed')], max_length=10)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('resources_discovered', models.IntegerField(default=0)),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('shard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='units', to='discovery.discoveryshard')),
+            ],
+            options={
+                'unique_together': {('shard', 'service', 'region')},
+            },
+        ),
+    ]
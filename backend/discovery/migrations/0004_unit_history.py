@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_awsaccount_discovery_regions'),
+        ('discovery', '0003_unit_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscoveryUnitHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service', models.CharField(max_length=50)),
+                ('region', models.CharField(max_length=30)),
+                ('consecutive_empty_runs', models.IntegerField(default=0)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('aws_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='discovery_unit_history', to='accounts.awsaccount')),
+            ],
+            options={
+                'verbose_name_plural': 'Discovery unit history',
+                'unique_together': {('aws_account', 'service', 'region')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discovery', '0004_unit_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryunitrun',
+            name='api_calls',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='discoveryunitrun',
+            name='bytes_received',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='discoveryunitrun',
+            name='pages',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='discoveryunitrun',
+            name='retries',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='discoveryunitrun',
+            name='throttles',
+            field=models.IntegerField(default=0),
+        ),
+    ]
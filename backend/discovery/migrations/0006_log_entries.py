@@ -0,0 +1,32 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0007_discoveryjob_targets'),
+        ('discovery', '0005_unit_telemetry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscoveryLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('level', models.CharField(choices=[('INFO', 'Info'), ('WARNING', 'Warning'), ('ERROR', 'Error')], default='INFO', max_length=10)),
+                ('account_id', models.CharField(blank=True, default='', max_length=12)),
+                ('region', models.CharField(blank=True, default='', max_length=30)),
+                ('service', models.CharField(blank=True, default='', max_length=50)),
+                ('message', models.TextField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='log_entries', to='assets.discoveryjob')),
+            ],
+            options={
+                'verbose_name_plural': 'Discovery log entries',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['job', 'id'], name='discovery_d_job_id_9c7506_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discovery', '0006_log_entries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryshard',
+            name='predicted_duration_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='discoveryunithistory',
+            name='avg_duration_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discovery', '0007_unit_durations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='discoveryunitrun',
+            name='status',
+            field=models.CharField(choices=[('COMPLETED', 'Completed'), ('FAILED', 'Failed'), ('TIMED_OUT', 'Timed out')], max_length=10),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('discovery', '0008_unit_run_timed_out'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discoveryunitrun',
+            name='permanent_error',
+            field=models.BooleanField(default=False),
+        ),
+    ]
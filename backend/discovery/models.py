@@ -1 +1,213 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+class DiscoveryShard(models.Model):
+    """One account's slice of a DiscoveryJob, run as its own Celery task."""
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        RUNNING = 'RUNNING', 'Running'
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job = models.ForeignKey('assets.DiscoveryJob', on_delete=models.CASCADE, related_name='shards')
+    aws_account = models.ForeignKey('accounts.AWSAccount', on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    resources_discovered = models.IntegerField(default=0)
+    resources_new = models.IntegerField(default=0)
+    resources_updated = models.IntegerField(default=0)
+    resources_unchanged = models.IntegerField(default=0)
+    error_message = models.TextField(blank=True, default='')
+    # Deliveries of discover_account_task for this shard, including resumes but
+    # not continuations after a time limit.
+    attempts = models.IntegerField(default=0)
+    # Run time expected from the account's unit history; null without history.
+    predicted_duration_seconds = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['job', 'aws_account']
+
+    def __str__(self):
+        return f'{self.job_id.hex[:8]} / {self.aws_account_id} ({self.status})'
+
+    def record_progress(self, discovered=0, new=0, updated=0, unchanged=0):
+        """Atomically add to the resource counters while the shard is running."""
+        DiscoveryShard.objects.filter(pk=self.pk).update(
+            resources_discovered=models.F('resources_discovered') + discovered,
+            resources_new=models.F('resources_new') + new,
+            resources_updated=models.F('resources_updated') + updated,
+            resources_unchanged=models.F('resources_unchanged') + unchanged,
+        )
+
+
+class DiscoveryUnitRun(models.Model):
+    """Checkpoint for one (service, region) unit of a shard.
+
+    A unit is recorded once every resource it produced has been written, so a
+    resumed shard can skip the units that are already COMPLETED, or that
+    failed with a ``permanent_error``.
+    """
+
+    class Status(models.TextChoices):
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+        # Stopped at its deadline, or never started before the job budget ran out.
+        TIMED_OUT = 'TIMED_OUT', 'Timed out'
+
+    shard = models.ForeignKey(DiscoveryShard, on_delete=models.CASCADE, related_name='units')
+    service = models.CharField(max_length=50)
+    region = models.CharField(max_length=30)
+    status = models.CharField(max_length=10, choices=Status.choices)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    resources_discovered = models.IntegerField(default=0)
+    # AWS API telemetry: operations called, pages of paginated listings,
+    # retried HTTP requests, throttling errors and response bytes.
+    api_calls = models.IntegerField(default=0)
+    pages = models.IntegerField(default=0)
+    retries = models.IntegerField(default=0)
+    throttles = models.IntegerField(default=0)
+    bytes_received = models.BigIntegerField(default=0)
+    error_message = models.TextField(blank=True, default='')
+    # Failed or timed out with an error that a retry of the shard would not fix.
+    permanent_error = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ['shard', 'service', 'region']
+
+    def __str__(self):
+        return f'{self.service} / {self.region} ({self.status})'
+
+    @property
+    def duration(self):
+        if self.started_at and self.completed_at:
+            return self.completed_at - self.started_at
+        return None
+
+
+class DiscoveryUnitHistory(models.Model):
+    """Recent outcome of one (service, region) unit of an account across jobs.
+
+    Units that came back empty ``DISCOVERY_SKIP_EMPTY_AFTER`` runs in a row are
+    skipped by untargeted scans, except for an occasional probe once
+    ``DISCOVERY_EMPTY_PROBE_HOURS`` have passed since they last ran. Change
+    events and snapshot ingests that write resources for a unit reset its
+    count, so it is scanned again.
+
+    ``avg_duration_seconds`` is an exponentially weighted average of the
+    unit's successful run times, used to start the longest units first.
+    """
+
+    # Weight of the latest run in ``avg_duration_seconds``.
+    DURATION_WEIGHT = 0.3
+
+    aws_account = models.ForeignKey(
+        'accounts.AWSAccount', on_delete=models.CASCADE, related_name='discovery_unit_history',
+    )
+    service = models.CharField(max_length=50)
+    region = models.CharField(max_length=30)
+    consecutive_empty_runs = models.IntegerField(default=0)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    avg_duration_seconds = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['aws_account', 'service', 'region']
+        verbose_name_plural = 'Discovery unit history'
+
+    def __str__(self):
+        return f'{self.aws_account_id} / {self.service} / {self.region}'
+
+    @classmethod
+    def record(cls, account, service, region, resources, duration=None):
+        """Count a successful run of a unit that produced ``resources`` resources in ``duration`` seconds."""
+        entry, _ = cls.objects.get_or_create(aws_account=account, service=service, region=region)
+        updates = {}
+        if duration is not None:
+            updates['avg_duration_seconds'] = (
+                Coalesce(models.F('avg_duration_seconds'), models.Value(duration)) * (1 - cls.DURATION_WEIGHT)
+                + duration * cls.DURATION_WEIGHT
+            )
+        cls.objects.filter(pk=entry.pk).update(
+            consecutive_empty_runs=models.F('consecutive_empty_runs') + 1 if not resources else 0,
+            last_run_at=timezone.now(),
+            **updates,
+        )
+
+    @classmethod
+    def clear_empty(cls, account, units):
+        """Stop skipping ``units`` of ``account``: resources were written for them outside a scan."""
+        match = models.Q()
+        for service, region in units:
+            match |= models.Q(service=service, region=region)
+        if match:
+            cls.objects.filter(match, aws_account=account, consecutive_empty_runs__gt=0).update(
+                consecutive_empty_runs=0,
+            )
+
+    @classmethod
+    def durations(cls, account):
+        """{(service, region): average seconds} of ``account``'s units with a recorded run time."""
+        return {
+            (service, region): seconds
+            for service, region, seconds in cls.objects.filter(
+                aws_account=account, avg_duration_seconds__isnull=False,
+            ).values_list('service', 'region', 'avg_duration_seconds')
+        }
+
+    @classmethod
+    def empty_units(cls, account):
+        """(service, region) pairs of ``account`` that can be skipped this run."""
+        threshold = getattr(settings, 'DISCOVERY_SKIP_EMPTY_AFTER', 3)
+        if threshold <= 0:
+            return set()
+        probe_after = timedelta(hours=getattr(settings, 'DISCOVERY_EMPTY_PROBE_HOURS', 168))
+        return set(cls.objects.filter(
+            aws_account=account,
+            consecutive_empty_runs__gte=threshold,
+            last_run_at__gt=timezone.now() - probe_after,
+        ).values_list('service', 'region'))
+
+
+class DiscoveryLogEntry(models.Model):
+    """One line of a discovery job's log. Rows are only ever inserted."""
+
+    class Level(models.TextChoices):
+        INFO = 'INFO', 'Info'
+        WARNING = 'WARNING', 'Warning'
+        ERROR = 'ERROR', 'Error'
+
+    job = models.ForeignKey('assets.DiscoveryJob', on_delete=models.CASCADE, related_name='log_entries')
+    created_at = models.DateTimeField(default=timezone.now)
+    level = models.CharField(max_length=10, choices=Level.choices, default=Level.INFO)
+    account_id = models.CharField(max_length=12, blank=True, default='')
+    region = models.CharField(max_length=30, blank=True, default='')
+    service = models.CharField(max_length=50, blank=True, default='')
+    message = models.TextField()
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['job', 'id'])]
+        verbose_name_plural = 'Discovery log entries'
+
+    def __str__(self):
+        return self.as_text()
+
+    def as_text(self):
+        """The entry as a plain log line, e.g. ``  123456789012: ec2/eu-central-1: ERROR: ...``."""
+        prefix = f'  {self.account_id}: ' if self.account_id else ''
+        if self.service or self.region:
+            prefix += f"{'/'.join(filter(None, [self.service, self.region]))}: "
+        if self.level == self.Level.ERROR:
+            prefix += 'ERROR: '
+        elif self.level == self.Level.WARNING:
+            prefix += 'Warning: '
+        return f'{prefix}{self.message}'
@@ -0,0 +1,193 @@
+"""
+Token-bucket rate governor for discovery's AWS API calls.
+
+AWS throttles per account, service and region, and that budget is shared by
+every thread and Celery worker scanning the same account. Each discoverer
+client takes a token from the bucket for its (account, service, region) before
+every HTTP request. Buckets live in Redis (``DISCOVERY_REDIS_URL``) so
+all workers draw from the same budget; without Redis, or while it is
+unreachable, each process keeps its own buckets.
+
+Rates adapt to what AWS reports: a throttling error halves the bucket's rate
+(down to ``MIN_RATE_FRACTION`` of its limit), and every granted token raises
+it again by ``RATE_INCREASE_FRACTION`` until it is back at the limit.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from discovery import deadlines, redis_client
+
+logger = logging.getLogger(__name__)
+
+# Error codes botocore treats as throttling.
+THROTTLE_ERROR_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+    'TooManyRequestsException', 'ProvisionedThroughputExceededException',
+    'TransactionInProgressException', 'RequestLimitExceeded', 'BandwidthLimitExceeded',
+    'LimitExceededException', 'RequestThrottled', 'SlowDown', 'PriorRequestNotComplete',
+    'EC2ThrottledException',
+}
+
+MIN_RATE_FRACTION = 0.1
+RATE_INCREASE_FRACTION = 0.02
+THROTTLE_BACKOFF = 0.5
+
+# Idle buckets are dropped from Redis after this many seconds.
+BUCKET_TTL = 3600
+
+_ACQUIRE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local increase = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'rate')
+local rate = math.min(tonumber(state[3]) or limit, limit)
+local capacity = math.max(rate, 1)
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    rate = math.min(limit, rate + increase)
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now), 'rate', tostring(rate))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return tostring(wait)
+"""
+
+_THROTTLE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local rate = math.min(tonumber(redis.call('HGET', KEYS[1], 'rate')) or limit, limit)
+rate = math.max(tonumber(ARGV[2]), rate * tonumber(ARGV[3]))
+redis.call('HSET', KEYS[1], 'rate', tostring(rate))
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return tostring(rate)
+"""
+
+
+class _LocalBucket:
+    def __init__(self, limit):
+        self.rate = limit
+        self.tokens = max(limit, 1)
+        self.ts = time.monotonic()
+
+
+class RateGovernor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._scripts = {}
+
+    def limit_for(self, service):
+        """Requests per second allowed for ``service`` (0 = unlimited)."""
+        limits = getattr(settings, 'DISCOVERY_RATE_LIMITS', {})
+        return float(limits.get(service, getattr(settings, 'DISCOVERY_RATE_LIMIT_DEFAULT', 10)))
+
+    def acquire(self, account_id, service, region):
+        """Block until a request to ``service`` in ``region`` may be sent.
+
+        Raises ``DeadlineExceeded`` instead of waiting past the deadline of
+        the unit running in the calling thread.
+        """
+        limit = self.limit_for(service)
+        if limit <= 0:
+            return
+        key = self._key(account_id, service, region)
+        deadline = deadlines.current_deadline.get()
+        while True:
+            wait = self._take(key, limit)
+            if wait <= 0:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise deadlines.DeadlineExceeded('Unit deadline exceeded while waiting for rate tokens')
+            time.sleep(wait)
+
+    def throttled(self, account_id, service, region):
+        """Slow the bucket down after AWS throttled a request."""
+        limit = self.limit_for(service)
+        if limit <= 0:
+            return
+        key = self._key(account_id, service, region)
+        floor = limit * MIN_RATE_FRACTION
+        scripts = self._redis_scripts()
+        if scripts is not None:
+            try:
+                rate = float(scripts[1](keys=[key], args=[limit, floor, THROTTLE_BACKOFF, BUCKET_TTL]))
+                logger.debug(f"Throttled on {key}, rate now {rate:.2f}/s")
+                return
+            except Exception as e:
+                redis_client.mark_unavailable(e)
+        with self._lock:
+            bucket = self._buckets.setdefault(key, _LocalBucket(limit))
+            bucket.rate = max(floor, min(bucket.rate, limit) * THROTTLE_BACKOFF)
+
+    def attach(self, client, account_id):
+        """Make every request sent by ``client`` go through the governor."""
+        service = client.meta.service_model.service_name
+        region = client.meta.region_name
+
+        def before_send(**kwargs):
+            self.acquire(account_id, service, region)
+
+        def needs_retry(response=None, **kwargs):
+            if response and is_throttle_response(response):
+                self.throttled(account_id, service, region)
+
+        client.meta.events.register('before-send', before_send, unique_id='discovery-rate-governor')
+        client.meta.events.register('needs-retry', needs_retry, unique_id='discovery-rate-feedback')
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def _key(self, account_id, service, region):
+        return f'discovery:rate:{account_id}:{service}:{region or "global"}'
+
+    def _take(self, key, limit):
+        """Take a token if one is available; otherwise return seconds to wait."""
+        scripts = self._redis_scripts()
+        if scripts is not None:
+            try:
+                return float(scripts[0](
+                    keys=[key], args=[limit, limit * RATE_INCREASE_FRACTION, BUCKET_TTL],
+                ))
+            except Exception as e:
+                redis_client.mark_unavailable(e)
+        with self._lock:
+            bucket = self._buckets.setdefault(key, _LocalBucket(limit))
+            now = time.monotonic()
+            rate = min(bucket.rate, limit)
+            bucket.tokens = min(max(rate, 1), bucket.tokens + (now - bucket.ts) * rate)
+            bucket.ts = now
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                bucket.rate = min(limit, rate + limit * RATE_INCREASE_FRACTION)
+                return 0
+            return (1 - bucket.tokens) / rate
+
+    def _redis_scripts(self):
+        """The (acquire, throttle) scripts for the shared Redis, or None without it."""
+        client = redis_client.get_redis()
+        if client is None:
+            return None
+        scripts = self._scripts.get(id(client))
+        if scripts is None:
+            scripts = (client.register_script(_ACQUIRE_SCRIPT), client.register_script(_THROTTLE_SCRIPT))
+            self._scripts = {id(client): scripts}
+        return scripts
+
+
+def is_throttle_response(response):
+    """Whether a botocore ``(http_response, parsed)`` pair is a throttling error."""
+    http_response, parsed = response
+    code = (parsed or {}).get('Error', {}).get('Code')
+    return code in THROTTLE_ERROR_CODES or getattr(http_response, 'status_code', None) == 429
+
+
+governor = RateGovernor()
@@ -0,0 +1,52 @@
+"""
+Shared Redis connection for discovery's cross-process state (rate buckets,
+progress events), configured by ``DISCOVERY_REDIS_URL``.
+
+Redis is optional: ``get_redis()`` returns None when no URL is set, and for
+``RETRY_SECONDS`` after a caller reports it unreachable, so callers fall back
+to per-process behaviour instead of blocking on connection timeouts.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_SECONDS = 60
+
+_lock = threading.Lock()
+_client = None
+_client_url = None
+_retry_at = 0
+
+
+def get_redis():
+    """Return the shared client, or None if Redis is not configured or unreachable."""
+    global _client, _client_url
+    url = getattr(settings, 'DISCOVERY_REDIS_URL', '')
+    if not url or time.monotonic() < _retry_at:
+        return None
+    with _lock:
+        if _client is None or _client_url != url:
+            import redis
+
+            _client = redis.Redis.from_url(url, socket_connect_timeout=2, socket_timeout=5)
+            _client_url = url
+        return _client
+
+
+def mark_unavailable(error):
+    """Stop using Redis for ``RETRY_SECONDS`` after ``error``."""
+    global _retry_at
+    logger.warning(f"Discovery cannot reach Redis, falling back for {RETRY_SECONDS}s: {error}")
+    _retry_at = time.monotonic() + RETRY_SECONDS
+
+
+def reset():
+    global _client, _client_url, _retry_at
+    with _lock:
+        _client = None
+        _client_url = None
+        _retry_at = 0
@@ -0,0 +1,143 @@
+"""
+Thread-pool scheduler for discovery units.
+
+A unit is one discoverer method run against one region (or once for global
+services). All units of an account share a single bounded pool; per-service
+caps keep any one AWS API from taking every worker, and units waiting on a
+saturated service are skipped over rather than blocking a thread.
+
+Units are dispatched longest-first by their historical run time (see
+``longest_first``), so a slow unit starts early instead of extending the tail
+of the job; ``predict_makespan`` estimates how long that schedule takes.
+
+``bounded_map`` covers the per-item fan-out inside a single unit (e.g. one
+describe call per S3 bucket).
+"""
+import contextvars
+import heapq
+import logging
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+from discovery.deadlines import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class UnitScheduler:
+    def __init__(self, max_workers, service_caps=None, stop_event=None, deadline=None):
+        self.max_workers = max(1, max_workers)
+        self.service_caps = {k: max(1, v) for k, v in (service_caps or {}).items()}
+        self.stop_event = stop_event
+        # time.monotonic() value after which no more units are started.
+        self.deadline = deadline
+
+    def _stopped(self):
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def run(self, units, work, cap_key, on_done=None):
+        """Run ``work(unit)`` for every unit, dispatching in the given order.
+
+        ``cap_key(unit)`` names the service whose cap applies to a unit.
+        ``on_done(unit, error)`` is called from the scheduling thread as each
+        unit finishes; ``error`` is the exception raised by ``work`` or None.
+        Units still waiting at ``deadline`` are not started; they are passed
+        to ``on_done`` with a ``DeadlineExceeded`` error.
+        """
+        pending = list(units)
+        running = {}
+        active = Counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                if self._stopped():
+                    pending.clear()
+                if pending and self.deadline is not None and time.monotonic() >= self.deadline:
+                    for unit in pending:
+                        self._finish(unit, DeadlineExceeded('Not started before the job budget ran out'), on_done)
+                    pending.clear()
+
+                for unit in list(pending):
+                    if len(running) >= self.max_workers:
+                        break
+                    key = cap_key(unit)
+                    cap = self.service_caps.get(key)
+                    if cap is not None and active[key] >= cap:
+                        continue
+                    pending.remove(unit)
+                    active[key] += 1
+                    running[executor.submit(work, unit)] = unit
+
+                if not running:
+                    break
+                timeout = None
+                if pending and self.deadline is not None:
+                    timeout = max(0, self.deadline - time.monotonic())
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit = running.pop(future)
+                    active[cap_key(unit)] -= 1
+                    self._finish(unit, future.exception(), on_done)
+
+    def _finish(self, unit, error, on_done):
+        if on_done:
+            on_done(unit, error)
+        elif error:
+            logger.error(f"Discovery unit {unit} failed: {error}")
+
+
+def longest_first(units, estimate):
+    """``units`` ordered by ``estimate(unit)`` seconds, longest first.
+
+    Units without an estimate (None) go first, since any of them could be the
+    longest; among themselves, and between equal estimates, the given order
+    is kept.
+    """
+    def key(unit):
+        seconds = estimate(unit)
+        return (0, 0) if seconds is None else (1, -seconds)
+
+    return sorted(units, key=key)
+
+
+def predict_makespan(durations, workers):
+    """Seconds until ``durations`` finish when dispatched longest-first onto ``workers`` threads.
+
+    Per-service caps are not modelled, so this is a lower bound when they bind.
+    """
+    finish_times = [0.0] * max(1, min(workers, len(durations)))
+    for seconds in sorted(durations, reverse=True):
+        heapq.heapreplace(finish_times, finish_times[0] + seconds)
+    return max(finish_times)
+
+
+def bounded_map(fn, items, max_workers):
+    """Run ``fn(item)`` on a small thread pool, yielding ``(item, result, error)``.
+
+    Results are yielded as they complete. ``items`` is consumed lazily and at
+    most ``2 * max_workers`` calls are queued at once, so a long listing is not
+    materialized up front. Closing the generator cancels calls not yet started.
+    Each call runs in a copy of the caller's context, so context variables
+    (e.g. the unit's telemetry) carry over to the pool threads.
+    """
+    max_workers = max(1, max_workers)
+    items = iter(items)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(item):
+        return executor.submit(contextvars.copy_context().run, fn, item)
+
+    try:
+        running = {submit(item): item for item in islice(items, 2 * max_workers)}
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = running.pop(future)
+                error = future.exception()
+                yield item, (None if error else future.result()), error
+            for item in islice(items, len(done)):
+                running[submit(item)] = item
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
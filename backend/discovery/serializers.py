@@ -0,0 +1,28 @@
+from rest_framework import serializers
+
+from .models import DiscoveryLogEntry, DiscoveryUnitRun
+
+
+class DiscoveryUnitRunSerializer(serializers.ModelSerializer):
+    account_id = serializers.CharField(source='shard.aws_account.account_id', read_only=True)
+    account_name = serializers.CharField(source='shard.aws_account.account_name', read_only=True)
+    duration_seconds = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DiscoveryUnitRun
+        fields = [
+            'id', 'account_id', 'account_name', 'service', 'region', 'status',
+            'started_at', 'completed_at', 'duration_seconds', 'resources_discovered',
+            'api_calls', 'pages', 'retries', 'throttles', 'bytes_received',
+            'error_message',
+        ]
+
+    def get_duration_seconds(self, obj):
+        d = obj.duration
+        return d.total_seconds() if d else None
+
+
+class DiscoveryLogEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DiscoveryLogEntry
+        fields = ['id', 'created_at', 'level', 'account_id', 'region', 'service', 'message']
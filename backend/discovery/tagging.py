@@ -0,0 +1,69 @@
+"""
+Bulk tag lookup through the Resource Groups Tagging API.
+
+Several services only return tags through a separate per-resource call
+(``get_bucket_tagging``, ``list_tags_for_resource``, ...). ``TagIndex`` instead
+loads every tagged resource of a region with a few paginated
+``tag:GetResources`` calls the first time that region is asked for, and then
+answers lookups by ARN from memory.
+"""
+import logging
+import threading
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Resource types whose discoverers would otherwise fetch tags one by one.
+TAG_RESOURCE_TYPES = [
+    's3',
+    'cloudfront:distribution',
+    'es:domain',
+    'ecr:repository',
+    'elasticloadbalancing:loadbalancer',
+]
+
+# Route 53's ListTagsForResources accepts at most this many zone IDs per call.
+ROUTE53_TAG_BATCH_SIZE = 10
+
+
+class TagIndex:
+    def __init__(self, client_factory, resource_types=None):
+        """``client_factory(region)`` returns a ``resourcegroupstaggingapi`` client."""
+        self.client_factory = client_factory
+        self.resource_types = resource_types or TAG_RESOURCE_TYPES
+        self._lock = threading.Lock()
+        self._region_locks = defaultdict(threading.Lock)
+        self._regions = {}
+
+    def lookup(self, region, arn):
+        """Return the tags for ``arn``, or None if the region's index is unavailable.
+
+        Resources the index does not know about have no tags, so they get ``{}``.
+        """
+        tags_by_arn = self._region(region)
+        if tags_by_arn is None:
+            return None
+        return tags_by_arn.get(arn, {})
+
+    def _region(self, region):
+        with self._lock:
+            region_lock = self._region_locks[region]
+        with region_lock:
+            if region not in self._regions:
+                self._regions[region] = self._load(region)
+            return self._regions[region]
+
+    def _load(self, region):
+        try:
+            client = self.client_factory(region)
+            paginator = client.get_paginator('get_resources')
+            tags_by_arn = {}
+            for page in paginator.paginate(ResourceTypeFilters=self.resource_types, ResourcesPerPage=100):
+                for mapping in page.get('ResourceTagMappingList', []):
+                    tags_by_arn[mapping['ResourceARN']] = {
+                        t.get('Key', ''): t.get('Value', '') for t in mapping.get('Tags', [])
+                    }
+            return tags_by_arn
+        except Exception as e:
+            logger.debug(f"Bulk tag lookup unavailable in {region}, falling back to per-resource calls: {e}")
+            return None
@@ -6,13 +6,25 @@ from discovery.celery_tasks import run_discovery_task
 logger = logging.getLogger(__name__)
 
 
-def run_discovery(account_id=None, user=None):
-    """Run AWS resource discovery. If account_id is None, discover all active accounts."""
+def run_discovery(account_id=None, user=None, account_ids=None, regions=None, service_types=None):
+    """Run AWS resource discovery.
+
+    With no targets every active account is scanned in full. ``account_ids``
+    (AWSAccount primary keys), ``regions`` and ``service_types``
+    (Asset.AWSServiceType values) narrow the job to those accounts and units.
+    """
+    account_ids = list(account_ids or ())
+    if account_id is None and len(account_ids) == 1:
+        account_id = account_ids[0]
     job = DiscoveryJob.objects.create(
         aws_account_id=account_id,
         status=DiscoveryJob.Status.PENDING,
         triggered_by=user,
+        target_regions=list(regions or ()),
+        target_service_types=list(service_types or ()),
     )
+    if account_ids:
+        job.target_accounts.set(account_ids)
 
     run_discovery_task.delay(str(job.id))
     return job
@@ -0,0 +1,78 @@
+"""
+Per-unit API telemetry collected through botocore event hooks.
+
+The discoverer sets ``current_stats`` to a fresh ``UnitStats`` while it runs a
+unit; hooks attached to each discovery client then count the operations,
+HTTP requests, pages, throttles and response bytes of whatever unit is
+current in the calling thread. ``bounded_map`` copies the context into its
+worker threads, so per-item fan-out is counted against its unit too.
+"""
+import contextvars
+import threading
+
+from botocore import xform_name
+
+from discovery.ratelimit import is_throttle_response
+
+current_stats = contextvars.ContextVar('discovery_unit_stats', default=None)
+
+
+class UnitStats:
+    FIELDS = ('api_calls', 'requests', 'pages', 'throttles', 'bytes_received')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, field, amount=1):
+        with self._lock:
+            self._counts[field] += amount
+
+    def as_dict(self):
+        """Counters as stored on DiscoveryUnitRun (retries = requests beyond one per call)."""
+        with self._lock:
+            counts = dict(self._counts)
+        requests = counts.pop('requests')
+        counts['retries'] = max(0, requests - counts['api_calls'])
+        return counts
+
+
+def _count(field, amount=1):
+    stats = current_stats.get()
+    if stats is not None:
+        stats.add(field, amount)
+
+
+def _response_bytes(http_response, model):
+    length = http_response.headers.get('content-length')
+    if length is not None:
+        return int(length)
+    if model is not None and model.has_streaming_output:
+        return 0
+    return len(http_response.content or b'')
+
+
+def attach(client):
+    """Count ``client``'s calls against the unit running in the calling thread."""
+    def before_call(**kwargs):
+        _count('api_calls')
+
+    def before_send(**kwargs):
+        _count('requests')
+
+    def needs_retry(response=None, **kwargs):
+        if response and is_throttle_response(response):
+            _count('throttles')
+
+    def after_call(http_response=None, model=None, **kwargs):
+        if current_stats.get() is None or http_response is None:
+            return
+        _count('bytes_received', _response_bytes(http_response, model))
+        if http_response.status_code < 300 and model is not None and client.can_paginate(xform_name(model.name)):
+            _count('pages')
+
+    events = client.meta.events
+    events.register('before-call', before_call, unique_id='discovery-telemetry-call')
+    events.register('before-send', before_send, unique_id='discovery-telemetry-send')
+    events.register('needs-retry', needs_retry, unique_id='discovery-telemetry-retry')
+    events.register('after-call', after_call, unique_id='discovery-telemetry-response')
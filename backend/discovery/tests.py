@@ -0,0 +1,1510 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
+
+from botocore.exceptions import ClientError
+from botocore.hooks import HierarchicalEmitter
+from celery.exceptions import SoftTimeLimitExceeded
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import AWSAccount
+from assets.models import Asset, DiscoveryJob
+from discovery import (
+    aws_discoverer, celery_tasks, change_events, config_snapshot, deadlines, events, redis_client, telemetry,
+)
+from discovery.aws_discoverer import AWSResourceDiscoverer, IncompleteUnitError
+from discovery.decommission import decommission_stale_assets
+from discovery.incremental import EventConsumer
+from discovery.ingest import AssetIngestor
+from discovery.models import DiscoveryShard, DiscoveryUnitHistory, DiscoveryUnitRun
+from discovery.ratelimit import RateGovernor
+from discovery.scheduler import UnitScheduler, bounded_map, longest_first, predict_makespan
+from discovery.tagging import TagIndex
+
+
+class ConfigAggregatorTest(TestCase):
+    ITEMS = [
+        {
+            'resourceType': 'AWS::EC2::Instance', 'resourceId': 'i-1', 'awsRegion': 'eu-central-1',
+            'arn': 'arn:aws:ec2:eu-central-1:123456789012:instance/i-1', 'accountId': '123456789012',
+            'configurationItemStatus': 'OK', 'tags': [{'key': 'Name', 'value': 'web'}],
+            'configuration': {'instanceType': 't3.micro', 'state': {'name': 'running'}, 'privateIpAddress': '10.0.0.1'},
+        },
+        {
+            'resourceType': 'AWS::RDS::DBInstance', 'resourceId': 'db-1', 'awsRegion': 'eu-central-1',
+            'configurationItemStatus': 'OK', 'configuration': {'dBClusterIdentifier': 'cluster-1'},
+        },
+        {
+            'resourceType': 'AWS::EC2::VPC', 'resourceId': 'vpc-1', 'awsRegion': 'eu-central-1',
+            'configurationItemStatus': 'ResourceDeleted', 'configuration': {},
+        },
+        {
+            'resourceType': 'AWS::OpenSearch::Domain', 'resourceId': 'x', 'resourceName': 'logs',
+            'awsRegion': 'eu-central-1', 'configurationItemStatus': 'OK',
+            'configuration': {'DomainName': 'logs', 'DomainEndpoint': 'search-logs.es.amazonaws.com',
+                              'ClusterConfig': {'InstanceType': 'r6g.large.search'}},
+        },
+        {
+            'resourceType': 'AWS::S3::Bucket', 'resourceId': 'bucket', 'resourceName': 'bucket',
+            'awsRegion': 'us-east-1', 'configurationItemStatus': 'OK', 'configuration': {},
+        },
+    ]
+    RECORDED = {
+        'eu-central-1': [
+            'AWS::EC2::Instance', 'AWS::EC2::VPC', 'AWS::RDS::DBInstance', 'AWS::OpenSearch::Domain', 'AWS::S3::Bucket',
+        ],
+        'us-east-1': ['AWS::S3::Bucket'],
+    }
+
+    def setUp(self):
+        self.account = AWSAccount.objects.create(
+            account_id='123456789012', account_name='Org',
+            account_type=AWSAccount.AccountType.MANAGEMENT,
+            discovery_backend=AWSAccount.DiscoveryBackend.CONFIG_AGGREGATOR,
+            config_aggregator_name='org-aggregator',
+        )
+        self.discoverer = AWSResourceDiscoverer(self.account)
+        self.config = mock.Mock()
+        self.config.get_paginator.return_value.paginate.side_effect = self.select
+        self.discoverer.config_source.client = self.config
+        self.specs = {spec.key: spec for spec in aws_discoverer.SERVICES}
+
+    def select(self, Expression, **kwargs):
+        if 'GROUP BY' in Expression:
+            rows = [
+                {'awsRegion': region, 'resourceType': resource_type, 'COUNT(*)': 1}
+                for region, types in self.RECORDED.items() for resource_type in types
+            ]
+        else:
+            rows = self.ITEMS
+        return [{'Results': [json.dumps(row) for row in rows]}]
+
+    def run_unit(self, key, region):
+        emitted = []
+        self.discoverer.run_unit(
+            aws_discoverer.DiscoveryUnit(self.specs[key], region), lambda r: emitted.append(r) or True,
+        )
+        return emitted
+
+    def test_units_are_read_from_one_aggregator_query(self):
+        with mock.patch.object(self.discoverer, 'discover_ec2_instances', return_value=iter([])) as direct:
+            ec2 = self.run_unit('ec2', 'eu-central-1')
+            self.assertEqual(self.run_unit('vpc', 'eu-central-1'), [])
+            self.assertEqual(self.run_unit('rds_instances', 'eu-central-1'), [])
+            opensearch = self.run_unit('opensearch', 'eu-central-1')
+            s3 = self.run_unit('s3', 'global')
+            direct.assert_not_called()
+
+        self.assertEqual(ec2[0]['name'], 'web')
+        self.assertEqual(ec2[0]['status'], 'ACTIVE')
+        self.assertEqual(ec2[0]['ip_addresses'], ['10.0.0.1'])
+        self.assertEqual(ec2[0]['aws_resource_arn'], 'arn:aws:ec2:eu-central-1:123456789012:instance/i-1')
+        self.assertEqual(opensearch[0]['dns_names'], ['search-logs.es.amazonaws.com'])
+        self.assertEqual(opensearch[0]['metadata']['instance_type'], 'r6g.large.search')
+        self.assertEqual((s3[0]['aws_resource_arn'], s3[0]['aws_region']), ('arn:aws:s3:::bucket', 'us-east-1'))
+        self.assertEqual(self.config.get_paginator.return_value.paginate.call_count, 2)
+        expression = self.config.get_paginator.return_value.paginate.call_args.kwargs['Expression']
+        self.assertIn("accountId = '123456789012'", expression)
+        self.assertNotIn('AWS::MSK::Cluster', expression)
+        self.assertEqual(self.discoverer.config_source.units_served, 5)
+
+    def test_unrecorded_regions_and_services_are_discovered_directly(self):
+        with mock.patch.object(self.discoverer, 'discover_ec2_instances', return_value=iter([make_resource('i-2')])), \
+                mock.patch.object(self.discoverer, 'discover_msk_clusters', return_value=iter([])) as msk:
+            self.assertEqual(self.run_unit('ec2', 'us-west-2')[0]['aws_resource_id'], 'i-2')
+            self.run_unit('msk', 'eu-central-1')
+
+        msk.assert_called_once()
+
+    def test_units_of_types_not_recorded_in_their_region_are_discovered_directly(self):
+        self.RECORDED = {'eu-central-1': ['AWS::EC2::Instance'], 'us-east-1': ['AWS::S3::Bucket']}
+        source = self.discoverer.config_source
+
+        def covers(key, region):
+            return source.covers(aws_discoverer.DiscoveryUnit(self.specs[key], region))
+
+        self.assertTrue(covers('ec2', 'eu-central-1'))
+        self.assertFalse(covers('lambda', 'eu-central-1'))
+        self.assertFalse(covers('ec2', 'us-east-1'))
+        # Buckets in eu-central-1 would be missed: S3 is not recorded there.
+        self.assertFalse(covers('s3', 'global'))
+        self.assertFalse(covers('cloudfront', 'global'))
+
+        self.RECORDED['us-east-1'].append('AWS::CloudFront::Distribution')
+        source._loaded = False
+        self.assertTrue(covers('cloudfront', 'global'))
+
+    def test_unreadable_aggregator_falls_back_to_direct_discovery(self):
+        self.config.get_paginator.return_value.paginate.side_effect = ClientError(
+            {'Error': {'Code': 'NoSuchConfigurationAggregatorException'}}, 'SelectAggregateResourceConfig',
+        )
+        with mock.patch.object(self.discoverer, 'discover_ec2_instances', return_value=iter([make_resource('i-2')])):
+            self.assertEqual(len(self.run_unit('ec2', 'eu-central-1')), 1)
+
+        self.assertIsNotNone(self.discoverer.config_source.error)
+
+
+class ConfigSnapshotIngestTest(TestCase):
+    def setUp(self):
+        self.account = AWSAccount.objects.create(account_id='123456789012', account_name='Test')
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write(self, name, document):
+        path = os.path.join(self.dir, name)
+        with (gzip.open(path, 'wt') if name.endswith('.gz') else open(path, 'w')) as f:
+            json.dump(document, f, indent=1)
+        return path
+
+    def item(self, resource_id, account_id='123456789012', status='OK'):
+        return {
+            'resourceType': 'AWS::EC2::Instance', 'resourceId': resource_id, 'awsRegion': 'eu-central-1',
+            'ARN': f'arn:aws:ec2:eu-central-1:{account_id}:instance/{resource_id}', 'awsAccountId': account_id,
+            'configurationItemStatus': status, 'tags': {'Name': resource_id.upper()},
+            'configuration': {'instanceType': 't3.micro', 'state': {'name': 'running'}},
+        }
+
+    def test_items_are_streamed_across_buffer_refills(self):
+        items = [self.item(f'i-{n}') for n in range(20)]
+        path = self.write('snapshot.json', {'fileVersion': '1.0', 'configurationItems': items})
+
+        with mock.patch.object(config_snapshot, 'CHUNK_SIZE', 7):
+            self.assertEqual(list(config_snapshot.iter_items(path)), items)
+        self.assertEqual(list(config_snapshot.iter_items(self.write('bare.json', items[:2]))), items[:2])
+        with self.assertRaises(config_snapshot.SnapshotFormatError):
+            list(config_snapshot.iter_items(self.write('other.json', {'fileVersion': '1.0'})))
+
+    def test_command_ingests_snapshot_directory(self):
+        self.write('a.json.gz', {'configurationItems': [
+            self.item('i-1'), self.item('i-2', status='ResourceDeleted'), self.item('i-3', account_id='999999999999'),
+        ]})
+        self.write('b.json.gz', {'configurationItems': [self.item('i-4')]})
+        self.write('notes.txt', {})
+        for _ in range(3):
+            DiscoveryUnitHistory.record(self.account, 'ec2', 'eu-central-1', 0)
+
+        call_command('ingest_config_snapshot', self.dir, '--batch-size', '1', stdout=mock.Mock(), stderr=mock.Mock())
+
+        assets = Asset.objects.filter(aws_account=self.account).order_by('aws_resource_id')
+        self.assertEqual([(a.aws_resource_id, a.name) for a in assets], [('i-1', 'I-1'), ('i-4', 'I-4')])
+        job = DiscoveryJob.objects.get()
+        self.assertEqual((job.status, job.resources_new), (DiscoveryJob.Status.COMPLETED, 2))
+        # Scans no longer skip EC2 there as empty.
+        self.assertEqual(DiscoveryUnitHistory.empty_units(self.account), set())
+
+    def test_malformed_item_fails_without_buffering_the_rest_of_the_file(self):
+        path = os.path.join(self.dir, 'broken.json')
+        with open(path, 'w') as f:
+            f.write('{"configurationItems": [{"resourceId": "i-1", oops}, ' + '{"resourceId": "i-2"}, ' * 200 + ']}')
+        reader_fill = config_snapshot._Reader.fill
+
+        with mock.patch.object(config_snapshot, 'CHUNK_SIZE', 64), \
+                mock.patch.object(config_snapshot._Reader, 'fill', autospec=True, side_effect=reader_fill) as fill:
+            with self.assertRaises(config_snapshot.SnapshotFormatError):
+                list(config_snapshot.iter_items(path))
+        self.assertLess(fill.call_count, 5)
+
+    def test_file_failing_partway_leaves_the_job_partial(self):
+        self.write('a.json', {'configurationItems': [self.item('i-1')]})
+        with open(os.path.join(self.dir, 'b.json'), 'w') as f:
+            f.write('{"configurationItems": [' + json.dumps(self.item('i-2')) + ', {oops}]}')
+
+        call_command('ingest_config_snapshot', self.dir, '--batch-size', '1', stdout=mock.Mock(), stderr=mock.Mock())
+
+        self.assertEqual(set(Asset.objects.values_list('aws_resource_id', flat=True)), {'i-1', 'i-2'})
+        job = DiscoveryJob.objects.get()
+        self.assertEqual(job.status, DiscoveryJob.Status.PARTIAL)
+        self.assertEqual(job.error_message, '1 of 2 snapshot file(s) could not be ingested completely')
+        self.assertIn('partially ingested, 1 resource(s) saved', job.log_text)
+
+    def test_unexpected_errors_fail_the_job(self):
+        self.write('a.json', {'configurationItems': [self.item('i-1')]})
+
+        with mock.patch.object(AssetIngestor, 'ingest', side_effect=RuntimeError('database is locked')):
+            with self.assertRaises(RuntimeError):
+                call_command('ingest_config_snapshot', self.dir, stdout=mock.Mock(), stderr=mock.Mock())
+
+        job = DiscoveryJob.objects.get()
+        self.assertEqual((job.status, job.error_message), (DiscoveryJob.Status.FAILED, 'database is locked'))
+
+
+class ChangeEventConsumerTest(TestCase):
+    def setUp(self):
+        self.account = AWSAccount.objects.create(
+            account_id='123456789012', account_name='Mgmt',
+            account_type=AWSAccount.AccountType.MANAGEMENT,
+        )
+        AssetIngestor(self.account).ingest([make_resource('i-1'), make_resource('i-2')])
+        self.sqs = mock.Mock()
+        self.sqs.delete_message_batch.return_value = {}
+
+    def event(self, **fields):
+        return {'account': '123456789012', 'region': 'eu-central-1', 'resources': [], 'detail': {}, **fields}
+
+    def consume(self, *events):
+        messages = [
+            {'MessageId': str(n), 'ReceiptHandle': f'handle-{n}', 'Body': json.dumps(event)}
+            for n, event in enumerate(events)
+        ]
+        self.sqs.receive_message.side_effect = [{'Messages': messages}, {}]
+        consumer = EventConsumer(self.sqs, 'queue', window=0)
+        return consumer.process(consumer.receive())
+
+    def deleted_handles(self):
+        return [
+            entry['ReceiptHandle']
+            for call in self.sqs.delete_message_batch.call_args_list for entry in call.kwargs['Entries']
+        ]
+
+    def test_events_are_parsed_into_resource_changes(self):
+        run_instances = self.event(detail={
+            'eventSource': 'ec2.amazonaws.com', 'eventName': 'RunInstances',
+            'responseElements': {'instancesSet': {'items': [{'instanceId': 'i-9'}]}},
+        })
+        state_change = {'Type': 'Notification', 'Message': json.dumps(self.event(
+            resources=['arn:aws:ec2:eu-central-1:123456789012:instance/i-1', 'arn:aws:s3:::bucket/key'],
+        ))}
+        lambda_call = self.event(detail={'eventSource': 'lambda.amazonaws.com', 'eventName': 'UpdateFunctionCode'})
+        bucket = self.event(detail={'configurationItem': {'ARN': 'arn:aws:s3:::bucket'}})
+        failed_call = self.event(detail={'eventSource': 'lambda.amazonaws.com', 'errorCode': 'AccessDenied'})
+        named_calls = [
+            self.event(detail={
+                'eventSource': 'lambda.amazonaws.com', 'eventName': 'UpdateFunctionConfiguration20150331v2',
+                'requestParameters': {'functionName': 'arn:aws:lambda:eu-central-1:123456789012:function:fn'},
+            }),
+            self.event(detail={
+                'eventSource': 's3.amazonaws.com', 'eventName': 'PutBucketTagging',
+                'requestParameters': {'bucketName': 'bucket'},
+            }),
+            self.event(detail={
+                'eventSource': 'rds.amazonaws.com', 'eventName': 'CreateDBInstance',
+                'requestParameters': {'dBClusterIdentifier': 'cluster-1', 'dBInstanceIdentifier': 'db-1'},
+            }),
+        ]
+
+        def parse(event):
+            return change_events.parse_message(json.dumps(event))
+
+        self.assertEqual(parse(run_instances), [('123456789012', 'eu-central-1', 'ec2', 'i-9')])
+        self.assertEqual(parse(state_change), [('123456789012', 'eu-central-1', 'ec2', 'i-1')])
+        self.assertEqual(parse(lambda_call), [('123456789012', 'eu-central-1', 'lambda', None)])
+        self.assertEqual(parse(bucket), [('123456789012', 'global', 's3', 'bucket')])
+        self.assertEqual(parse(failed_call), [])
+        self.assertEqual([change for event in named_calls for change in parse(event)], [
+            ('123456789012', 'eu-central-1', 'lambda', 'fn'),
+            ('123456789012', 'global', 's3', 'bucket'),
+            ('123456789012', 'eu-central-1', 'rds_clusters', 'cluster-1'),
+            ('123456789012', 'eu-central-1', 'rds_instances', 'db-1'),
+        ])
+
+    def test_bursts_are_coalesced_per_resource_and_unit(self):
+        change = change_events.ResourceChange
+        groups = change_events.coalesce([
+            change('1', 'eu-central-1', 'ec2', 'i-1'),
+            change('1', 'eu-central-1', 'ec2', 'i-1'),
+            change('1', 'eu-central-1', 'ec2', 'i-2'),
+            change('1', 'eu-central-1', 'lambda', 'fn'),
+            change('1', 'eu-central-1', 'lambda', None),
+            change('1', 'global', 's3', 'bucket'),
+            change('1', 'global', 'cloudfront', 'E1'),
+        ])
+        self.assertEqual(groups, {
+            ('1', 'eu-central-1', 'ec2'): {'i-1', 'i-2'},
+            ('1', 'eu-central-1', 'lambda'): None,
+            ('1', 'global', 's3'): {'bucket'},
+            ('1', 'global', 'cloudfront'): None,
+        })
+
+    def test_changed_resources_are_described_by_id_and_missing_ones_decommissioned(self):
+        arn = 'arn:aws:ec2:eu-central-1:123456789012:instance/{}'
+        with mock.patch.object(
+            AWSResourceDiscoverer, 'discover_ec2_instances',
+            return_value=iter([make_resource('i-1', name='renamed')]),
+        ) as describe:
+            counts = self.consume(
+                self.event(resources=[arn.format('i-1')]),
+                self.event(resources=[arn.format('i-1'), arn.format('i-2')]),
+                self.event(resources=[arn.format('i-3').replace('123456789012', '999999999999')]),
+            )
+
+        describe.assert_called_once_with(mock.ANY, 'eu-central-1', ids=['i-1', 'i-2'])
+        self.assertEqual(Asset.objects.get(aws_resource_id='i-1').name, 'renamed')
+        self.assertEqual(Asset.objects.get(aws_resource_id='i-2').status, 'DECOMMISSIONED')
+        self.assertEqual((counts['updated'], counts['decommissioned'], counts['ignored']), (1, 1, 1))
+        self.assertCountEqual(self.deleted_handles(), ['handle-0', 'handle-1', 'handle-2'])
+
+    def test_deleted_buckets_are_decommissioned_by_name_in_their_region(self):
+        AssetIngestor(self.account).ingest([
+            make_resource(name, aws_service_type='S3', aws_resource_arn=f'arn:aws:s3:::{name}', aws_region='eu-west-1')
+            for name in ('kept', 'gone')
+        ])
+        deleted = self.event(detail={
+            'eventSource': 's3.amazonaws.com', 'eventName': 'DeleteBucket', 'requestParameters': {'bucketName': 'gone'},
+        })
+        tagged = self.event(resources=['arn:aws:s3:::kept'])
+        kept = make_resource('kept', aws_service_type='S3', aws_resource_arn='arn:aws:s3:::kept', aws_region='eu-west-1')
+
+        with mock.patch.object(AWSResourceDiscoverer, 'discover_s3_buckets', return_value=iter([kept])) as describe:
+            counts = self.consume(deleted, tagged)
+
+        describe.assert_called_once_with(mock.ANY, ids=['gone', 'kept'])
+        self.assertEqual(Asset.objects.get(aws_resource_id='gone').status, 'DECOMMISSIONED')
+        self.assertEqual(Asset.objects.get(aws_resource_id='kept').status, 'ACTIVE')
+        self.assertEqual((counts['resources'], counts['units'], counts['decommissioned']), (2, 0, 1))
+
+    def test_resources_are_described_by_name_and_missing_ones_left_out(self):
+        discoverer = AWSResourceDiscoverer(self.account, config_aggregator=False)
+        discoverer.tag_index = None
+        client = mock.Mock()
+
+        def get_function(FunctionName):
+            if FunctionName != 'fn':
+                raise ClientError({'Error': {'Code': 'ResourceNotFoundException'}}, 'GetFunction')
+            return {'Configuration': {'FunctionName': 'fn', 'Runtime': 'python3.12'}, 'Tags': {'team': 'a'}}
+
+        client.get_function.side_effect = get_function
+        client.describe_load_balancers.side_effect = ClientError(
+            {'Error': {'Code': 'LoadBalancerNotFound'}}, 'DescribeLoadBalancers',
+        )
+
+        with mock.patch.object(discoverer, '_client', return_value=client):
+            functions = list(discoverer.discover_lambda_functions(discoverer.session, 'eu-central-1', ids=['fn', 'gone']))
+            load_balancers = list(discoverer.discover_load_balancers(discoverer.session, 'eu-central-1', ids=['gone']))
+
+        self.assertEqual([(f['aws_resource_id'], f['tags']) for f in functions], [('fn', {'team': 'a'})])
+        self.assertEqual(load_balancers, [])
+        client.get_paginator.assert_not_called()
+
+    def test_unit_rescan_decommissions_stale_assets_and_retries_failures(self):
+        lambda_call = self.event(detail={'eventSource': 'lambda.amazonaws.com', 'eventName': 'DeleteFunction'})
+        ecr_call = self.event(detail={'eventSource': 'ecr.amazonaws.com', 'eventName': 'DeleteRepository'})
+        AssetIngestor(self.account).ingest([make_resource('fn', aws_service_type='LAMBDA', aws_resource_arn='')])
+        throttled = ClientError({'Error': {'Code': 'ThrottlingException'}}, 'DescribeRepositories')
+        with mock.patch.object(AWSResourceDiscoverer, 'discover_lambda_functions', return_value=iter([])), \
+                mock.patch.object(AWSResourceDiscoverer, 'discover_ecr_repositories', side_effect=throttled):
+            counts = self.consume(lambda_call, ecr_call)
+
+        self.assertEqual(Asset.objects.get(aws_resource_id='fn').status, 'DECOMMISSIONED')
+        self.assertEqual((counts['units'], counts['retried']), (1, 1))
+        self.assertEqual(self.deleted_handles(), ['handle-0'])
+
+    def test_resources_written_for_empty_units_stop_them_being_skipped(self):
+        for service in ('lambda', 'ecr'):
+            for _ in range(3):
+                DiscoveryUnitHistory.record(self.account, service, 'eu-central-1', 0)
+        created = self.event(detail={'eventSource': 'lambda.amazonaws.com', 'eventName': 'CreateFunction20150331'})
+        function = make_resource('fn', aws_service_type='LAMBDA', aws_resource_arn='')
+
+        with mock.patch.object(AWSResourceDiscoverer, 'discover_lambda_functions', return_value=iter([function])):
+            self.consume(created)
+
+        self.assertEqual(DiscoveryUnitHistory.empty_units(self.account), {('ecr', 'eu-central-1')})
+
+
+def make_resource(resource_id, **overrides):
+    resource = {
+        'name': resource_id,
+        'aws_service_type': 'EC2',
+        'aws_resource_id': resource_id,
+        'aws_resource_arn': f'arn:aws:ec2:eu-central-1:123456789012:instance/{resource_id}',
+        'aws_region': 'eu-central-1',
+        'status': 'ACTIVE',
+        'tags': {},
+        'metadata': {'instance_type': 't3.micro'},
+    }
+    resource.update(overrides)
+    return resource
+
+
+class AssetIngestorTest(TestCase):
+    def setUp(self):
+        self.account = AWSAccount.objects.create(account_id='123456789012', account_name='Test')
+
+    def test_creates_new_assets_in_batches(self):
+        ingestor = AssetIngestor(self.account, batch_size=2)
+        ingestor.ingest(make_resource(f'i-{n}') for n in range(5))
+
+        self.assertEqual(ingestor.new_count, 5)
+        self.assertEqual(ingestor.updated_count, 0)
+        assets = Asset.objects.filter(aws_account=self.account)
+        self.assertEqual(assets.count(), 5)
+        self.assertEqual(
+            sorted(assets.values_list('asset_id', flat=True)),
+            [f'ASSET-{n:04d}' for n in range(1, 6)],
+        )
+        self.assertFalse(assets.filter(discovered_at__isnull=True).exists())
+
+    def test_updates_existing_assets_matched_by_arn(self):
+        AssetIngestor(self.account).ingest([make_resource('i-1'), make_resource('i-2')])
+
+        ingestor = AssetIngestor(self.account)
+        ingestor.ingest([
+            make_resource('i-1', metadata={'instance_type': 'm5.large'}),
+            make_resource('i-2'),
+            make_resource('i-3'),
+        ])
+
+        self.assertEqual(ingestor.new_count, 1)
+        self.assertEqual(ingestor.updated_count, 1)
+        self.assertEqual(ingestor.unchanged_count, 1)
+        asset = Asset.objects.get(aws_resource_id='i-1')
+        self.assertEqual(asset.metadata, {'instance_type': 'm5.large'})
+        self.assertEqual(Asset.objects.count(), 3)
+
+    def test_on_batch_reports_progress_to_job(self):
+        job = DiscoveryJob.objects.create(status=DiscoveryJob.Status.RUNNING)
+        ingestor = AssetIngestor(self.account, batch_size=2)
+        ingestor.ingest((make_resource(f'i-{n}') for n in range(3)), on_batch=job.record_progress)
+
+        job.refresh_from_db()
+        self.assertEqual(job.resources_discovered, 3)
+        self.assertEqual(job.resources_new, 3)
+        self.assertEqual(ingestor.discovered_count, 3)
+
+    def test_unchanged_assets_are_not_rewritten(self):
+        AssetIngestor(self.account).ingest([make_resource('i-1')])
+        before = Asset.objects.get()
+
+        job = DiscoveryJob.objects.create(status=DiscoveryJob.Status.RUNNING)
+        ingestor = AssetIngestor(self.account)
+        ingestor.ingest([make_resource('i-1')], on_batch=job.record_progress)
+
+        after = Asset.objects.get()
+        self.assertEqual(after.updated_at, before.updated_at)
+        self.assertGreater(after.last_seen_at, before.last_seen_at)
+        job.refresh_from_db()
+        self.assertEqual((job.resources_updated, job.resources_unchanged), (0, 1))
+
+    def test_manual_edit_clears_fingerprint(self):
+        AssetIngestor(self.account).ingest([make_resource('i-1')])
+        asset = Asset.objects.get()
+        self.assertTrue(asset.discovery_fingerprint)
+        asset.name = 'renamed'
+        asset.save(update_fields=['name'])
+
+        ingestor = AssetIngestor(self.account)
+        ingestor.ingest([make_resource('i-1')])
+
+        self.assertEqual(ingestor.updated_count, 1)
+        self.assertEqual(Asset.objects.get().name, 'i-1')
+
+    def test_markers_are_released_after_preceding_resources_are_written(self):
+        seen = []
+
+        def on_marker(marker):
+            seen.append((marker, Asset.objects.count()))
+
+        AssetIngestor(self.account, batch_size=2).ingest(
+            ['start', make_resource('i-1'), 'one', make_resource('i-2'), make_resource('i-3'), 'three'],
+            on_marker=on_marker,
+        )
+        self.assertEqual(seen, [('start', 0), ('one', 2), ('three', 3)])
+
+    def test_duplicate_resource_in_one_run_creates_single_asset(self):
+        ingestor = AssetIngestor(self.account)
+        ingestor.ingest([make_resource('i-1'), make_resource('i-1', status='INACTIVE')])
+
+        self.assertEqual(Asset.objects.count(), 1)
+        self.assertEqual(Asset.objects.get().status, 'INACTIVE')
+
+    def test_service_types_limit_the_assets_loaded(self):
+        AssetIngestor(self.account).ingest([
+            make_resource('i-1'), make_resource('fn', aws_service_type='LAMBDA', aws_resource_arn='arn:fn'),
+        ])
+
+        ingestor = AssetIngestor(self.account, service_types={'LAMBDA'})
+        self.assertEqual(list(ingestor._by_arn), ['arn:fn'])
+        ingestor.ingest([make_resource('i-1', name='renamed')])
+
+        self.assertEqual(Asset.objects.count(), 2)
+        self.assertEqual(Asset.objects.get(aws_resource_id='i-1').name, 'renamed')
+
+
+class ResourceStreamTest(TestCase):
+    def setUp(self):
+        self.account = AWSAccount.objects.create(
+            account_id='123456789012', account_name='Mgmt',
+            account_type=AWSAccount.AccountType.MANAGEMENT,
+        )
+
+    @override_settings(DISCOVERY_QUEUE_SIZE=2)
+    def test_iter_resources_streams_through_bounded_queue(self):
+        def produce(emit, stop):
+            for n in range(10):
+                if not emit(make_resource(f'i-{n}')):
+                    return
+
+        discoverer = AWSResourceDiscoverer(self.account)
+        with mock.patch.object(discoverer, '_produce_resources', side_effect=produce):
+            ids = [r['aws_resource_id'] for r in discoverer.iter_resources()]
+        self.assertEqual(ids, [f'i-{n}' for n in range(10)])
+
+    @override_settings(DISCOVERY_QUEUE_SIZE=1)
+    def test_closing_stream_early_stops_producer(self):
+        emitted = []
+
+        def produce(emit, stop):
+            for n in range(100):
+                if not emit(n):
+                    return
+                emitted.append(n)
+
+        discoverer = AWSResourceDiscoverer(self.account)
+        with mock.patch.object(discoverer, '_produce_resources', side_effect=produce):
+            stream = discoverer.iter_resources()
+            next(stream)
+            stream.close()
+        self.assertLess(len(emitted), 100)
+
+
+class UnitSchedulerTest(TestCase):
+    def test_runs_every_unit_within_service_caps(self):
+        lock = threading.Lock()
+        active = Counter()
+        peak = Counter()
+        done = []
+
+        def work(unit):
+            service, _ = unit
+            with lock:
+                active[service] += 1
+                peak[service] = max(peak[service], active[service])
+            time.sleep(0.01)
+            with lock:
+                active[service] -= 1
+
+        units = [('ec2', n) for n in range(6)] + [('s3', n) for n in range(6)]
+        UnitScheduler(max_workers=6, service_caps={'ec2': 2}).run(
+            units, work, cap_key=lambda unit: unit[0],
+            on_done=lambda unit, error: done.append(unit),
+        )
+
+        self.assertCountEqual(done, units)
+        self.assertLessEqual(peak['ec2'], 2)
+        self.assertGreater(peak['s3'], 2)
+
+    def test_reports_unit_errors(self):
+        errors = {}
+
+        def work(unit):
+            if unit == 'bad':
+                raise RuntimeError('boom')
+
+        UnitScheduler(max_workers=2).run(
+            ['good', 'bad'], work, cap_key=lambda unit: unit,
+            on_done=lambda unit, error: errors.__setitem__(unit, error),
+        )
+        self.assertIsNone(errors['good'])
+        self.assertIsInstance(errors['bad'], RuntimeError)
+
+    def test_units_still_pending_at_the_deadline_are_not_started(self):
+        ran = []
+        errors = {}
+
+        def work(unit):
+            ran.append(unit)
+            time.sleep(0.05)
+
+        UnitScheduler(max_workers=1, deadline=time.monotonic() + 0.02).run(
+            ['a', 'b', 'c'], work, cap_key=lambda unit: unit,
+            on_done=lambda unit, error: errors.__setitem__(unit, error),
+        )
+        self.assertEqual(ran, ['a'])
+        self.assertIsNone(errors['a'])
+        self.assertIsInstance(errors['b'], deadlines.DeadlineExceeded)
+        self.assertIsInstance(errors['c'], deadlines.DeadlineExceeded)
+
+
+class DeadlineTest(TestCase):
+    @override_settings(DISCOVERY_UNIT_TIMEOUT=900, DISCOVERY_UNIT_TIMEOUTS={'s3': 1800, 'us-east-1': 300, 'ecr': 0})
+    def test_overrides_replace_the_default_unit_timeout(self):
+        self.assertEqual(deadlines.unit_timeout('ec2', 'eu-central-1'), 900)
+        self.assertEqual(deadlines.unit_timeout('s3', 'global'), 1800)
+        self.assertEqual(deadlines.unit_timeout('s3', 'us-east-1'), 300)
+        self.assertIsNone(deadlines.unit_timeout('ecr', 'eu-central-1'))
+
+    @override_settings(DISCOVERY_JOB_BUDGET=600)
+    def test_job_budget_counts_from_the_job_start(self):
+        started_at = timezone.now()
+        self.assertIsNone(deadlines.job_deadline(DiscoveryJob(started_at=None)))
+        self.assertEqual(
+            deadlines.job_deadline(DiscoveryJob(started_at=started_at)), started_at + timedelta(seconds=600),
+        )
+        with override_settings(DISCOVERY_JOB_BUDGET=0):
+            self.assertIsNone(deadlines.job_deadline(DiscoveryJob(started_at=started_at)))
+
+    def test_requests_past_the_unit_deadline_are_not_sent(self):
+        client = mock.Mock()
+        client.meta.events = HierarchicalEmitter()
+        deadlines.attach(client)
+
+        client.meta.events.emit('before-send.ec2.DescribeInstances', request=None)
+        token = deadlines.current_deadline.set(time.monotonic() + 60)
+        try:
+            client.meta.events.emit('before-send.ec2.DescribeInstances', request=None)
+            deadlines.current_deadline.set(time.monotonic() - 1)
+            with self.assertRaises(deadlines.DeadlineExceeded):
+                client.meta.events.emit('before-send.ec2.DescribeInstances', request=None)
+        finally:
+            deadlines.current_deadline.reset(token)
+        self.assertFalse(aws_discoverer.is_retryable_error(deadlines.DeadlineExceeded()))
+
+
+class MakespanTest(TestCase):
+    def test_predicts_longest_first_schedule(self):
+        self.assertEqual(predict_makespan([5, 4, 3, 3, 3], 2), 10)
+        self.assertEqual(predict_makespan([5, 1], 10), 5)
+        self.assertEqual(predict_makespan([], 4), 0)
+        self.assertEqual(longest_first(['a', 'b', 'c', 'd'], {'a': 1, 'c': 9, 'd': 4}.get), ['b', 'c', 'd', 'a'])
+
+
+class BoundedMapTest(TestCase):
+    def test_isolates_item_errors_and_bounds_concurrency(self):
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def work(n):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            time.sleep(0.005)
+            with lock:
+                active[0] -= 1
+            if n == 3:
+                raise RuntimeError('boom')
+            return n * 2
+
+        results = {item: (result, error) for item, result, error in bounded_map(work, range(10), 3)}
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(results[4], (8, None))
+        self.assertIsInstance(results[3][1], RuntimeError)
+        self.assertLessEqual(active[1], 3)
+
+
+class S3DiscoveryTest(TestCase):
+    def setUp(self):
+        self.account = AWSAccount.objects.create(
+            account_id='123456789012', account_name='Mgmt',
+            account_type=AWSAccount.AccountType.MANAGEMENT,
+        )
+        self.s3 = mock.Mock()
+        self.s3.get_paginator.return_value.paginate.return_value = [{'Buckets': [
+            {'Name': 'with-region', 'BucketRegion': 'eu-west-1'},
+            {'Name': 'no-region'},
+        ]}]
+        self.s3.get_bucket_location.return_value = {'LocationConstraint': 'eu-central-1'}
+        self.s3.get_bucket_tagging.return_value = {'TagSet': [{'Key': 'env', 'Value': 'prod'}]}
+        self.discoverer = AWSResourceDiscoverer(self.account)
+        self.discoverer.tag_index = None
+
+    def discover(self):
+        with mock.patch.object(self.discoverer, '_client', return_value=self.s3):
+            return {r['name']: r for r in self.discoverer.discover_s3_buckets(self.discoverer.session)}
+
+    def test_uses_listed_region_and_resolves_missing_ones(self):
+        buckets = self.discover()
+
+        self.assertEqual(buckets['with-region']['aws_region'], 'eu-west-1')
+        self.assertEqual(buckets['no-region']['aws_region'], 'eu-central-1')
+        self.s3.get_bucket_location.assert_called_once_with(Bucket='no-region')
+        self.assertEqual(buckets['with-region']['tags'], {'env': 'prod'})
+
+    def test_older_botocore_lists_buckets_without_pagination(self):
+        self.s3.can_paginate.return_value = False
+        self.s3.list_buckets.return_value = {'Buckets': [{'Name': 'no-region'}]}
+
+        buckets = self.discover()
+
+        self.assertEqual(buckets['no-region']['aws_region'], 'eu-central-1')
+        self.s3.get_paginator.assert_not_called()
+
+    @override_settings(DISCOVERY_S3_SECURITY_SETTINGS=True)
+    def test_collects_security_settings_per_bucket(self):
+        self.s3.get_bucket_encryption.return_value = {'ServerSideEncryptionConfiguration': {'Rules': [
+            {'ApplyServerSideEncryptionByDefault': {'SSEAlgorithm': 'aws:kms'}},
+        ]}}
+        self.s3.get_bucket_versioning.return_value = {'Status': 'Enabled'}
+        self.s3.get_public_access_block.side_effect = ClientError(
+            {'Error': {'Code': 'NoSuchPublicAccessBlockConfiguration'}}, 'GetPublicAccessBlock',
+        )
+
+        metadata = self.discover()['with-region']['metadata']
+
+        self.assertEqual(metadata['encryption'], 'aws:kms')
+        self.assertEqual(metadata['versioning'], 'Enabled')
+        self.assertIsNone(metadata['public_access_block'])
+
+
+class DetailFanOutTest(TestCase):
+    def setUp(self):
+        self.account = AWSAccount.objects.create(
+            account_id='123456789012', account_name='Mgmt',
+            account_type=AWSAccount.AccountType.MANAGEMENT,
+        )
+        self.discoverer = AWSResourceDiscoverer(self.account)
+        self.discoverer.tag_index = None
+        self.client = mock.Mock()
+        self.client.meta.service_model.service_name = 'opensearch'
+
+    def discover(self, method):
+        with mock.patch.object(self.discoverer, '_client', return_value=self.client):
+            return list(getattr(self.discoverer, method)(self.discoverer.session, 'eu-central-1'))
+
+    def test_opensearch_domains_are_described_in_batches_of_five(self):
+        names = [f'domain-{n}' for n in range(12)]
+        self.client.list_domain_names.return_value = {'DomainNames': [{'DomainName': n} for n in names]}
+        self.client.describe_domains.side_effect = lambda DomainNames: {
+            'DomainStatusList': [{'DomainName': n} for n in DomainNames],
+        }
+
+        resources = self.discover('discover_opensearch_domains')
+
+        self.assertCountEqual([r['name'] for r in resources], names)
+        self.assertEqual(self.client.describe_domains.call_count, 3)
+        self.client.describe_domain.assert_not_called()
+        self.assertEqual(self.discoverer.call_timings['opensearch.describe_domains'][0], 3)
+
+    def test_eks_cluster_failures_leave_unit_incomplete(self):
+        self.client.get_paginator.return_value.paginate.return_value = [{'clusters': ['a', 'bad', 'c']}]
+
+        def describe_cluster(name):
+            if name == 'bad':
+                raise RuntimeError('boom')
+            return {'cluster': {'status': 'ACTIVE', 'arn': f'arn:{name}'}}
+
+        self.client.describe_cluster.side_effect = describe_cluster
+
+        resources = []
+        with mock.patch.object(self.discoverer, '_client', return_value=self.client):
+            with self.assertRaises(IncompleteUnitError):
+                for resource in self.discoverer.discover_eks_clusters(self.discoverer.session, 'eu-central-1'):
+                    resources.append(resource)
+
+        self.assertCountEqual([r['name'] for r in resources], ['a', 'c'])
+
+
+class TagIndexTest(TestCase):
+    def test_loads_each_region_once_and_joins_by_arn(self):
+        client = mock.Mock()
+        client.get_paginator.return_value.paginate.return_value = [
+            {'ResourceTagMappingList': [
+                {'ResourceARN': 'arn:aws:s3:::tagged', 'Tags': [{'Key': 'env', 'Value': 'prod'}]},
+            ]},
+        ]
+        factory = mock.Mock(return_value=client)
+        index = TagIndex(factory)
+
+        self.assertEqual(index.lookup('eu-central-1', 'arn:aws:s3:::tagged'), {'env': 'prod'})
+        self.assertEqual(index.lookup('eu-central-1', 'arn:aws:s3:::untagged'), {})
+        factory.assert_called_once_with('eu-central-1')
+
+    def test_unavailable_region_falls_back_to_per_resource_fetch(self):
+        account = AWSAccount.objects.create(
+            account_id='123456789012', account_name='Mgmt',
+            account_type=AWSAccount.AccountType.MANAGEMENT,
+        )
+        discoverer = AWSResourceDiscoverer(account)
+        discoverer.tag_index = TagIndex(mock.Mock(side_effect=RuntimeError('AccessDenied')))
+
+        tags = discoverer._resource_tags('eu-central-1', 'arn:aws:s3:::b', lambda: {'team': 'ops'})
+        self.assertEqual(tags, {'team': 'ops'})
+
+    def test_route53_tags_are_fetched_in_batches(self):
+        account = AWSAccount.objects.create(
+            account_id='123456789012', account_name='Mgmt',
+            account_type=AWSAccount.AccountType.MANAGEMENT,
+        )
+        r53 = mock.Mock()
+        r53.list_tags_for_resources.side_effect = lambda ResourceType, ResourceIds: {
+            'ResourceTagSets': [
+                {'ResourceId': zone_id, 'Tags': [{'Key': 'zone', 'Value': zone_id}]}
+                for zone_id in ResourceIds
+            ],
+        }
+        zone_ids = [f'Z{n}' for n in range(25)]
+        tags = AWSResourceDiscoverer(account)._route53_zone_tags(r53, zone_ids)
+
+        self.assertEqual(r53.list_tags_for_resources.call_count, 3)
+        self.assertEqual(tags['Z24'], {'zone': 'Z24'})
+
+
+class TelemetryTest(TestCase):
+    def test_hooks_count_calls_against_the_current_unit(self):
+        client = mock.Mock()
+        client.meta.events = HierarchicalEmitter()
+        client.can_paginate.side_effect = lambda name: name == 'describe_instances'
+        telemetry.attach(client)
+        model = mock.Mock(has_streaming_output=False)
+        model.name = 'DescribeInstances'
+
+        def call(throttled=False):
+            client.meta.events.emit('before-call.ec2.DescribeInstances', model=model, params={})
+            client.meta.events.emit('before-send.ec2.DescribeInstances', request=None)
+            if throttled:
+                client.meta.events.emit(
+                    'needs-retry.ec2.DescribeInstances',
+                    response=(mock.Mock(status_code=400), {'Error': {'Code': 'Throttling'}}),
+                )
+                client.meta.events.emit('before-send.ec2.DescribeInstances', request=None)
+            client.meta.events.emit(
+                'after-call.ec2.DescribeInstances', model=model, parsed={},
+                http_response=mock.Mock(status_code=200, headers={'content-length': '100'}),
+            )
+
+        call()
+        stats = telemetry.UnitStats()
+        token = telemetry.current_stats.set(stats)
+        try:
+            call()
+            list(bounded_map(lambda _: call(throttled=True), range(2), max_workers=2))
+        finally:
+            telemetry.current_stats.reset(token)
+
+        self.assertEqual(stats.as_dict(), {
+            'api_calls': 3, 'pages': 3, 'throttles': 2, 'retries': 2, 'bytes_received': 300,
+        })
+
+
+@override_settings(DISCOVERY_RATE_LIMIT_DEFAULT=2, DISCOVERY_RATE_LIMITS={'s3': 0}, DISCOVERY_REDIS_URL='')
+class RateGovernorTest(TestCase):
+    def setUp(self):
+        self.governor = RateGovernor()
+        self.key = self.governor._key('123456789012', 'ec2', 'eu-central-1')
+
+    def test_bucket_allows_a_burst_then_paces_requests(self):
+        waits = [self.governor._take(self.key, 2) for _ in range(3)]
+
+        self.assertEqual(waits[:2], [0, 0])
+        self.assertGreater(waits[2], 0.4)
+        with mock.patch('discovery.ratelimit.time.sleep') as sleep:
+            self.governor.acquire('123456789012', 's3', 'global')
+        sleep.assert_not_called()
+
+    def test_throttles_slow_the_bucket_down_to_a_floor(self):
+        for _ in range(5):
+            self.governor.throttled('123456789012', 'ec2', 'eu-central-1')
+
+        self.assertAlmostEqual(self.governor._buckets[self.key].rate, 0.2)
+
+    def test_acquire_stops_waiting_at_the_unit_deadline(self):
+        for _ in range(10):
+            self.governor._take(self.key, 1)
+        token = deadlines.current_deadline.set(time.monotonic() + 0.1)
+        try:
+            with mock.patch('discovery.ratelimit.time.sleep') as sleep, \
+                    self.settings(DISCOVERY_RATE_LIMITS={'ec2': 1}):
+                with self.assertRaises(deadlines.DeadlineExceeded):
+                    self.governor.acquire('123456789012', 'ec2', 'eu-central-1')
+        finally:
+            deadlines.current_deadline.reset(token)
+        sleep.assert_not_called()
+
+    def test_attached_client_acquires_per_request_and_reports_throttles(self):
+        client = mock.Mock()
+        client.meta.service_model.service_name = 'ec2'
+        client.meta.region_name = 'eu-central-1'
+        client.meta.events = HierarchicalEmitter()
+        self.governor.attach(client, '123456789012')
+        self.governor.attach(client, '123456789012')
+
+        with mock.patch.object(self.governor, 'acquire') as acquire, \
+                mock.patch.object(self.governor, 'throttled') as throttled:
+            client.meta.events.emit('before-send.ec2.DescribeInstances', request=None)
+            client.meta.events.emit(
+                'needs-retry.ec2.DescribeInstances',
+                response=(mock.Mock(status_code=503), {'Error': {'Code': 'RequestLimitExceeded'}}),
+            )
+            client.meta.events.emit(
+                'needs-retry.ec2.DescribeInstances',
+                response=(mock.Mock(status_code=500), {'Error': {'Code': 'InternalError'}}),
+            )
+
+        acquire.assert_called_once_with('123456789012', 'ec2', 'eu-central-1')
+        throttled.assert_called_once_with('123456789012', 'ec2', 'eu-central-1')
+
+    @override_settings(DISCOVERY_REDIS_URL='redis://127.0.0.1:1/0')
+    def test_unreachable_redis_falls_back_to_local_buckets(self):
+        self.addCleanup(redis_client.reset)
+        self.assertEqual(self.governor._take(self.key, 2), 0)
+        self.assertIsNone(redis_client.get_redis())
+        self.assertIn(self.key, self.governor._buckets)
+
+
+class DiscoveryEventStreamTest(TestCase):
+    def setUp(self):
+        self.job = DiscoveryJob.objects.create(status=DiscoveryJob.Status.RUNNING)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(username='superadmin'))
+        self.url = f'/api/discovery/jobs/{self.job.id}/events/'
+
+    def stream(self, **headers):
+        response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream', **headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return b''.join(response.streaming_content).decode()
+
+    @override_settings(DISCOVERY_REDIS_URL='')
+    def test_without_redis_sends_snapshot_and_asks_to_reconnect(self):
+        self.job.append_log('one', 'two')
+        first = self.job.log_entries.first()
+
+        body = self.stream(HTTP_LAST_EVENT_ID=str(first.id))
+
+        self.assertTrue(body.startswith('event: job\n'))
+        self.assertNotIn('"one"', body)
+        self.assertIn(f'id: {first.id + 1}\nevent: log\n', body)
+        self.assertTrue(body.endswith(f'retry: {events.FALLBACK_RETRY_MS}\n\n'))
+
+    def test_relays_published_events_until_job_finishes(self):
+        self.job.append_log('one')
+        seen = self.job.log_entries.get().id
+        published = [
+            {'event': 'log', 'data': [{'id': seen, 'message': 'one'}]},
+            None,
+            {'event': 'progress', 'data': {'resources_discovered': 3}},
+            {'event': 'log', 'data': [{'id': seen + 1, 'message': 'two'}]},
+            {'event': 'job', 'data': {'status': 'COMPLETED'}},
+        ]
+        redis = mock.Mock()
+        redis.get.return_value = None
+        redis.pubsub.return_value.get_message.side_effect = [
+            message and {'data': json.dumps(message)} for message in published
+        ]
+
+        with mock.patch.object(redis_client, 'get_redis', return_value=redis):
+            body = self.stream()
+
+        redis.pubsub.return_value.subscribe.assert_called_once_with(events.channel(self.job.pk))
+        self.assertEqual(body.count('"one"'), 1)
+        self.assertIn(': keepalive\n\n', body)
+        self.assertIn('event: progress\ndata: {"resources_discovered": 3}', body)
+        self.assertIn(f'id: {seen + 1}\nevent: log\n', body)
+        self.assertTrue(body.endswith('data: {"status": "COMPLETED"}\n\n'))
+        redis.pubsub.return_value.close.assert_called_once()
+
+    def test_events_already_in_the_snapshot_are_skipped(self):
+        published = [
+            {'event': 'progress', 'data': {'resources_discovered': 3}, 'seq': 7},
+            {'event': 'progress', 'data': {'resources_discovered': 5}, 'seq': 8},
+            {'event': 'job', 'data': {'status': 'COMPLETED'}, 'seq': 9},
+        ]
+        redis = mock.Mock()
+        redis.get.return_value = b'7'
+        redis.pubsub.return_value.get_message.side_effect = [{'data': json.dumps(m)} for m in published]
+
+        with mock.patch.object(redis_client, 'get_redis', return_value=redis):
+            body = self.stream()
+
+        redis.get.assert_called_once_with(events.sequence_key(self.job.pk))
+        self.assertNotIn('"resources_discovered": 3', body)
+        self.assertIn('"resources_discovered": 5', body)
+
+    @override_settings(DISCOVERY_STREAM_MAX_CONNECTIONS=0)
+    def test_streams_past_the_process_limit_fall_back_to_polling(self):
+        redis = mock.Mock()
+
+        with mock.patch.object(redis_client, 'get_redis', return_value=redis):
+            body = self.stream()
+
+        redis.pubsub.assert_not_called()
+        self.assertTrue(body.endswith(f'retry: {events.FALLBACK_RETRY_MS}\n\n'))
+        self.assertEqual(events._open_streams, 0)
+
+    def test_finished_job_stream_closes_after_snapshot(self):
+        self.job.status = DiscoveryJob.Status.COMPLETED
+        self.job.save()
+        redis = mock.Mock()
+
+        with mock.patch.object(redis_client, 'get_redis', return_value=redis):
+            body = self.stream()
+
+        self.assertEqual(body.count('event: '), 1)
+        redis.pubsub.return_value.get_message.assert_not_called()
+
+    def test_log_entries_are_published(self):
+        redis = mock.Mock()
+        redis.pipeline.return_value.execute.return_value = [1, True]
+
+        with mock.patch.object(redis_client, 'get_redis', return_value=redis):
+            self.job.append_log('hello', level='WARNING')
+            events.publish_job(self.job)
+
+        (log_channel, log_payload), (_, job_payload) = [call.args for call in redis.publish.call_args_list]
+        self.assertEqual(log_channel, events.channel(self.job.pk))
+        log_event = json.loads(log_payload)
+        self.assertEqual(log_event['event'], 'log')
+        self.assertEqual(log_event['data'][0]['message'], 'hello')
+        self.assertEqual(log_event['seq'], 1)
+        redis.pipeline.return_value.incr.assert_called_with(events.sequence_key(self.job.pk))
+        self.assertEqual(json.loads(job_payload)['data']['status'], 'RUNNING')
+
+
+class DiscoveryFanOutTest(TestCase):
+    def setUp(self):
+        self.accounts = [
+            AWSAccount.objects.create(
+                account_id=f'11111111111{n}', account_name=f'Acct {n}',
+                account_type=AWSAccount.AccountType.MANAGEMENT,
+            )
+            for n in range(3)
+        ]
+        self.job = DiscoveryJob.objects.create()
+        self.ran = []
+
+    def run_job(self, resources_by_account, services=('ec2',), failing=(), timing_out=(), denied=()):
+        """Run the job's tasks inline.
+
+        ``failing``, ``timing_out`` and ``denied`` hold (account_id, service)
+        units that raise a retryable error, run out of time, or are denied.
+        """
+        def run_unit(discoverer, unit, emit):
+            key = (discoverer.account.account_id, unit.spec.key)
+            self.ran.append(key)
+            telemetry.current_stats.get().add('api_calls')
+            if key in failing:
+                raise RuntimeError('throttled')
+            if key in timing_out:
+                raise deadlines.DeadlineExceeded('Unit deadline exceeded')
+            if key in denied:
+                raise ClientError({'Error': {'Code': 'AccessDeniedException'}}, 'List')
+            resources = resources_by_account.get(key[0], []) if unit.spec.key == 'ec2' else []
+            for resource in resources:
+                emit(resource)
+            return len(resources)
+
+        queued = []
+        account_task = celery_tasks.discover_account_task
+        finalize = celery_tasks.finalize_discovery_task
+        with mock.patch.object(account_task, 'delay', side_effect=lambda *args, **kwargs: queued.append((args, kwargs))), \
+                mock.patch.object(account_task, 'apply_async', side_effect=lambda args, **kw: queued.append((args, {}))), \
+                mock.patch.object(finalize, 'delay', side_effect=lambda job_id: finalize(job_id)), \
+                mock.patch.object(aws_discoverer, 'SERVICES', [s for s in aws_discoverer.SERVICES if s.key in services]), \
+                mock.patch.object(AWSResourceDiscoverer, 'discover_all_regions', return_value=['eu-central-1']), \
+                mock.patch.object(AWSResourceDiscoverer, 'run_unit', run_unit):
+            celery_tasks.run_discovery_task(str(self.job.id))
+            while queued:
+                args, kwargs = queued.pop(0)
+                account_task(*args, **kwargs)
+        self.job.refresh_from_db()
+
+    def test_all_accounts_job_fans_out_one_shard_per_account(self):
+        self.run_job({
+            '111111111110': [make_resource('i-a')],
+            '111111111112': [make_resource('i-b'), make_resource('i-c')],
+        })
+
+        self.assertEqual(self.job.shards.count(), 3)
+        self.assertFalse(self.job.shards.exclude(status=DiscoveryShard.Status.COMPLETED).exists())
+        self.assertEqual(self.job.status, DiscoveryJob.Status.COMPLETED)
+        self.assertEqual(self.job.resources_discovered, 3)
+        self.assertEqual(self.job.resources_new, 3)
+        self.assertIn('Queued discovery for 3 account(s)', self.job.log_text)
+        found = self.job.log_entries.get(account_id='111111111112', message__startswith='Found')
+        self.assertEqual(found.as_text(), '  111111111112: Found 2 resources, New: 2, Updated: 0, Unchanged: 0')
+
+    def test_accounts_expected_to_take_longest_are_queued_first(self):
+        for account, seconds in zip(self.accounts, (30, 100, 50)):
+            DiscoveryUnitHistory.record(account, 'ec2', 'eu-central-1', 1, seconds)
+
+        self.run_job({})
+
+        self.assertEqual([account_id for account_id, _ in self.ran], ['111111111111', '111111111112', '111111111110'])
+        self.assertEqual(self.job.predicted_duration_seconds, 100)
+        self.assertIn('Predicted duration: 1m 40s', self.job.log_text)
+        self.assertTrue(self.job.log_entries.filter(message__startswith='Job took').exists())
+        # The fast inline runs pull every average down.
+        self.assertLess(DiscoveryUnitHistory.durations(self.accounts[1])[('ec2', 'eu-central-1')], 100)
+
+    def test_targeted_job_only_fans_out_to_its_accounts(self):
+        self.job.target_accounts.set(self.accounts[1:])
+
+        self.run_job({'111111111111': [make_resource('i-a')]})
+
+        self.assertEqual(
+            set(self.job.shards.values_list('aws_account', flat=True)),
+            {a.pk for a in self.accounts[1:]},
+        )
+        self.assertEqual(self.job.resources_discovered, 1)
+
+    def test_finalize_decommissions_stale_assets_of_completed_shards(self):
+        AssetIngestor(self.accounts[0]).ingest([make_resource('i-old')])
+
+        self.run_job({'111111111110': [make_resource('i-new')]})
+
+        self.assertEqual(Asset.objects.get(aws_resource_id='i-old').status, 'DECOMMISSIONED')
+        self.assertEqual(Asset.objects.get(aws_resource_id='i-new').status, 'ACTIVE')
+        self.assertEqual(self.job.resources_decommissioned, 1)
+
+    def test_units_are_checkpointed_per_service_and_region(self):
+        self.run_job({'111111111110': [make_resource('i-a')]}, services=('ec2', 'vpc'))
+
+        shard = self.job.shards.get(aws_account=self.accounts[0])
+        units = {(u.service, u.region): u for u in shard.units.all()}
+        self.assertEqual(set(units), {('ec2', 'eu-central-1'), ('vpc', 'eu-central-1')})
+        self.assertEqual(units[('ec2', 'eu-central-1')].resources_discovered, 1)
+        self.assertEqual(units[('ec2', 'eu-central-1')].api_calls, 1)
+        self.assertEqual(shard.resources_discovered, 1)
+
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username='superadmin'))
+        response = client.get(f'/api/discovery/jobs/{self.job.id}/units/', {'service': 'ec2'})
+        self.assertEqual(response.status_code, 200)
+        rows = response.json()['results']
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row['account_id'] for row in rows}, {a.account_id for a in self.accounts})
+        self.assertEqual({row['api_calls'] for row in rows}, {1})
+
+    def test_resumed_shard_skips_completed_units(self):
+        shard = DiscoveryShard.objects.create(
+            job=self.job, aws_account=self.accounts[0],
+            status=DiscoveryShard.Status.RUNNING, started_at=timezone.now(), attempts=1,
+        )
+        DiscoveryUnitRun.objects.create(
+            shard=shard, service='ec2', region='eu-central-1',
+            status=DiscoveryUnitRun.Status.COMPLETED, resources_discovered=4,
+        )
+        self.job.status = DiscoveryJob.Status.RUNNING
+        self.job.save()
+
+        with mock.patch.object(celery_tasks.finalize_discovery_task, 'delay'), \
+                mock.patch.object(aws_discoverer, 'SERVICES', [
+                    s for s in aws_discoverer.SERVICES if s.key in ('ec2', 'vpc')
+                ]), \
+                mock.patch.object(AWSResourceDiscoverer, 'discover_all_regions', return_value=['eu-central-1']), \
+                mock.patch.object(AWSResourceDiscoverer, 'run_unit', return_value=0) as run_unit:
+            celery_tasks.discover_account_task(str(shard.id))
+
+        self.assertEqual([call.args[0].spec.key for call in run_unit.call_args_list], ['vpc'])
+        shard.refresh_from_db()
+        self.assertEqual(shard.status, DiscoveryShard.Status.COMPLETED)
+        self.assertEqual(shard.resources_discovered, 4)
+
+    def test_errors_after_discovery_fail_the_shard_and_finish_the_job(self):
+        with mock.patch.object(AWSResourceDiscoverer, 'timing_summary', side_effect=RuntimeError('boom')):
+            self.run_job({'111111111110': [make_resource('i-a')]})
+
+        shard = self.job.shards.get(aws_account=self.accounts[0])
+        self.assertEqual((shard.status, shard.error_message), (DiscoveryShard.Status.FAILED, 'boom'))
+        self.assertEqual(self.job.status, DiscoveryJob.Status.COMPLETED)
+
+    @override_settings(DISCOVERY_SHARD_STALE_MINUTES=60)
+    def test_shards_whose_task_is_gone_are_failed(self):
+        now = timezone.now()
+        self.job.status = DiscoveryJob.Status.RUNNING
+        self.job.save()
+        stale, active = (
+            DiscoveryShard.objects.create(
+                job=self.job, aws_account=account, status=DiscoveryShard.Status.RUNNING,
+                started_at=now - timedelta(hours=3), attempts=1,
+            )
+            for account in self.accounts[:2]
+        )
+        DiscoveryUnitRun.objects.create(
+            shard=active, service='ec2', region='eu-central-1',
+            status=DiscoveryUnitRun.Status.COMPLETED, completed_at=now - timedelta(minutes=5),
+        )
+
+        with mock.patch.object(celery_tasks.finalize_discovery_task, 'delay') as finalize:
+            self.assertEqual(celery_tasks.fail_stale_shards_task(), 1)
+            finalize.assert_not_called()
+            active.units.update(completed_at=now - timedelta(hours=2))
+            self.assertEqual(celery_tasks.fail_stale_shards_task(), 1)
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, DiscoveryShard.Status.FAILED)
+        self.assertIn('stopped without finishing', self.job.log_text)
+        finalize.assert_called_once_with(str(self.job.id))
+
+    def test_log_endpoint_pages_and_tails_entries(self):
+        self.job.append_log('one', 'two', 'three')
+        self.job.append_log('boom', level='ERROR', account_id='111111111110', region='eu-central-1', service='ec2')
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username='superadmin'))
+        url = f'/api/discovery/jobs/{self.job.id}/logs/'
+
+        first = client.get(url, {'limit': 2}).json()
+        rest = client.get(url, {'after': first['last_id']}).json()
+        tail = client.get(url, {'tail': 1}).json()
+        errors = client.get(url, {'level': 'ERROR'}).json()
+
+        self.assertEqual([e['message'] for e in first['results']], ['one', 'two'])
+        self.assertTrue(first['has_more'])
+        self.assertEqual([e['message'] for e in rest['results']], ['three', 'boom'])
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(tail['results'][0]['service'], 'ec2')
+        self.assertEqual(len(errors['results']), 1)
+        self.assertIn('  111111111110: ec2/eu-central-1: ERROR: boom', self.job.log_text)
+
+        jobs = client.get('/api/discovery/jobs/').json()['results']
+        self.assertNotIn('log_output', jobs[0])
+        self.assertNotIn('error_message', jobs[0])
+
+    @override_settings(DISCOVERY_LOG_RETENTION_DAYS=30)
+    def test_logs_of_old_jobs_are_pruned(self):
+        old = DiscoveryJob.objects.create(
+            status=DiscoveryJob.Status.COMPLETED, completed_at=timezone.now() - timedelta(days=31),
+            log_output='legacy log\n', resources_discovered=7,
+        )
+        old.append_log('old')
+        self.job.append_log('recent')
+
+        with mock.patch.object(celery_tasks, 'PRUNE_BATCH_SIZE', 1):
+            self.assertEqual(celery_tasks.prune_discovery_logs_task(), 1)
+
+        old.refresh_from_db()
+        self.assertEqual((old.log_output, old.resources_discovered), ('', 7))
+        self.assertFalse(old.log_entries.exists())
+        self.assertEqual(self.job.log_entries.get().message, 'recent')
+
+    @override_settings(DISCOVERY_SHARD_MAX_ATTEMPTS=2)
+    def test_only_completed_units_are_decommissioned(self):
+        AssetIngestor(self.accounts[0]).ingest([
+            make_resource('i-old'),
+            make_resource('vpc-old', aws_service_type='VPC', aws_resource_arn=''),
+        ])
+
+        self.run_job(
+            {'111111111110': [make_resource('i-new')]},
+            services=('ec2', 'vpc'),
+            failing={('111111111110', 'ec2')},
+        )
+
+        self.assertEqual(self.ran.count(('111111111110', 'ec2')), 2)
+        self.assertEqual(self.ran.count(('111111111110', 'vpc')), 1)
+        shard = self.job.shards.get(aws_account=self.accounts[0])
+        self.assertEqual(shard.status, DiscoveryShard.Status.FAILED)
+        self.assertEqual(Asset.objects.get(aws_resource_id='i-old').status, 'ACTIVE')
+        self.assertEqual(Asset.objects.get(aws_resource_id='vpc-old').status, 'DECOMMISSIONED')
+        self.assertEqual(self.job.resources_decommissioned, 1)
+        self.assertEqual(self.job.status, DiscoveryJob.Status.COMPLETED)
+
+    def test_permanent_unit_errors_are_not_retried(self):
+        denied = ClientError({'Error': {'Code': 'AccessDeniedException'}}, 'ListClusters')
+        self.assertFalse(aws_discoverer.is_retryable_error(denied))
+        self.assertTrue(aws_discoverer.is_retryable_error(
+            ClientError({'Error': {'Code': 'ThrottlingException'}}, 'ListClusters'),
+        ))
+
+        with mock.patch.object(aws_discoverer, 'is_retryable_error', return_value=False):
+            self.run_job({}, failing={('111111111110', 'ec2')})
+
+        self.assertEqual(self.ran.count(('111111111110', 'ec2')), 1)
+
+    @override_settings(DISCOVERY_SHARD_MAX_ATTEMPTS=3)
+    def test_retries_do_not_rerun_units_that_failed_for_good(self):
+        self.run_job(
+            {}, services=('ec2', 'vpc'),
+            failing={('111111111110', 'ec2')}, denied={('111111111110', 'vpc')},
+        )
+
+        self.assertEqual(self.ran.count(('111111111110', 'ec2')), 3)
+        self.assertEqual(self.ran.count(('111111111110', 'vpc')), 1)
+        self.assertTrue(DiscoveryUnitRun.objects.get(service='vpc', shard__aws_account=self.accounts[0]).permanent_error)
+        self.assertEqual(self.job.shards.get(aws_account=self.accounts[0]).status, DiscoveryShard.Status.FAILED)
+
+    @override_settings(DISCOVERY_SHARD_MAX_ATTEMPTS=1)
+    def test_continuing_after_the_time_limit_is_not_a_failed_attempt(self):
+        summaries = iter([SoftTimeLimitExceeded()])
+
+        def timing_summary(discoverer):
+            error = next(summaries, None)
+            if error:
+                raise error
+            return []
+
+        with mock.patch.object(AWSResourceDiscoverer, 'timing_summary', timing_summary):
+            self.run_job({'111111111110': [make_resource('i-a')]})
+
+        shard = self.job.shards.get(aws_account=self.accounts[0])
+        self.assertEqual((shard.status, shard.attempts), (DiscoveryShard.Status.COMPLETED, 1))
+        self.assertEqual(self.ran.count(('111111111110', 'ec2')), 1)
+        self.assertIn('Time limit reached, continuing in a new task', self.job.log_text)
+
+    def test_units_skipped_as_empty_still_count_as_producers(self):
+        for _ in range(3):
+            DiscoveryUnitHistory.record(self.accounts[0], 'rds_clusters', 'eu-central-1', 0)
+        AssetIngestor(self.accounts[0]).ingest([
+            make_resource('db-old', aws_service_type='RDS', aws_resource_arn=''),
+        ])
+
+        self.run_job({}, services=('rds_clusters', 'rds_instances'))
+
+        self.assertNotIn(('111111111110', 'rds_clusters'), self.ran)
+        run = DiscoveryUnitRun.objects.get(shard__aws_account=self.accounts[0], service='rds_clusters')
+        self.assertEqual(run.status, DiscoveryUnitRun.Status.COMPLETED)
+        self.assertEqual(Asset.objects.get(aws_resource_id='db-old').status, 'DECOMMISSIONED')
+
+    def test_assets_written_for_a_unit_skipped_as_empty_are_not_decommissioned(self):
+        for _ in range(3):
+            DiscoveryUnitHistory.record(self.accounts[0], 'rds_clusters', 'eu-central-1', 0)
+
+        def consumer_writes_a_cluster(discoverer):
+            # A change event adds a cluster while the account is scanned.
+            AssetIngestor(self.accounts[0]).ingest([
+                make_resource('db-new', aws_service_type='RDS', aws_resource_arn=''),
+            ])
+            DiscoveryUnitHistory.clear_empty(self.accounts[0], [('rds_clusters', 'eu-central-1')])
+            return []
+
+        with mock.patch.object(AWSResourceDiscoverer, 'timing_summary', consumer_writes_a_cluster):
+            self.run_job({}, services=('rds_clusters', 'rds_instances'))
+
+        self.assertNotIn(('111111111110', 'rds_clusters'), self.ran)
+        self.assertFalse(DiscoveryUnitRun.objects.filter(
+            shard__aws_account=self.accounts[0], service='rds_clusters',
+        ).exists())
+        self.assertEqual(Asset.objects.get(aws_resource_id='db-new').status, 'ACTIVE')
+
+    @override_settings(DISCOVERY_SHARD_MAX_ATTEMPTS=2)
+    def test_units_out_of_time_leave_the_job_partial(self):
+        AssetIngestor(self.accounts[0]).ingest([
+            make_resource('i-old'),
+            make_resource('vpc-old', aws_service_type='VPC', aws_resource_arn=''),
+        ])
+
+        self.run_job({}, services=('ec2', 'vpc'), timing_out={('111111111110', 'ec2')})
+
+        self.assertEqual(self.ran.count(('111111111110', 'ec2')), 1)
+        run = DiscoveryUnitRun.objects.get(shard__aws_account=self.accounts[0], service='ec2')
+        self.assertEqual(run.status, DiscoveryUnitRun.Status.TIMED_OUT)
+        self.assertEqual(self.job.shards.get(aws_account=self.accounts[0]).status, DiscoveryShard.Status.COMPLETED)
+        self.assertEqual(Asset.objects.get(aws_resource_id='i-old').status, 'ACTIVE')
+        self.assertEqual(Asset.objects.get(aws_resource_id='vpc-old').status, 'DECOMMISSIONED')
+        self.assertEqual(self.job.status, DiscoveryJob.Status.PARTIAL)
+
+
+class TargetedDiscoveryTest(TestCase):
+    def setUp(self):
+        self.account = AWSAccount.objects.create(
+            account_id='123456789012', account_name='Test',
+            account_type=AWSAccount.AccountType.MANAGEMENT,
+        )
+
+    def plan(self, **targets):
+        discoverer = AWSResourceDiscoverer(self.account, **targets)
+        with mock.patch.object(discoverer, 'discover_all_regions', return_value=['eu-central-1', 'us-east-1']):
+            return {(u.spec.key, u.region) for u in discoverer.plan_units()}
+
+    def test_region_target_skips_other_regions_and_global_services(self):
+        units = self.plan(regions=['eu-central-1'])
+
+        self.assertIn(('ec2', 'eu-central-1'), units)
+        self.assertFalse({region for _, region in units} - {'eu-central-1'})
+
+    def test_service_target_plans_only_producing_units(self):
+        units = self.plan(regions=['eu-central-1'], service_types=['RDS', 'S3'])
+
+        self.assertEqual(units, {
+            ('rds_clusters', 'eu-central-1'), ('rds_instances', 'eu-central-1'), ('s3', 'global'),
+        })
+
+    def test_units_that_keep_coming_back_empty_are_skipped_until_probed(self):
+        for _ in range(3):
+            DiscoveryUnitHistory.record(self.account, 'msk', 'us-east-1', 0)
+        DiscoveryUnitHistory.record(self.account, 'ecr', 'us-east-1', 0)
+        DiscoveryUnitHistory.record(self.account, 'lambda', 'us-east-1', 0)
+        DiscoveryUnitHistory.record(self.account, 'lambda', 'us-east-1', 5)
+        empty = DiscoveryUnitHistory.empty_units(self.account)
+        self.assertEqual(empty, {('msk', 'us-east-1')})
+
+        units = self.plan(empty_units=empty)
+        self.assertNotIn(('msk', 'us-east-1'), units)
+        self.assertIn(('msk', 'eu-central-1'), units)
+        self.assertIn(('msk', 'us-east-1'), self.plan(empty_units=empty, service_types=['MSK']))
+
+        DiscoveryUnitHistory.objects.update(last_run_at=timezone.now() - timedelta(days=8))
+        self.assertEqual(DiscoveryUnitHistory.empty_units(self.account), set())
+
+    def test_units_are_planned_longest_first_from_their_average_duration(self):
+        DiscoveryUnitHistory.record(self.account, 'lambda', 'eu-central-1', 5, 10)
+        DiscoveryUnitHistory.record(self.account, 'lambda', 'eu-central-1', 5, 20)
+        DiscoveryUnitHistory.record(self.account, 'ec2', 'us-east-1', 5, 60)
+        DiscoveryUnitHistory.record(self.account, 'vpc', 'us-east-1', 5)
+        durations = DiscoveryUnitHistory.durations(self.account)
+        self.assertEqual(durations, {('lambda', 'eu-central-1'): 13.0, ('ec2', 'us-east-1'): 60.0})
+
+        discoverer = AWSResourceDiscoverer(self.account, service_types=['EC2', 'LAMBDA'], unit_durations=durations)
+        with mock.patch.object(discoverer, 'discover_all_regions', return_value=['eu-central-1', 'us-east-1']):
+            units = [(u.spec.key, u.region) for u in discoverer.plan_units()]
+
+        self.assertEqual(units, [
+            ('ec2', 'eu-central-1'), ('lambda', 'us-east-1'), ('ec2', 'us-east-1'), ('lambda', 'eu-central-1'),
+        ])
+
+    def test_units_not_offered_in_a_region_are_skipped(self):
+        discoverer = AWSResourceDiscoverer(self.account)
+        def regions_offering(service, partition):
+            return {'eu-central-1'} if service == 'kafka' else {'eu-central-1', 'us-east-1'}
+
+        with mock.patch.object(discoverer, '_regions_offering', side_effect=regions_offering), \
+                mock.patch.object(discoverer, 'discover_all_regions', return_value=['eu-central-1', 'us-east-1']):
+            units = {(u.spec.key, u.region) for u in discoverer.plan_units()}
+
+        self.assertIn(('msk', 'eu-central-1'), units)
+        self.assertNotIn(('msk', 'us-east-1'), units)
+        self.assertEqual([(u.spec.key, u.region, reason) for u, reason in discoverer.skipped_units],
+                         [('msk', 'us-east-1', 'unavailable')])
+
+    def test_trigger_endpoint_creates_targeted_job(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username='superadmin'))
+        with mock.patch.object(celery_tasks.run_discovery_task, 'delay') as delay:
+            response = client.post('/api/discovery/trigger/', {
+                'account_ids': [str(self.account.pk)],
+                'regions': ['eu-central-1'],
+                'service_types': ['LAMBDA'],
+            }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        job = DiscoveryJob.objects.get(pk=response.json()['id'])
+        self.assertEqual(list(job.target_accounts.all()), [self.account])
+        self.assertEqual((job.target_regions, job.target_service_types), (['eu-central-1'], ['LAMBDA']))
+        delay.assert_called_once_with(str(job.id))
+
+    def test_trigger_endpoint_rejects_undiscoverable_service_types(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username='superadmin'))
+        response = client.post('/api/discovery/trigger/', {'service_types': ['IAM']}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DiscoveryJob.objects.exists())
+
+
+class DecommissionScopeTest(TestCase):
+    def setUp(self):
+        self.account = AWSAccount.objects.create(account_id='123456789012', account_name='Test')
+        self.job = DiscoveryJob.objects.create()
+        self.shard = DiscoveryShard.objects.create(job=self.job, aws_account=self.account)
+        AssetIngestor(self.account).ingest([
+            make_resource('db-1', aws_service_type='RDS', aws_resource_arn=''),
+            make_resource('db-2', aws_service_type='RDS', aws_resource_arn='', aws_region='us-east-1'),
+        ])
+        self.started = timezone.now()
+
+    def complete(self, service, region='eu-central-1'):
+        DiscoveryUnitRun.objects.create(
+            shard=self.shard, service=service, region=region,
+            status=DiscoveryUnitRun.Status.COMPLETED, started_at=self.started,
+        )
+
+    def test_shared_asset_type_needs_every_producing_unit(self):
+        self.complete('rds_clusters')
+        decommission_stale_assets(DiscoveryUnitRun.objects.all())
+        self.assertFalse(Asset.objects.filter(status='DECOMMISSIONED').exists())
+
+        self.complete('rds_instances')
+        counts = decommission_stale_assets(DiscoveryUnitRun.objects.all())
+        self.assertEqual(counts[self.account.pk], 1)
+        self.assertEqual(Asset.objects.get(aws_resource_id='db-1').status, 'DECOMMISSIONED')
+        self.assertEqual(Asset.objects.get(aws_resource_id='db-2').status, 'ACTIVE')
@@ -23,6 +23,11 @@ class DiscoveryJobListView(LoginRequiredMixin, ListView):
     context_object_name = 'jobs'
     paginate_by = 25
 
+    def get_queryset(self):
+        return DiscoveryJob.objects.select_related('aws_account', 'triggered_by').defer(
+            *DiscoveryJob.LIST_DEFERRED_FIELDS,
+        )
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         from accounts.models import AWSAccount
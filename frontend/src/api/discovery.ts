@@ -1,6 +1,9 @@
+import { useEffect, useState } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import client from './client';
-import type { DiscoveryJob, PaginatedResponse } from '../types';
+import type {
+  DiscoveryJob, DiscoveryLogEntry, DiscoveryLogPage, DiscoveryTarget, DiscoveryUnitRun, PaginatedResponse,
+} from '../types';
 
 export function useDiscoveryJobs(params?: Record<string, string>) {
   return useQuery<PaginatedResponse<DiscoveryJob>>({
@@ -26,20 +29,130 @@ export function useDiscoveryJob(id: string) {
       return data;
     },
     enabled: !!id,
-    refetchInterval: (query) => {
-      const status = query.state.data?.status;
-      return status === 'PENDING' || status === 'RUNNING' ? 2000 : false;
+  });
+}
+
+export function useDiscoveryJobUnits(id: string) {
+  return useQuery<PaginatedResponse<DiscoveryUnitRun>>({
+    queryKey: ['discoveryJobUnits', id],
+    queryFn: async () => {
+      const { data } = await client.get(`/discovery/jobs/${id}/units/`);
+      return data;
     },
+    enabled: !!id,
   });
 }
 
+const PROGRESS_FIELDS = [
+  'resources_discovered', 'resources_new', 'resources_updated', 'resources_unchanged',
+] as const;
+
+type DiscoveryProgress = Partial<Record<(typeof PROGRESS_FIELDS)[number], number>>;
+
+function unitsSlowestFirst(units: DiscoveryUnitRun[]) {
+  return [...units].sort((a, b) => (b.duration_seconds ?? -1) - (a.duration_seconds ?? -1));
+}
+
+// Loads a job's log entries and, while the job is active, follows its event
+// stream, which keeps the job, its units and the log up to date.
+export function useDiscoveryJobLogs(id: string, active: boolean) {
+  const qc = useQueryClient();
+  const [log, setLog] = useState<{ id: string; lastId: number; entries: DiscoveryLogEntry[] }>(
+    { id, lastId: 0, entries: [] },
+  );
+  const lastId = log.id === id ? log.lastId : 0;
+
+  useEffect(() => {
+    if (!id) return;
+    let cancelled = false;
+    let source: EventSource | undefined;
+    let after = lastId;
+
+    function appendEntries(entries: DiscoveryLogEntry[]) {
+      entries = entries.filter((e) => e.id > after);
+      if (!entries.length) return;
+      after = entries[entries.length - 1].id;
+      setLog((prev) => ({ id, lastId: after, entries: [...(prev.id === id ? prev.entries : []), ...entries] }));
+    }
+
+    function follow() {
+      source = new EventSource(`/api/discovery/jobs/${id}/events/?after=${after}`, { withCredentials: true });
+      source.addEventListener('job', (e) => {
+        const job = JSON.parse((e as MessageEvent).data) as DiscoveryJob;
+        qc.setQueryData<DiscoveryJob>(['discoveryJob', id], (prev) => ({ ...prev, ...job }));
+        qc.invalidateQueries({ queryKey: ['discoveryJobUnits', id] });
+        if (job.status !== 'PENDING' && job.status !== 'RUNNING') {
+          source?.close();
+          // Job events carry the list representation; reload the detail for error_message.
+          qc.invalidateQueries({ queryKey: ['discoveryJob', id] });
+        }
+      });
+      source.addEventListener('progress', (e) => {
+        const progress = JSON.parse((e as MessageEvent).data) as DiscoveryProgress;
+        qc.setQueryData<DiscoveryJob>(['discoveryJob', id], (prev) => {
+          if (!prev) return prev;
+          const next = { ...prev };
+          for (const field of PROGRESS_FIELDS) next[field] += progress[field] ?? 0;
+          return next;
+        });
+      });
+      source.addEventListener('unit', (e) => {
+        const unit = JSON.parse((e as MessageEvent).data) as DiscoveryUnitRun;
+        qc.setQueryData<PaginatedResponse<DiscoveryUnitRun>>(['discoveryJobUnits', id], (prev) => {
+          if (!prev) return prev;
+          const known = prev.results.some((u) => u.id === unit.id);
+          const results = known
+            ? prev.results.map((u) => (u.id === unit.id ? unit : u))
+            : [...prev.results, unit];
+          return { ...prev, count: prev.count + (known ? 0 : 1), results: unitsSlowestFirst(results) };
+        });
+      });
+      source.addEventListener('log', (e) => {
+        appendEntries(JSON.parse((e as MessageEvent).data) as DiscoveryLogEntry[]);
+      });
+    }
+
+    async function poll() {
+      let more = true;
+      while (more && !cancelled) {
+        const { data } = await client.get<DiscoveryLogPage>(`/discovery/jobs/${id}/logs/`, {
+          params: { after },
+        });
+        if (cancelled) return;
+        const start = after;
+        after = data.last_id;
+        if (data.results.length) {
+          setLog((prev) => ({
+            id,
+            lastId: data.last_id,
+            entries: prev.id === id && start > 0 ? [...prev.entries, ...data.results] : data.results,
+          }));
+        }
+        more = data.has_more;
+      }
+      if (active && !cancelled) follow();
+    }
+
+    poll();
+    return () => {
+      cancelled = true;
+      source?.close();
+    };
+    // lastId is only read when (re)starting the stream.
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [id, active]);
+
+  return log.id === id ? log.entries : [];
+}
+
 export function useTriggerDiscovery() {
   const qc = useQueryClient();
   return useMutation({
-    mutationFn: async (accountId?: string) => {
-      const { data } = await client.post('/discovery/trigger/', {
-        account_id: accountId || null,
-      });
+    mutationFn: async (target?: string | DiscoveryTarget) => {
+      const body = typeof target === 'object'
+        ? target
+        : { account_id: target || null };
+      const { data } = await client.post('/discovery/trigger/', body);
       return data as DiscoveryJob;
     },
     onSuccess: () => {
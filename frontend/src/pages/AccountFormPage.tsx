@@ -68,6 +68,9 @@ export default function AccountFormPage() {
     aws_secret_access_key: '',
     management_account: '' as string | null,
     discovery_regions: [] as string[],
+    discovery_backend: 'DIRECT',
+    config_aggregator_name: '',
+    config_aggregator_region: '',
   });
   const [errors, setErrors] = useState<Record<string, string[]>>({});
 
@@ -84,6 +87,9 @@ export default function AccountFormPage() {
         aws_secret_access_key: '',
         management_account: existing.management_account || '',
         discovery_regions: existing.discovery_regions || [],
+        discovery_backend: existing.discovery_backend,
+        config_aggregator_name: existing.config_aggregator_name || '',
+        config_aggregator_region: existing.config_aggregator_region || '',
       });
     }
   }, [existing, isEdit]);
@@ -107,6 +113,10 @@ export default function AccountFormPage() {
     if (!payload.management_account) {
       payload.management_account = null;
     }
+    // Only management accounts can read from a Config aggregator
+    if (payload.account_type !== 'MANAGEMENT') {
+      payload.discovery_backend = 'DIRECT';
+    }
     // Only send secret key if user entered a new value
     if (!payload.aws_secret_access_key) {
       delete payload.aws_secret_access_key;
@@ -275,6 +285,49 @@ export default function AccountFormPage() {
                   </div>
                 )}
 
+                {isManagement && (
+                  <div className="form-section">
+                    <div className="form-section-title">Discovery Backend</div>
+                    <div className="mb-3">
+                      <select
+                        className={`form-select${errors.discovery_backend ? ' is-invalid' : ''}`}
+                        value={form.discovery_backend}
+                        onChange={(e) => set('discovery_backend', e.target.value)}
+                      >
+                        <option value="DIRECT">Direct API calls</option>
+                        <option value="CONFIG_AGGREGATOR">AWS Config aggregator</option>
+                      </select>
+                      {errors.discovery_backend && <div className="invalid-feedback">{errors.discovery_backend.join(', ')}</div>}
+                      <div className="form-text">Applies to this account and its member accounts</div>
+                    </div>
+
+                    {form.discovery_backend === 'CONFIG_AGGREGATOR' && (
+                      <div className="row g-3 mb-3">
+                        <div className="col-md-6">
+                          <label className="form-label">Aggregator Name</label>
+                          <input
+                            type="text"
+                            className={`form-control${errors.config_aggregator_name ? ' is-invalid' : ''}`}
+                            value={form.config_aggregator_name}
+                            onChange={(e) => set('config_aggregator_name', e.target.value)}
+                          />
+                          {errors.config_aggregator_name && <div className="invalid-feedback">{errors.config_aggregator_name.join(', ')}</div>}
+                        </div>
+                        <div className="col-md-6">
+                          <label className="form-label">Aggregator Region</label>
+                          <input
+                            type="text"
+                            className="form-control"
+                            value={form.config_aggregator_region}
+                            onChange={(e) => set('config_aggregator_region', e.target.value)}
+                            placeholder="Default region"
+                          />
+                        </div>
+                      </div>
+                    )}
+                  </div>
+                )}
+
                 {!isManagement && (
                   <div className="form-section">
                     <div className="form-section-title">Organization</div>
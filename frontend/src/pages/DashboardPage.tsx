@@ -19,6 +19,7 @@ const STATUS_BADGE: Record<string, string> = {
   PENDING: 'badge-status-pending',
   RUNNING: 'badge-status-running',
   COMPLETED: 'badge-status-completed',
+  PARTIAL: 'badge-status-partial',
   FAILED: 'badge-status-failed',
 };
 
@@ -1,12 +1,15 @@
 import { useParams } from 'react-router-dom';
 import { useRef, useEffect } from 'react';
 import TopNavbar from '../components/TopNavbar';
-import { useDiscoveryJob } from '../api/discovery';
+import { useDiscoveryJob, useDiscoveryJobLogs, useDiscoveryJobUnits } from '../api/discovery';
+import type { DiscoveryLogEntry } from '../types';
 
 const STATUS_BADGE: Record<string, string> = {
   PENDING: 'badge-status-pending',
   RUNNING: 'badge-status-running',
   COMPLETED: 'badge-status-completed',
+  PARTIAL: 'badge-status-partial',
+  TIMED_OUT: 'badge-status-partial',
   FAILED: 'badge-status-failed',
 };
 
@@ -15,6 +18,22 @@ function formatDate(iso: string | null) {
   return new Date(iso).toLocaleString();
 }
 
+// Same layout as DiscoveryLogEntry.as_text() on the backend.
+function formatLogEntry(entry: DiscoveryLogEntry) {
+  let prefix = entry.account_id ? `  ${entry.account_id}: ` : '';
+  const scope = [entry.service, entry.region].filter(Boolean).join('/');
+  if (scope) prefix += `${scope}: `;
+  if (entry.level === 'ERROR') prefix += 'ERROR: ';
+  if (entry.level === 'WARNING') prefix += 'Warning: ';
+  return prefix + entry.message;
+}
+
+function formatBytes(bytes: number) {
+  if (bytes < 1024) return `${bytes} B`;
+  if (bytes < 1024 * 1024) return `${(bytes / 1024).toFixed(1)} KB`;
+  return `${(bytes / 1024 / 1024).toFixed(1)} MB`;
+}
+
 function formatDuration(seconds: number | null) {
   if (seconds == null) return '—';
   if (seconds < 60) return `${Math.round(seconds)}s`;
@@ -27,12 +46,15 @@ export default function DiscoveryJobDetailPage() {
   const logRef = useRef<HTMLPreElement>(null);
 
   const isActive = job?.status === 'PENDING' || job?.status === 'RUNNING';
+  const { data: units } = useDiscoveryJobUnits(id!);
+  const logEntries = useDiscoveryJobLogs(id!, isActive);
+  const logText = (job?.log_output ?? '') + logEntries.map((e) => `${formatLogEntry(e)}\n`).join('');
 
   useEffect(() => {
     if (logRef.current) {
       logRef.current.scrollTop = logRef.current.scrollHeight;
     }
-  }, [job?.log_output]);
+  }, [logText]);
 
   if (isLoading) {
     return (
@@ -72,7 +94,19 @@ export default function DiscoveryJobDetailPage() {
               <table className="table table-sm mb-0">
                 <tbody>
                   <tr><th style={{ width: '40%' }}>Job ID</th><td><code>{job.id}</code></td></tr>
-                  <tr><th>Account</th><td>{job.aws_account_name || 'All Accounts'}</td></tr>
+                  <tr>
+                    <th>Account</th>
+                    <td>
+                      {job.aws_account_name
+                        || (job.target_accounts.length ? `${job.target_accounts.length} accounts` : 'All Accounts')}
+                    </td>
+                  </tr>
+                  {job.target_regions.length > 0 && (
+                    <tr><th>Regions</th><td>{job.target_regions.join(', ')}</td></tr>
+                  )}
+                  {job.target_service_types.length > 0 && (
+                    <tr><th>Services</th><td>{job.target_service_types.join(', ')}</td></tr>
+                  )}
                   <tr>
                     <th>Status</th>
                     <td>
@@ -87,6 +121,9 @@ export default function DiscoveryJobDetailPage() {
                   <tr><th>Started</th><td>{formatDate(job.started_at)}</td></tr>
                   <tr><th>Completed</th><td>{formatDate(job.completed_at)}</td></tr>
                   <tr><th>Duration</th><td>{formatDuration(job.duration_seconds)}</td></tr>
+                  {job.predicted_duration_seconds !== null && (
+                    <tr><th>Predicted</th><td>{formatDuration(job.predicted_duration_seconds)}</td></tr>
+                  )}
                   <tr><th>Triggered By</th><td>{job.triggered_by_username || '—'}</td></tr>
                 </tbody>
               </table>
@@ -100,25 +137,31 @@ export default function DiscoveryJobDetailPage() {
             <div className="card-header"><strong>Results</strong></div>
             <div className="card-body">
               <div className="row text-center">
-                <div className="col-3">
+                <div className="col">
                   <div className="fs-3 fw-bold text-primary">
                     {job.resources_discovered}
                   </div>
                   <div className="text-muted small">Discovered</div>
                 </div>
-                <div className="col-3">
+                <div className="col">
                   <div className="fs-3 fw-bold text-success">
                     {job.resources_new}
                   </div>
                   <div className="text-muted small">New</div>
                 </div>
-                <div className="col-3">
+                <div className="col">
                   <div className="fs-3 fw-bold text-warning">
                     {job.resources_updated}
                   </div>
                   <div className="text-muted small">Updated</div>
                 </div>
-                <div className="col-3">
+                <div className="col">
+                  <div className="fs-3 fw-bold text-secondary">
+                    {job.resources_unchanged}
+                  </div>
+                  <div className="text-muted small">Unchanged</div>
+                </div>
+                <div className="col">
                   <div className="fs-3 fw-bold text-danger">
                     {job.resources_decommissioned}
                   </div>
@@ -143,6 +186,58 @@ export default function DiscoveryJobDetailPage() {
           </div>
         )}
 
+        {/* Units */}
+        {units && units.results.length > 0 && (
+          <div className="col-12">
+            <div className="card">
+              <div className="card-header">
+                <strong>Units</strong>
+                <span className="text-muted small ms-2">slowest first</span>
+              </div>
+              <div className="card-body p-0">
+                <div className="table-responsive">
+                  <table className="table table-sm table-hover mb-0">
+                    <thead>
+                      <tr>
+                        <th>Account</th>
+                        <th>Service</th>
+                        <th>Region</th>
+                        <th>Status</th>
+                        <th className="text-end">Duration</th>
+                        <th className="text-end">Resources</th>
+                        <th className="text-end">API Calls</th>
+                        <th className="text-end">Pages</th>
+                        <th className="text-end">Retries</th>
+                        <th className="text-end">Throttles</th>
+                        <th className="text-end">Received</th>
+                      </tr>
+                    </thead>
+                    <tbody>
+                      {units.results.map((u) => (
+                        <tr key={u.id} title={u.error_message || undefined}>
+                          <td>{u.account_name}</td>
+                          <td>{u.service}</td>
+                          <td>{u.region}</td>
+                          <td>
+                            <span className={`badge ${STATUS_BADGE[u.status] || 'bg-secondary'}`}>{u.status}</span>
+                          </td>
+                          <td className="text-end">{formatDuration(u.duration_seconds)}</td>
+                          <td className="text-end">{u.resources_discovered}</td>
+                          <td className="text-end">{u.api_calls}</td>
+                          <td className="text-end">{u.pages}</td>
+                          <td className="text-end">{u.retries}</td>
+                          <td className={`text-end ${u.throttles ? 'text-danger' : ''}`}>{u.throttles}</td>
+                          <td className="text-end">{formatBytes(u.bytes_received)}</td>
+                        </tr>
+                      ))}
+                    </tbody>
+                  </table>
+                </div>
+              </div>
+            </div>
+          </div>
+        )}
+
         {/* Log Output */}
         <div className="col-12">
           <div className="card">
@@ -155,12 +250,12 @@ export default function DiscoveryJobDetailPage() {
               )}
             </div>
             <div className="card-body p-0">
-              {job.log_output ? (
+              {logText ? (
                 <pre
                   ref={logRef}
                   className="log-terminal mb-0"
                 >
-                  {job.log_output}
+                  {logText}
                 </pre>
               ) : (
                 <p className="text-muted p-3 mb-0">No log output.</p>
@@ -30,6 +30,9 @@ export interface AWSAccount {
   management_account: string | null;
   management_account_name: string;
   discovery_regions: string[];
+  discovery_backend: 'DIRECT' | 'CONFIG_AGGREGATOR';
+  config_aggregator_name: string;
+  config_aggregator_region: string;
   is_active: boolean;
   last_discovery_at: string | null;
   estimated_monthly_cost: string | null;
@@ -133,17 +136,66 @@ export interface DiscoveryJob {
   id: string;
   aws_account: string | null;
   aws_account_name: string;
-  status: 'PENDING' | 'RUNNING' | 'COMPLETED' | 'FAILED';
+  target_accounts: string[];
+  target_regions: string[];
+  target_service_types: string[];
+  status: 'PENDING' | 'RUNNING' | 'COMPLETED' | 'PARTIAL' | 'FAILED';
   started_at: string | null;
   completed_at: string | null;
   resources_discovered: number;
   resources_updated: number;
   resources_new: number;
+  resources_unchanged: number;
   resources_decommissioned: number;
-  error_message: string;
   triggered_by_username: string;
-  log_output: string;
+  // Only in the job detail, not in job lists.
+  error_message?: string;
+  // Only in the job detail; holds the log of jobs run before structured log entries.
+  log_output?: string;
+  duration_seconds: number | null;
+  // Expected duration from earlier runs; null when an account has no history.
+  predicted_duration_seconds: number | null;
+}
+
+export interface DiscoveryLogEntry {
+  id: number;
+  created_at: string;
+  level: 'INFO' | 'WARNING' | 'ERROR';
+  account_id: string;
+  region: string;
+  service: string;
+  message: string;
+}
+
+export interface DiscoveryLogPage {
+  results: DiscoveryLogEntry[];
+  last_id: number;
+  has_more: boolean;
+}
+
+export interface DiscoveryUnitRun {
+  id: number;
+  account_id: string;
+  account_name: string;
+  service: string;
+  region: string;
+  status: 'COMPLETED' | 'FAILED' | 'TIMED_OUT';
+  started_at: string | null;
+  completed_at: string | null;
   duration_seconds: number | null;
+  resources_discovered: number;
+  api_calls: number;
+  pages: number;
+  retries: number;
+  throttles: number;
+  bytes_received: number;
+  error_message: string;
+}
+
+export interface DiscoveryTarget {
+  account_ids?: string[];
+  regions?: string[];
+  service_types?: string[];
 }
 
 // Dashboard
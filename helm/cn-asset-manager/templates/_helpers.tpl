@@ -86,3 +86,14 @@ redis://{{ include "cn-asset-manager.redisHost" . }}:6379/0
 {{ .Values.redis.external.url }}
 {{- end -}}
 {{- end -}}
+
+{{/*
+Construct CACHE_URL from values (shared credential cache for web and Celery pods).
+*/}}
+{{- define "cn-asset-manager.cacheUrl" -}}
+{{- if .Values.redis.internal -}}
+redis://{{ include "cn-asset-manager.redisHost" . }}:6379/1
+{{- else -}}
+{{ .Values.redis.external.url }}
+{{- end -}}
+{{- end -}}